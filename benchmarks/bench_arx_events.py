@@ -0,0 +1,60 @@
+"""
+bench_arx_events.py : Time the SDK callback thread spends per Arx event, with and without ArxEventDispatcher
+
+Fires events through the stub SDK library's registered callback, as LogitechGArxControl.dll's callback thread would, with a handler that
+takes handler_ms to run. Without a dispatcher the handler runs inside the callback, with one the callback only queues the event.
+
+Usage: python benchmarks/bench_arx_events.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ctypes
+
+from logipy import logi_arx
+from stub import build_stub_library
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def _fire_events(library, events):
+    """ returns the mean microseconds per event spent in the callback. """
+    started = _clock()
+    for index in range(events):
+        library.LogiStubArxFireEvent(logi_arx.LOGI_ARX_EVENT_TAP_ON_TAG, 0, u'button-{}'.format(index % 8))
+    return (_clock() - started) * 1e6 / events
+
+def run(events = 2000, handler_ms = 1.0):
+    """ returns a list of (label, callback microseconds per event, dispatcher stats or None). """
+    library = ctypes.CDLL(build_stub_library())
+    library.LogiStubArxFireEvent.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_wchar_p)
+    logi_arx.logi_arx_set_backend(library)
+
+    def handler(event_type, event_value, event_arg, context):
+        time.sleep(handler_ms / 1000.0)
+
+    results = []
+    logi_arx.logi_arx_init('com.logitech.gaming.logipy.bench', 'bench', handler)
+    results.append(('synchronous', _fire_events(library, events), None))
+
+    dispatcher = logi_arx.ArxEventDispatcher(max_pending = events)
+    for index in range(8):
+        dispatcher.on_tap('button-{}'.format(index), handler)
+    logi_arx.logi_arx_init('com.logitech.gaming.logipy.bench', 'bench', dispatcher = dispatcher)
+    dispatcher.start()
+    results.append(('dispatcher', _fire_events(library, events), None))
+    dispatcher.stop()
+    results[-1] = results[-1][:2] + (dispatcher.stats(),)
+    logi_arx.logi_arx_shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    for label, microseconds, stats in run():
+        print('{:12s} {:>10.1f} us per event in the SDK callback'.format(label, microseconds))
+        if stats:
+            print('             queue p99 {queue_p99_ms:.1f} ms, max depth {max_depth}, overflowed {overflowed}'.format(**stats))
@@ -0,0 +1,65 @@
+"""
+bench_arx_state.py : SDK calls and bytes per dashboard refresh, per-tag updates versus ArxStateSync
+
+Refreshes a dashboard of fields tags against logi_arx_sim.SimulatedArxDll, changing a given number of them per refresh, once with
+ArxTagCache (one logi_arx_set_tag_content_by_id per changed tag) and once with ArxStateSync (one JSON file and one signal per refresh).
+
+Usage: python benchmarks/bench_arx_state.py
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logipy import logi_arx
+from logipy.logi_arx_sim import SimulatedArxDll
+
+
+def _refreshes(fields, changed, refreshes, seed = 1):
+    """ yields the dashboard state of every refresh, with changed random fields updated each time. """
+    generator = random.Random(seed)
+    state     = dict(('stat-{}'.format(index), generator.randint(0, 999)) for index in range(fields))
+    names     = sorted(state)
+    for _ in range(refreshes):
+        state = dict(state)
+        for name in generator.sample(names, changed):
+            state[name] = generator.randint(0, 999)
+        yield state
+
+def _measure(publish, fields, changed, refreshes):
+    device = SimulatedArxDll(record = False)
+    logi_arx.logi_arx_set_backend(device)
+    logi_arx.logi_arx_init('com.logitech.gaming.logipy.bench', 'bench')
+    sink = publish()
+    for state in _refreshes(fields, changed, refreshes):
+        sink(state)
+    logi_arx.logi_arx_shutdown()
+    stats = device.stats()
+    return (stats['calls'] - 2) / float(refreshes), stats['bytes_sent'] / float(refreshes)
+
+def per_tag():
+    tags = logi_arx.ArxTagCache()
+    def publish(state):
+        for tag_id, value in state.items():
+            tags.set_tag_content_by_id(tag_id, str(value))
+    return publish
+
+def state_sync():
+    return logi_arx.ArxStateSync().publish
+
+def run(fields = 40, changes = (1, 2, 5, 20, 40), refreshes = 200):
+    """ returns a list of (changed fields, per-tag calls, per-tag bytes, state sync calls, state sync bytes) per refresh. """
+    results = []
+    for changed in changes:
+        tag_calls, tag_bytes     = _measure(per_tag, fields, changed, refreshes)
+        sync_calls, sync_bytes   = _measure(state_sync, fields, changed, refreshes)
+        results.append((changed, tag_calls, tag_bytes, sync_calls, sync_bytes))
+    return results
+
+
+if __name__ == '__main__':
+    print('{:>8s} {:>15s} {:>15s} {:>15s} {:>15s}'.format('changed', 'per-tag calls', 'per-tag bytes', 'sync calls', 'sync bytes'))
+    for changed, tag_calls, tag_bytes, sync_calls, sync_bytes in run():
+        print('{:>8d} {:>15.1f} {:>15.1f} {:>15.1f} {:>15.1f}'.format(changed, tag_calls, tag_bytes, sync_calls, sync_bytes))
@@ -0,0 +1,103 @@
+"""
+bench_color.py : Microbenchmark for logi_led.Color construction and rgb_percent(), before and after the lookup tables
+
+Times the Color class as it was before the change (LegacyColor below) against the current logi_led.Color.
+
+Usage: python benchmarks/bench_color.py
+"""
+
+import binascii
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logipy.logi_led import Color
+
+
+# the Color class as it was before the change. the 'hex' codec calls are replaced by their binascii equivalents,
+# which is the only difference, so it also runs on python 3.
+class LegacyColor(object):
+    """ an RGBA color object that can be created using RGB, RGBA, color name, or a hex_code. """
+    def __init__(self, *args, **kwargs):
+        red, green, blue, alpha = 0, 0, 0, 255
+        hex_code = None
+        if len(args) > 0:
+            if isinstance(args[0], int):
+                red, green, blue = args[0], args[1], args[2]
+                if len(args) > 3:
+                    alpha = args[3]
+            elif isinstance(args[0], str):
+                if len(args) > 1:
+                    alpha = args[1]
+                if args[0] == 'red':
+                    red, green, blue = 255, 0, 0
+                elif args[0] == 'orange':
+                    red, green, blue = 255, 165, 0
+                elif args[0] == 'yellow':
+                    red, green, blue = 255, 255, 0
+                elif args[0] == 'green':
+                    red, green, blue = 0, 255, 0
+                elif args[0] == 'blue':
+                    red, green, blue = 0, 0, 255
+                elif args[0] == 'indigo':
+                    red, green, blue = 75, 0, 130
+                elif args[0] == 'violet':
+                    red, green, blue = 238, 130, 238
+                elif args[0] == 'cyan':
+                    red, green, blue = 0, 220, 255
+                elif args[0] == 'pink':
+                    red, green, blue = 255, 0, 255
+                elif args[0] == 'purple':
+                    red, green, blue = 128, 0, 255
+                elif args[0] == 'white':
+                    red, green, blue = 255, 255, 255
+                elif args[0] == 'black':
+                    red, green, blue = 0, 0, 0
+                else:
+                    hex_code = args[0]
+                    hex_code = kwargs.pop('hex', hex_code)
+        if hex_code:
+            hex_code = hex_code.replace('#', '')
+            self.red, self.green, self.blue = struct.unpack('BBB', binascii.unhexlify(hex_code))
+            self.alpha = alpha
+        elif any(x in ['red', 'blue', 'green', 'alpha'] for x in kwargs):
+            self.red = kwargs.pop('red', red)
+            self.green = kwargs.pop('green', green)
+            self.blue = kwargs.pop('blue', blue)
+            self.alpha = kwargs.pop('alpha', alpha)
+        else:
+            self.red = red
+            self.green = green
+            self.blue = blue
+            self.alpha = alpha
+        self.hex_code = '#{h}'.format(h=binascii.hexlify(struct.pack('BBB', *(self.red, self.green, self.blue))).decode('ascii'))
+
+    def rgb_percent(self):
+        return int((self.red / 255.0) * 100), int((self.green / 255.0) * 100), int((self.blue / 255.0) * 100)
+
+
+def _cases(color_class):
+    color = color_class(10, 20, 30)
+    return [
+        ('Color(255, 128, 0)', lambda: color_class(255, 128, 0)),
+        ("Color('red')",       lambda: color_class('red')),
+        ("Color('#ff8000')",   lambda: color_class('#ff8000')),
+        ('rgb_percent()',      color.rgb_percent),
+    ]
+
+def run(number = 200000, repeat = 3):
+    """ returns a list of (label, legacy operations per second, current operations per second) for the Color hot paths. """
+    results = []
+    for (label, legacy), (_, current) in zip(_cases(LegacyColor), _cases(Color)):
+        legacy_seconds  = min(timeit.repeat(legacy, number = number, repeat = repeat))
+        current_seconds = min(timeit.repeat(current, number = number, repeat = repeat))
+        results.append((label, number / legacy_seconds, number / current_seconds))
+    return results
+
+if __name__ == '__main__':
+    print('{:24s} {:>14s} {:>14s}'.format('ops/s', 'before', 'after'))
+    for label, legacy, current in run():
+        print('{:24s} {:>14,.0f} {:>14,.0f}'.format(label, legacy, current))
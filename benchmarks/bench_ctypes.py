@@ -0,0 +1,87 @@
+"""
+bench_ctypes.py : Calls per second through the SDK wrappers, with and without bound ctypes prototypes
+
+Loads the stand-in SDK library from benchmarks/stub twice: once unprototyped and called the way the wrappers did before
+(a fresh ctypes object per argument), and once with the prototypes bound by logi_led.bind_prototypes/logi_arx.bind_prototypes
+and called through the current wrappers.
+
+Usage: python benchmarks/bench_ctypes.py
+"""
+
+import ctypes
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logipy import logi_arx, logi_led
+from stub import build_stub_library
+
+
+# the wrappers as they were before the prototypes were bound
+def legacy_set_lighting_for_key_with_key_name(dll, key_name, red_percentage, green_percentage, blue_percentage):
+    key_name         = ctypes.c_int(key_name)
+    red_percentage   = ctypes.c_int(red_percentage)
+    green_percentage = ctypes.c_int(green_percentage)
+    blue_percentage  = ctypes.c_int(blue_percentage)
+    return bool(dll.LogiLedSetLightingForKeyWithKeyName(key_name, red_percentage, green_percentage, blue_percentage))
+
+def legacy_pulse_single_key(dll, key_name, red_percentage_start, green_percentage_start, blue_percentage_start, ms_duration, is_infinite = False, red_percentage_end = 0, green_percentage_end = 0, blue_percentage_end = 0):
+    key_name               = ctypes.c_int(key_name)
+    red_percentage_start   = ctypes.c_int(red_percentage_start)
+    green_percentage_start = ctypes.c_int(green_percentage_start)
+    blue_percentage_start  = ctypes.c_int(blue_percentage_start)
+    red_percentage_end     = ctypes.c_int(red_percentage_end)
+    green_percentage_end   = ctypes.c_int(green_percentage_end)
+    blue_percentage_end    = ctypes.c_int(blue_percentage_end)
+    ms_duration            = ctypes.c_int(ms_duration)
+    is_infinite            = ctypes.c_bool(is_infinite)
+    return bool(dll.LogiLedPulseSingleKey(key_name, red_percentage_start, green_percentage_start, blue_percentage_start, red_percentage_end, green_percentage_end, blue_percentage_end, ms_duration, is_infinite))
+
+def legacy_set_lighting_from_bitmap(dll, bitmap):
+    bitmap = ctypes.c_char_p(bitmap)
+    return bool(dll.LogiLedSetLightingFromBitmap(bitmap))
+
+def legacy_set_tag_content_by_id(dll, tag_id, new_content):
+    tag_id      = ctypes.c_wchar_p(tag_id)
+    new_content = ctypes.c_wchar_p(new_content)
+    return bool(dll.LogiArxSetTagContentById(tag_id, new_content))
+
+
+def run(number = 100000, repeat = 10):
+    """ returns a list of (label, legacy calls per second, bound calls per second). the legacy and bound repeats are interleaved and the
+        fastest of each is kept, so a noisy stretch of the run slows both down instead of one of them. """
+    library    = build_stub_library()
+    legacy_dll = ctypes.CDLL(library)
+    logi_led.logi_led_set_backend(ctypes.CDLL(library))
+    logi_arx.logi_arx_set_backend(ctypes.CDLL(library))
+    bitmap = bytes(bytearray(logi_led.LOGI_LED_BITMAP_SIZE))
+    cases  = [
+        ('per-key set',
+         lambda: legacy_set_lighting_for_key_with_key_name(legacy_dll, logi_led.ESC, 100, 50, 0),
+         lambda: logi_led.logi_led_set_lighting_for_key_with_key_name(logi_led.ESC, 100, 50, 0)),
+        ('per-key pulse',
+         lambda: legacy_pulse_single_key(legacy_dll, logi_led.ESC, 100, 0, 0, 500, True),
+         lambda: logi_led.logi_led_pulse_single_key(logi_led.ESC, 100, 0, 0, 500, True)),
+        ('bitmap push',
+         lambda: legacy_set_lighting_from_bitmap(legacy_dll, bitmap),
+         lambda: logi_led.logi_led_set_lighting_from_bitmap(bitmap)),
+        ('arx tag content',
+         lambda: legacy_set_tag_content_by_id(legacy_dll, 'fps', '144'),
+         lambda: logi_arx.logi_arx_set_tag_content_by_id('fps', '144')),
+    ]
+    results = []
+    for label, legacy, bound in cases:
+        legacy_seconds, bound_seconds = [], []
+        for _ in range(repeat):
+            legacy_seconds.append(timeit.timeit(legacy, number = number))
+            bound_seconds.append(timeit.timeit(bound, number = number))
+        results.append((label, number / min(legacy_seconds), number / min(bound_seconds)))
+    return results
+
+if __name__ == '__main__':
+    print('{:18s} {:>14s} {:>14s}'.format('calls/s', 'unprototyped', 'prototyped'))
+    for label, legacy, bound in run():
+        print('{:18s} {:>14,.0f} {:>14,.0f}'.format(label, legacy, bound))
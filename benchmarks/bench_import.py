@@ -0,0 +1,76 @@
+"""
+bench_import.py : Import-time regression benchmark for logipy.logi_led and logipy.logi_arx
+
+Imports each module in a fresh interpreter under python -X importtime, reports the cumulative import time and fails when it exceeds
+the budget or when the import pulls in modules that are only needed once the SDK is used.
+
+Usage: python benchmarks/bench_import.py [budget_ms]
+"""
+
+import compileall
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# cumulative import time allowed per module, in milliseconds. ctypes itself accounts for most of it.
+BUDGET_MS = 25.0
+
+# modules importing logipy must not load. platform and the DLL are only needed by the first SDK call, numpy only when arrays are passed.
+FORBIDDEN_MODULES = ('platform', 'numpy', 'logging', 'concurrent.futures', 'asyncio', 'hashlib')
+
+MODULES = ('logipy.logi_led', 'logipy.logi_arx')
+
+
+def measure(module, repeat = 5, cwd = ROOT):
+    """ returns (best cumulative import time in milliseconds, sorted list of forbidden modules imported) for module, imported from cwd. """
+    statement = 'import sys, {0}; sys.stdout.write(" ".join(sorted(sys.modules)))'.format(module)
+    env       = dict(os.environ)
+    env.pop('ProgramFiles', None)
+    env.pop('ProgramW6432', None)
+    best      = None
+    imported  = []
+    for _ in range(repeat):
+        process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', statement], cwd = cwd, env = env,
+                                   stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True)
+        out, err = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError('importing {} failed:\n{}'.format(module, err))
+        for line in err.splitlines():
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:
+                milliseconds = int(fields[1]) / 1000.0
+                best         = milliseconds if best is None else min(best, milliseconds)
+        imported = sorted(name for name in out.split() if name in FORBIDDEN_MODULES)
+    return best, imported
+
+def run(budget_ms = BUDGET_MS):
+    """ returns a list of (module, milliseconds, forbidden modules imported, within budget). """
+    # measure imports from up to date bytecode, as installed packages have it, rather than compiling the sources. the package is compiled
+    # in a copy, so the benchmark leaves no bytecode behind in the source tree.
+    directory = tempfile.mkdtemp(prefix = 'logipy-import-')
+    try:
+        shutil.copytree(os.path.join(ROOT, 'logipy'), os.path.join(directory, 'logipy'), ignore = shutil.ignore_patterns('__pycache__', '*.pyc'))
+        compileall.compile_dir(os.path.join(directory, 'logipy'), quiet = 1)
+        results = []
+        for module in MODULES:
+            milliseconds, imported = measure(module, cwd = directory)
+            results.append((module, milliseconds, imported, milliseconds <= budget_ms and not imported))
+    finally:
+        shutil.rmtree(directory, ignore_errors = True)
+    return results
+
+
+if __name__ == '__main__':
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    failed    = False
+    print('{:18s} {:>10s}  {}'.format('module', 'import ms', 'unwanted imports'))
+    for module, milliseconds, imported, ok in run(budget_ms):
+        print('{:18s} {:>10.2f}  {}'.format(module, milliseconds, ', '.join(imported) or '-'))
+        failed = failed or not ok
+    if failed:
+        print('import budget of {:.1f} ms exceeded or unwanted modules imported'.format(budget_ms))
+        sys.exit(1)
@@ -0,0 +1,53 @@
+"""
+bench_layers.py : Per-frame cost of LedCompositor as layers are added
+
+Composes frames of a stack of layers where only the top layer changes each frame, as with a reactive typing layer over a steady theme,
+and reports the time per frame with numpy and with the pure python blending. Thanks to the cached results below each layer the time per
+frame should stay flat as layers are added underneath.
+
+Usage: python benchmarks/bench_layers.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logipy import logi_led, logi_led_layers
+
+LAYER_COUNTS = (1, 4, 16)
+
+
+def _compositor(layers, use_numpy):
+    compositor = logi_led_layers.LedCompositor(use_numpy = use_numpy)
+    for index in range(layers):
+        layer = compositor.add_layer('layer-{}'.format(index), blend = logi_led_layers.BLEND_MODES[index % len(logi_led_layers.BLEND_MODES)], alpha = 0.5)
+        layer.canvas.fill(index * 15 % 256, 64, 255 - index * 15 % 256)
+    return compositor
+
+def run(number = 500, repeat = 3):
+    """ returns a list of (label, microseconds per frame). backends that are not installed are left out. """
+    backends = [('python', False)]
+    if logi_led_layers._import_numpy() is not None:
+        backends.insert(0, ('numpy', True))
+    results = []
+    for name, use_numpy in backends:
+        for layers in LAYER_COUNTS:
+            compositor = _compositor(layers, use_numpy)
+            top        = compositor.layers[-1].canvas
+            state      = [0]
+
+            def frame():
+                state[0] = (state[0] + 1) & 0xff
+                top.set_pixel(0, 0, state[0], 0, 0)
+                compositor.compose()
+
+            seconds = min(timeit.repeat(frame, number = number, repeat = repeat)) / number
+            results.append(('{} {} layers'.format(name, layers), seconds * 1e6))
+    return results
+
+
+if __name__ == '__main__':
+    for label, microseconds in run():
+        print('{:24s} {:>10.1f} us/frame'.format(label, microseconds))
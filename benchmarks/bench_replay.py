@@ -0,0 +1,66 @@
+"""
+bench_replay.py : Recording overhead and max speed replay throughput of logi_led_record
+
+Records a synthetic session of canvas frames and per-key updates with LedRecorder, reporting the cost a recorded bitmap push adds to the
+calling thread and the bytes per recorded frame, then replays the recording at max speed against the backend to measure its throughput.
+
+Usage: python benchmarks/bench_replay.py [stub|sim]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logipy import logi_led
+from logipy.logi_led_record import LedRecorder, LedReplayer
+from bench_sdk import install_backend
+
+
+def _session(frames, seed = 1):
+    """ draws frames canvas frames, each changing a few keys, like a reactive typing effect over a steady theme. """
+    generator = random.Random(seed)
+    canvas    = logi_led.LedCanvas()
+    canvas.fill(0, 0, 128)
+    for _ in range(frames):
+        for _ in range(generator.randint(1, 8)):
+            canvas.set_pixel(generator.randrange(logi_led.LOGI_LED_BITMAP_WIDTH), generator.randrange(logi_led.LOGI_LED_BITMAP_HEIGHT),
+                             generator.randrange(256), generator.randrange(256), 0)
+        logi_led.logi_led_set_lighting_from_bitmap(canvas.buffer)
+
+def run(backend = 'stub', frames = 5000, number = 20000):
+    """ returns (backend used, list of (label, value, unit, better)). """
+    backend   = install_backend(backend)
+    directory = tempfile.mkdtemp(prefix = 'logipy-bench-')
+    path      = os.path.join(directory, 'session.rec')
+    bitmap    = bytes(bytearray(logi_led.LOGI_LED_BITMAP_SIZE))
+    try:
+        push  = lambda: logi_led.logi_led_set_lighting_from_bitmap(bitmap)
+        plain = min(timeit.repeat(push, number = number, repeat = 3)) / number
+        with LedRecorder(os.path.join(directory, 'overhead.rec')):
+            recorded = min(timeit.repeat(push, number = number, repeat = 3)) / number
+        with LedRecorder(path) as recorder:
+            _session(frames)
+        with LedReplayer(path) as replayer:
+            stats = replayer.play(speed = None)
+        results = [
+            ('record overhead',  (recorded - plain) * 1e6,               'us/call',     'lower'),
+            ('record size',      recorder.bytes_written / float(frames), 'bytes/frame', 'lower'),
+            ('replay max speed', stats['frames'] / stats['seconds'],     'frames/s',    'higher'),
+        ]
+    finally:
+        shutil.rmtree(directory, ignore_errors = True)
+        logi_led.logi_led_shutdown()
+    return backend, results
+
+
+if __name__ == '__main__':
+    backend, results = run(sys.argv[1] if len(sys.argv) > 1 else 'stub')
+    print('backend: {}'.format(backend))
+    for label, value, unit, _ in results:
+        print('{:20s} {:>14,.2f} {}'.format(label, value, unit))
@@ -0,0 +1,89 @@
+"""
+bench_sdk.py : Throughput of the logi_led and logi_arx wrappers against a stand-in SDK
+
+Runs the wrapper hot paths against the stub SDK library from benchmarks/stub ('stub', needs a C compiler) or against the pure python
+logi_led_sim/logi_arx_sim backends ('sim'): per-key calls, bitmap pushes, config option lookups direct and cached, Arx tag updates and Arx content uploads
+across payload sizes.
+
+Usage: python benchmarks/bench_sdk.py [stub|sim]
+"""
+
+import ctypes
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from logipy import logi_arx, logi_led
+from logipy.logi_arx_sim import SimulatedArxDll
+from logipy.logi_led_sim import SimulatedLedDll
+from stub import build_stub_library
+
+UPLOAD_SIZES = (1024, 64 * 1024, 1024 * 1024)
+
+
+def install_backend(backend = 'stub'):
+    """ installs the stub library or the simulated DLLs as the logi_led and logi_arx backends and initializes both SDKs. returns the
+        backend actually installed, which is 'sim' when the stub library cannot be built. """
+    if backend == 'stub':
+        try:
+            library = build_stub_library()
+        except RuntimeError:
+            backend = 'sim'
+        else:
+            logi_led.logi_led_set_backend(ctypes.CDLL(library))
+            logi_arx.logi_arx_set_backend(ctypes.CDLL(library))
+    if backend == 'sim':
+        logi_led.logi_led_set_backend(SimulatedLedDll(record = False))
+        logi_arx.logi_arx_set_backend(SimulatedArxDll(record = False))
+    logi_led.logi_led_init()
+    logi_arx.logi_arx_init('com.logitech.gaming.logipy.bench', 'bench')
+    return backend
+
+def _rate(statement, number, repeat):
+    return number / min(timeit.repeat(statement, number = number, repeat = repeat))
+
+def run(backend = 'stub', number = 20000, repeat = 3):
+    """ returns (backend used, list of (label, value, unit)) where every value is higher-is-better. """
+    backend = install_backend(backend)
+    bitmap  = bytes(bytearray(logi_led.LOGI_LED_BITMAP_SIZE))
+    canvas  = logi_led.LedCanvas()
+    state   = [0]
+    config  = logi_led.LedConfig([logi_led.ConfigOption('effect/duration', logi_led.CONFIG_NUMBER, 5)])
+    config.load()
+
+    def canvas_frame():
+        state[0] = (state[0] + 1) & 0xff
+        canvas.fill(state[0], 0, 0)
+        canvas.commit()
+
+    cases = [
+        ('led per-key set',         lambda: logi_led.logi_led_set_lighting_for_key_with_key_name(logi_led.ESC, 100, 50, 0)),
+        ('led bitmap push',         lambda: logi_led.logi_led_set_lighting_from_bitmap(bitmap)),
+        ('led canvas full frame',   canvas_frame),
+        ('led config number',       lambda: logi_led.logi_led_get_config_option_number('effect/duration', 5)),
+        ('led config bool',         lambda: logi_led.logi_led_get_config_option_bool('effect/enabled', True)),
+        ('led config color',        lambda: logi_led.logi_led_get_config_option_color('effect/color', logi_led.Color(0, 255, 0))),
+        ('led config cached',       lambda: config['effect/duration']),
+        ('arx tag content',         lambda: logi_arx.logi_arx_set_tag_content_by_id('fps', '144')),
+        ('arx tag property',        lambda: logi_arx.logi_arx_set_tag_property_by_id('bar', 'style.width', '50%')),
+    ]
+    results = [(label, _rate(statement, number, repeat), 'calls/s') for label, statement in cases]
+    # the stub does not read the payload, so a flat rate across sizes shows that content is passed without copying
+    for size in UPLOAD_SIZES:
+        payload = bytes(bytearray(size))
+        results.append(('arx upload {}k'.format(size // 1024),
+                        _rate(lambda: logi_arx.logi_arx_add_content_as(payload, size, 'blob.bin', 'application/octet-stream'), number, repeat),
+                        'calls/s'))
+    logi_arx.logi_arx_shutdown()
+    logi_led.logi_led_shutdown()
+    return backend, results
+
+
+if __name__ == '__main__':
+    backend, results = run(sys.argv[1] if len(sys.argv) > 1 else 'stub')
+    print('backend: {}'.format(backend))
+    for label, value, unit in results:
+        print('{:24s} {:>14,.0f} {}'.format(label, value, unit))
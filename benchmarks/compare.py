@@ -0,0 +1,63 @@
+"""
+compare.py : Compares two benchmarks/run.py result files and fails on regressions
+
+A result regresses when it got worse by more than the threshold, in the direction its "better" field gives. Results only present in
+one of the files are listed but never fail the comparison.
+
+Usage: python benchmarks/compare.py baseline.json current.json [--threshold 0.10]
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold = 0.10):
+    """ returns a list of (name, baseline value, current value, relative change, regressed) for every result, where relative change is
+        positive for improvements. values missing from one side are None. """
+    base_results    = baseline['results']
+    current_results = current['results']
+    rows = []
+    for name in sorted(set(base_results) | set(current_results)):
+        before = base_results.get(name)
+        after  = current_results.get(name)
+        if before is None or after is None:
+            rows.append((name, before and before['value'], after and after['value'], None, False))
+            continue
+        old, new = before['value'], after['value']
+        if old == 0:
+            change = 0.0 if new == 0 else None
+        elif after.get('better', 'higher') == 'higher':
+            change = (new - old) / float(abs(old))
+        else:
+            change = (old - new) / float(abs(old))
+        rows.append((name, old, new, change, change is not None and change < -threshold))
+    return rows
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Compare two logipy benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type = float, default = 0.10, help = 'relative slowdown that counts as a regression (default 0.10)')
+    options = parser.parse_args(argv)
+    with open(options.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(options.current) as current_file:
+        current = json.load(current_file)
+    if baseline.get('backend') != current.get('backend'):
+        print('warning: comparing {} backend results against {} backend results'.format(baseline.get('backend'), current.get('backend')))
+    regressions = 0
+    for name, old, new, change, regressed in compare(baseline, current, options.threshold):
+        if change is None:
+            print('{:48s} {:>16} {:>16}'.format(name, '-' if old is None else '{:,.2f}'.format(old), '-' if new is None else '{:,.2f}'.format(new)))
+            continue
+        regressions += regressed
+        print('{:48s} {:>16,.2f} {:>16,.2f} {:>+8.1%}{}'.format(name, old, new, change, '  REGRESSION' if regressed else ''))
+    if regressions:
+        print('{} result(s) regressed by more than {:.0%}'.format(regressions, options.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
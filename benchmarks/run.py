@@ -0,0 +1,155 @@
+"""
+run.py : Runs the logipy benchmark suites and writes machine-readable results
+
+Every result is stored as "suite/case": {"value", "unit", "better"} where better is "higher" or "lower", together with the python
+version, platform, git commit and SDK backend, so compare.py can check two runs against each other.
+
+Usage: python benchmarks/run.py [--backend stub|sim] [--quick] [--suite NAME ...] [--json results.json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+sys.path.insert(0, BENCHMARKS)
+
+import bench_arx_events
+import bench_arx_state
+import bench_color
+import bench_ctypes
+import bench_import
+import bench_layers
+import bench_replay
+import bench_sdk
+
+
+def _result(value, unit, better = 'higher'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+def suite_color(options):
+    number  = 20000 if options.quick else 200000
+    results = {}
+    for label, legacy, current in bench_color.run(number = number):
+        results[label + ' legacy'] = _result(legacy, 'ops/s')
+        results[label]             = _result(current, 'ops/s')
+    return results
+
+def suite_sdk(options):
+    number = 2000 if options.quick else 20000
+    backend, results = bench_sdk.run(options.backend, number = number)
+    options.backend_used = backend
+    return dict((label, _result(value, unit)) for label, value, unit in results)
+
+def suite_ctypes(options):
+    number  = 10000 if options.quick else 100000
+    results = {}
+    for label, legacy, bound in bench_ctypes.run(number = number):
+        results[label + ' unprototyped'] = _result(legacy, 'calls/s')
+        results[label]                   = _result(bound, 'calls/s')
+    return results
+
+def suite_arx_state(options):
+    results = {}
+    for changed, tag_calls, tag_bytes, sync_calls, sync_bytes in bench_arx_state.run(refreshes = 50 if options.quick else 200):
+        results['state sync {} changed calls'.format(changed)] = _result(sync_calls, 'calls/refresh', 'lower')
+        results['state sync {} changed bytes'.format(changed)] = _result(sync_bytes, 'bytes/refresh', 'lower')
+        results['per-tag {} changed calls'.format(changed)]    = _result(tag_calls, 'calls/refresh', 'lower')
+    return results
+
+def suite_arx_events(options):
+    results = {}
+    for label, microseconds, _ in bench_arx_events.run(events = 200 if options.quick else 2000):
+        results[label + ' callback'] = _result(microseconds, 'us/event', 'lower')
+    return results
+
+def suite_layers(options):
+    return dict((label, _result(microseconds, 'us/frame', 'lower')) for label, microseconds in bench_layers.run(number = 50 if options.quick else 500))
+
+def suite_replay(options):
+    backend, results = bench_replay.run(options.backend, frames = 500 if options.quick else 5000, number = 2000 if options.quick else 20000)
+    options.backend_used = backend
+    return dict((label, _result(value, unit, better)) for label, value, unit, better in results)
+
+def suite_import(options):
+    results = {}
+    for module, milliseconds, imported, _ in bench_import.run():
+        results[module] = _result(milliseconds, 'ms', 'lower')
+        results[module + ' unwanted imports'] = _result(len(imported), 'modules', 'lower')
+    return results
+
+# suites needing the stub library are skipped with the pure python backend
+SUITES = (
+    ('color',      suite_color,      False),
+    ('sdk',        suite_sdk,        False),
+    ('ctypes',     suite_ctypes,     True),
+    ('arx_state',  suite_arx_state,  False),
+    ('arx_events', suite_arx_events, True),
+    ('layers',     suite_layers,     False),
+    ('replay',     suite_replay,     False),
+    ('import',     suite_import,     False),
+)
+
+def _git_commit():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd = BENCHMARKS, stderr = subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+def run(options):
+    """ runs the selected suites and returns the results document. """
+    results = {}
+    skipped = []
+    options.backend_used = options.backend
+    for name, suite, needs_stub in SUITES:
+        if options.suite and name not in options.suite:
+            continue
+        if needs_stub and options.backend != 'stub':
+            skipped.append(name)
+            continue
+        try:
+            suite_results = suite(options)
+        except RuntimeError as exception:
+            # the stub library could not be built
+            sys.stderr.write('skipping {}: {}\n'.format(name, exception))
+            skipped.append(name)
+            continue
+        for case, result in suite_results.items():
+            results['{}/{}'.format(name, case)] = result
+    return {
+        'schema':  1,
+        'created': datetime.datetime.utcnow().replace(microsecond = 0).isoformat() + 'Z',
+        'commit':  _git_commit(),
+        'python':  platform.python_version(),
+        'platform': platform.platform(),
+        'backend': options.backend_used,
+        'quick':   options.quick,
+        'skipped': skipped,
+        'results': results,
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Run the logipy benchmarks.')
+    parser.add_argument('--backend', choices = ('stub', 'sim'), default = 'stub', help = 'SDK stand-in to benchmark against')
+    parser.add_argument('--quick', action = 'store_true', help = 'fewer iterations, for smoke tests')
+    parser.add_argument('--suite', action = 'append', choices = [name for name, _, _ in SUITES], help = 'run only this suite')
+    parser.add_argument('--json', metavar = 'PATH', help = 'write the results to PATH')
+    options  = parser.parse_args(argv)
+    document = run(options)
+    for name in sorted(document['results']):
+        result = document['results'][name]
+        print('{:48s} {:>16,.2f} {}'.format(name, result['value'], result['unit']))
+    if options.json:
+        with open(options.json, 'w') as json_file:
+            json.dump(document, json_file, indent = 2, sort_keys = True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
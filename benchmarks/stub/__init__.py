@@ -0,0 +1,32 @@
+"""
+stub : Builds the stand-in SDK library from logi_sdk_stub.c
+
+The library exports every LogiLed* and LogiArx* entry point and does no work, so it can be loaded with
+load_dll(path) or installed as a backend to measure the python wrapper layer on machines without the SDK.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logi_sdk_stub.c')
+
+
+def build_stub_library(output_dir = None, compiler = None):
+    """ compiles the stub library with the system C compiler (cc, or $CC) and returns its path. the library is rebuilt only when the
+        source is newer. raises RuntimeError when no compiler is available. """
+    output_dir = output_dir or os.path.join(tempfile.gettempdir(), 'logipy-bench')
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    extension = '.dll' if sys.platform == 'win32' else '.dylib' if sys.platform == 'darwin' else '.so'
+    library   = os.path.join(output_dir, 'logi_sdk_stub' + extension)
+    if os.path.exists(library) and os.path.getmtime(library) >= os.path.getmtime(SOURCE):
+        return library
+    compiler = compiler or os.environ.get('CC', 'cc')
+    command  = [compiler, '-O2', '-shared', '-fPIC', '-o', library, SOURCE]
+    try:
+        subprocess.check_call(command)
+    except (OSError, subprocess.CalledProcessError) as exception:
+        raise RuntimeError('could not build the stub SDK library with {!r}: {}'.format(' '.join(command), exception))
+    return library
@@ -0,0 +1,83 @@
+/*
+ * logi_sdk_stub.c : Stand-in for LogitechLed.dll and LogitechGArxControl.dll
+ *
+ * Exports the LogiLed* and LogiArx* entry points with the SDK signatures. Every function only
+ * touches its arguments and succeeds, so benchmarks measure the cost of the python wrapper layer.
+ */
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <wchar.h>
+
+#ifdef _WIN32
+#define STUB_EXPORT __declspec(dllexport)
+#else
+#define STUB_EXPORT __attribute__((visibility("default")))
+#endif
+
+static volatile int stub_sink;
+
+static bool stub_touch(int value)
+{
+    stub_sink = value;
+    return true;
+}
+
+/* LED SDK */
+STUB_EXPORT bool LogiLedInit(void) { return true; }
+STUB_EXPORT bool LogiLedSetTargetDevice(int targetDevice) { return stub_touch(targetDevice); }
+STUB_EXPORT bool LogiLedSaveCurrentLighting(void) { return true; }
+STUB_EXPORT bool LogiLedRestoreLighting(void) { return true; }
+STUB_EXPORT bool LogiLedSetLighting(int r, int g, int b) { return stub_touch(r + g + b); }
+STUB_EXPORT bool LogiLedFlashLighting(int r, int g, int b, int duration, int interval) { return stub_touch(r + g + b + duration + interval); }
+STUB_EXPORT bool LogiLedPulseLighting(int r, int g, int b, int duration, int interval) { return stub_touch(r + g + b + duration + interval); }
+STUB_EXPORT bool LogiLedStopEffects(void) { return true; }
+STUB_EXPORT bool LogiLedSetLightingFromBitmap(const unsigned char *bitmap) { return stub_touch(bitmap[0] + bitmap[503]); }
+STUB_EXPORT bool LogiLedSetLightingForKeyWithScanCode(int key, int r, int g, int b) { return stub_touch(key + r + g + b); }
+STUB_EXPORT bool LogiLedSetLightingForKeyWithHidCode(int key, int r, int g, int b) { return stub_touch(key + r + g + b); }
+STUB_EXPORT bool LogiLedSetLightingForKeyWithQuartzCode(int key, int r, int g, int b) { return stub_touch(key + r + g + b); }
+STUB_EXPORT bool LogiLedSetLightingForKeyWithKeyName(int key, int r, int g, int b) { return stub_touch(key + r + g + b); }
+STUB_EXPORT bool LogiLedSaveLightingForKey(int key) { return stub_touch(key); }
+STUB_EXPORT bool LogiLedRestoreLightingForKey(int key) { return stub_touch(key); }
+STUB_EXPORT bool LogiLedFlashSingleKey(int key, int r, int g, int b, int duration, int interval) { return stub_touch(key + r + g + b + duration + interval); }
+STUB_EXPORT bool LogiLedPulseSingleKey(int key, int r0, int g0, int b0, int r1, int g1, int b1, int duration, bool infinite) { return stub_touch(key + r0 + g0 + b0 + r1 + g1 + b1 + duration + infinite); }
+STUB_EXPORT bool LogiLedStopEffectsOnKey(int key) { return stub_touch(key); }
+STUB_EXPORT void LogiLedShutdown(void) { }
+STUB_EXPORT bool LogiGetConfigOptionNumber(const wchar_t *path, double *value, int sdk) { return stub_touch((int)*value + sdk + (path != NULL)); }
+STUB_EXPORT bool LogiGetConfigOptionBool(const wchar_t *path, bool *value, int sdk) { return stub_touch(*value + sdk + (path != NULL)); }
+STUB_EXPORT bool LogiGetConfigOptionColor(const wchar_t *path, int *r, int *g, int *b, int sdk) { return stub_touch(*r + *g + *b + sdk + (path != NULL)); }
+STUB_EXPORT bool LogiGetConfigOptionKeyInput(const wchar_t *path, char *value, int sdk) { return stub_touch(value[0] + sdk + (path != NULL)); }
+STUB_EXPORT bool LogiSetConfigOptionLabel(const wchar_t *path, const wchar_t *label, int sdk) { return stub_touch(sdk + (path != NULL) + (label != NULL)); }
+
+/* Arx SDK */
+typedef void (*logiArxCb)(int eventType, int eventValue, wchar_t *eventArg, void *context);
+typedef struct { logiArxCb arxCallBack; void *arxContext; } logiArxCbContext;
+
+static logiArxCbContext stub_arx_callback;
+
+STUB_EXPORT bool LogiArxInit(const wchar_t *identifier, const wchar_t *friendlyName, logiArxCbContext *callback)
+{
+    if (callback != NULL)
+        stub_arx_callback = *callback;
+    return stub_touch((identifier != NULL) + (friendlyName != NULL));
+}
+STUB_EXPORT bool LogiArxAddFileAs(const wchar_t *filePath, const wchar_t *fileName, const wchar_t *mimeType) { return stub_touch((int)wcslen(filePath) + (int)wcslen(fileName) + (int)wcslen(mimeType)); }
+STUB_EXPORT bool LogiArxAddContentAs(const void *content, int size, const wchar_t *fileName, const wchar_t *mimeType) { return stub_touch((content != NULL) + size + (int)wcslen(fileName) + (int)wcslen(mimeType)); }
+STUB_EXPORT bool LogiArxAddUTF8StringAs(const wchar_t *stringContent, const wchar_t *fileName, const wchar_t *mimeType) { return stub_touch((int)wcslen(stringContent) + (int)wcslen(fileName) + (int)wcslen(mimeType)); }
+STUB_EXPORT bool LogiArxAddImageFromBitmap(const unsigned char *bitmap, int width, int height, const wchar_t *fileName) { return stub_touch(bitmap[0] + width + height + (int)wcslen(fileName)); }
+STUB_EXPORT bool LogiArxSetIndex(const wchar_t *fileName) { return stub_touch((int)wcslen(fileName)); }
+STUB_EXPORT bool LogiArxSetTagPropertyById(const wchar_t *tagId, const wchar_t *prop, const wchar_t *newValue) { return stub_touch((int)wcslen(tagId) + (int)wcslen(prop) + (int)wcslen(newValue)); }
+STUB_EXPORT bool LogiArxSetTagsPropertyByClass(const wchar_t *tagsClass, const wchar_t *prop, const wchar_t *newValue) { return stub_touch((int)wcslen(tagsClass) + (int)wcslen(prop) + (int)wcslen(newValue)); }
+STUB_EXPORT bool LogiArxSetTagContentById(const wchar_t *tagId, const wchar_t *newContent) { return stub_touch((int)wcslen(tagId) + (int)wcslen(newContent)); }
+STUB_EXPORT bool LogiArxSetTagsContentByClass(const wchar_t *tagsClass, const wchar_t *newContent) { return stub_touch((int)wcslen(tagsClass) + (int)wcslen(newContent)); }
+STUB_EXPORT int LogiArxGetLastError(void) { return 0; }
+STUB_EXPORT void LogiArxShutdown(void) { }
+
+/* not part of the SDK: delivers an event through the callback registered with LogiArxInit, as the SDK's callback thread would */
+STUB_EXPORT bool LogiStubArxFireEvent(int eventType, int eventValue, wchar_t *eventArg)
+{
+    if (stub_arx_callback.arxCallBack == NULL)
+        return false;
+    stub_arx_callback.arxCallBack(eventType, eventValue, eventArg, stub_arx_callback.arxContext);
+    return true;
+}
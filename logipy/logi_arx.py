@@ -8,9 +8,14 @@ Author: Tom Lambert
 Email: devtechsupport@logitech.com
 """
 
+import collections
 import ctypes
+import functools
 import os
-import platform
+import sys
+import threading
+import time
+import weakref
 
 # DLL Definitions
 #
@@ -49,153 +54,1187 @@ class logiArxCbContext(ctypes.Structure):
     ]
 
 def callback_wrapper(event_type, event_value, event_arg, context):
+    dispatcher = _dispatcher
+    if dispatcher is not None:
+        # runs on the SDK's callback thread, so it only queues the event and returns
+        dispatcher.post(event_type, event_value, event_arg)
+        return
+    _track_event(event_type, event_value)
     on_callback(event_type, event_value, event_arg, context)
 
+def _track_event(event_type, event_value):
+    global mobile_device_type
+    if event_type == LOGI_ARX_EVENT_MOBILEDEVICE_ARRIVAL:
+        # a newly arrived device starts without the applet's files and with their original markup
+        mobile_device_type = event_value
+        _invalidate_caches()
+        for image in list(_live_images):
+            image.invalidate()
+    elif event_type == LOGI_ARX_EVENT_MOBILEDEVICE_REMOVAL:
+        mobile_device_type = None
+
 def default_callback(event_type, event_value, event_arg, context):
-    print '\n[Arx] default_callback called with: event_type = {event_type}, event_value = {event_value}, event_arg = {event_arg}, context = {context}'.format(
-        event_type = event_type, event_value = event_value, event_arg = event_arg, context = context)
+    print('\n[Arx] default_callback called with: event_type = {event_type}, event_value = {event_value}, event_arg = {event_arg}, context = {context}'.format(
+        event_type = event_type, event_value = event_value, event_arg = event_arg, context = context))
 
 # Required Globals
 #
-class SDKNotFoundException:
+class SDKNotFoundException(Exception):
     pass
 
+# signatures of the exported functions, bound once when the DLL is loaded so calls take plain python values and ctypes checks and converts
+# them through the declared argument types instead of guessing a C type per call. content and bitmaps are passed as raw addresses.
+_c_wchar_p = ctypes.c_wchar_p
+_PROTOTYPES = {
+    'LogiArxInit':                   (ctypes.c_bool, (_c_wchar_p, _c_wchar_p, ctypes.POINTER(logiArxCbContext))),
+    'LogiArxAddFileAs':              (ctypes.c_bool, (_c_wchar_p, _c_wchar_p, _c_wchar_p)),
+    'LogiArxAddContentAs':           (ctypes.c_bool, (ctypes.c_void_p, ctypes.c_int, _c_wchar_p, _c_wchar_p)),
+    'LogiArxAddUTF8StringAs':        (ctypes.c_bool, (_c_wchar_p, _c_wchar_p, _c_wchar_p)),
+    'LogiArxAddImageFromBitmap':     (ctypes.c_bool, (ctypes.c_void_p, ctypes.c_int, ctypes.c_int, _c_wchar_p)),
+    'LogiArxSetIndex':               (ctypes.c_bool, (_c_wchar_p,)),
+    'LogiArxSetTagPropertyById':     (ctypes.c_bool, (_c_wchar_p, _c_wchar_p, _c_wchar_p)),
+    'LogiArxSetTagsPropertyByClass': (ctypes.c_bool, (_c_wchar_p, _c_wchar_p, _c_wchar_p)),
+    'LogiArxSetTagContentById':      (ctypes.c_bool, (_c_wchar_p, _c_wchar_p)),
+    'LogiArxSetTagsContentByClass':  (ctypes.c_bool, (_c_wchar_p, _c_wchar_p)),
+    'LogiArxGetLastError':           (ctypes.c_int, ()),
+    'LogiArxShutdown':               (None, ()),
+}
+
+def bind_prototypes(dll):
+    """ sets restype and argtypes on every exported function of a ctypes library once. ctypes caches the function objects on the library,
+        so later calls go straight to the prototyped function without building ctypes arguments by hand. returns the library. """
+    if isinstance(dll, ctypes.CDLL):
+        for name, (restype, argtypes) in _PROTOTYPES.items():
+            function = getattr(dll, name, None)
+            if function is not None:
+                function.restype  = restype
+                function.argtypes = argtypes
+    return dll
+
 def load_dll(path_dll = None):
+    """ loads LogitechGArxControl.dll from path_dll, the path in the LOGIPY_ARX_DLL environment variable, or the Logitech Gaming Software
+        install directory, in that order. raises SDKNotFoundException if the DLL is not there. """
+    if not path_dll:
+        path_dll = os.environ.get('LOGIPY_ARX_DLL')
     if not path_dll:
+        subpath_lgs = os.environ.get('ProgramW6432') or os.environ.get('ProgramFiles')
+        if not subpath_lgs:
+            raise SDKNotFoundException('The SDK DLL was not found.')
+        import platform
         bitness = 'x86' if platform.architecture()[0] == '32bit' else 'x64'
         subpath_dll = r'/Logitech Gaming Software/SDK/Arx Control/{}/LogitechGArxControl.dll'.format(bitness)
-        try:
-            subpath_lgs = os.environ['ProgramW6432']
-        except KeyError:
-            subpath_lgs = os.environ['ProgramFiles']
         path_dll = subpath_lgs + subpath_dll
     if os.path.exists(path_dll):
-        return ctypes.cdll.LoadLibrary(path_dll)
+        return bind_prototypes(ctypes.cdll.LoadLibrary(path_dll))
     else:
         raise SDKNotFoundException('The SDK DLL was not found.')
 
-try:
-    arx_dll = load_dll()
-except SDKNotFoundException as exception_sdk:
-    arx_dll = None
-on_callback = None
+# the DLL is looked up on the first SDK call rather than at import, so importing the module for its constants stays cheap.
+_arx_dll        = None
+_arx_dll_loaded = False
+_arx_dll_lock   = threading.Lock()
+on_callback     = None
+
+# the callback context passed to LogiArxInit and the dispatcher events are queued to. the context owns the ctypes trampoline, so both
+# stay alive for as long as the SDK may call back, also across logi_arx_shutdown.
+_callback_context = None
+_dispatcher       = None
+# the (dispatcher, callback) logi_arx_init registered with on_any(), replaced rather than added to when the applet is initialized again
+_dispatcher_callback = None
+
+# the LOGI_ARX_DEVICETYPE_* of the mobile device currently showing the applet, or None
+mobile_device_type = None
+
+def _load_default_dll():
+    """ loads the DLL the first time an SDK function needs it. returns it, or None if it was not found, and never tries again. """
+    global _arx_dll, _arx_dll_loaded, arx_dll
+    with _arx_dll_lock:
+        if not _arx_dll_loaded:
+            try:
+                _arx_dll = load_dll()
+            except SDKNotFoundException:
+                _arx_dll = None
+            _arx_dll_loaded = True
+            arx_dll         = _arx_dll
+    return _arx_dll
+
+# arx_dll, for callers that use the DLL directly, becomes a module global once the DLL is loaded. before that, __getattr__ loads it on
+# first access (PEP 562), and pythons older than 3.7, which do not call a module's __getattr__, load it at import as they always did.
+def __getattr__(name):
+    if name == 'arx_dll':
+        return _load_default_dll()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+if sys.version_info < (3, 7):
+    _load_default_dll()
+
+def logi_arx_set_backend(backend):
+    """ replaces the object the wrapped SDK functions call into and returns the previous one. ctypes libraries get their prototypes bound.
+        passing None makes every function return False as if the DLL was not found. """
+    global _arx_dll, _arx_dll_loaded, arx_dll
+    with _arx_dll_lock:
+        previous, _arx_dll = _arx_dll, bind_prototypes(backend)
+        _arx_dll_loaded    = True
+        arx_dll            = _arx_dll
+    return previous
+
+def logi_arx_get_backend():
+    """ returns the object the wrapped SDK functions currently call into, loading the DLL if nothing was set yet, or None. """
+    return _arx_dll or _load_default_dll()
+
+
+# Buffers
+#
+class _Py_buffer(ctypes.Structure):
+    """ creates a struct to match the python 3 Py_buffer. """
+    _fields_ = [
+        ('buf', ctypes.c_void_p),
+        ('obj', ctypes.c_void_p),
+        ('len', ctypes.c_ssize_t),
+        ('itemsize', ctypes.c_ssize_t),
+        ('readonly', ctypes.c_int),
+        ('ndim', ctypes.c_int),
+        ('format', ctypes.c_char_p),
+        ('shape', ctypes.c_void_p),
+        ('strides', ctypes.c_void_p),
+        ('suboffsets', ctypes.c_void_p),
+        ('internal', ctypes.c_void_p)
+    ]
+
+# the buffer protocol gives the address of an object's memory without copying it, also for read-only buffers such as bytes, read-only
+# mmaps or memoryviews of them, which ctypes' from_buffer() refuses. it is only reachable through the C API on CPython 3.
+if sys.version_info[0] >= 3 and hasattr(ctypes, 'pythonapi'):
+    _get_buffer          = ctypes.pythonapi.PyObject_GetBuffer
+    _get_buffer.argtypes = (ctypes.py_object, ctypes.POINTER(_Py_buffer), ctypes.c_int)
+    _get_buffer.restype  = ctypes.c_int
+    _release_buffer          = ctypes.pythonapi.PyBuffer_Release
+    _release_buffer.argtypes = (ctypes.POINTER(_Py_buffer),)
+    _release_buffer.restype  = None
+else:
+    _get_buffer     = None
+    _release_buffer = None
+
+_PyBUF_C_CONTIGUOUS = 0x0020 | 0x0008
+
+class _BorrowedBuffer(object):
+    """ lends the address and length in bytes of content for the duration of a with block. buffer-protocol objects (bytes, bytearray,
+        memoryview, mmap, array, numpy arrays, ctypes arrays) must be C-contiguous and are never copied. anything else, such as an int
+        address or a ctypes pointer, is passed through with a length of None. """
+
+    def __init__(self, content):
+        self.content = content
+        self._view   = None
+        self._keep   = None
+
+    def __enter__(self):
+        content = self.content
+        if isinstance(content, (int, ctypes.c_void_p, ctypes._Pointer)) or content is None:
+            return content, None
+        if _get_buffer is not None:
+            view = _Py_buffer()
+            try:
+                _get_buffer(content, ctypes.byref(view), _PyBUF_C_CONTIGUOUS)
+            except TypeError:
+                return content, None
+            except BufferError:
+                raise ValueError('content must be a C-contiguous buffer')
+            self._view = view
+            return view.buf, view.len
+        # python 2: bytes are passed as is and writable buffers are mapped in place, only read-only buffers are copied
+        try:
+            view = memoryview(content)
+        except TypeError:
+            return content, None
+        nbytes = view.itemsize
+        for extent in view.shape:
+            nbytes *= extent
+        if isinstance(content, bytes):
+            return content, nbytes
+        if view.readonly:
+            self._keep = (ctypes.c_char * nbytes).from_buffer_copy(view)
+        else:
+            self._keep = (ctypes.c_char * nbytes).from_buffer(content)
+        return ctypes.addressof(self._keep), nbytes
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._view is not None:
+            _release_buffer(ctypes.byref(self._view))
+            self._view = None
+        self._keep = None
+        return False
 
 
 # Wrapped SDK Functions
 #
-def logi_arx_init(identifier, friendly_name, py_callback_function = None):
-    """ initializes the applet on the app with the given friendly_name. """
-    if arx_dll:
-        global on_callback
-        global callback_ref
+def logi_arx_init(identifier, friendly_name, py_callback_function = None, path_dll = None, dispatcher = None):
+    """ initializes the applet on the app with the given friendly_name. the DLL is loaded on first use, from path_dll if given.
+    without a dispatcher, py_callback_function is called for every event on the SDK's callback thread. with an ArxEventDispatcher,
+    the SDK's thread only queues events, which the dispatcher then hands to its handlers, and py_callback_function, if given, is
+    registered with it for every event. initializing again replaces that registration instead of adding another one. """
+    if path_dll:
+        try:
+            logi_arx_set_backend(load_dll(path_dll))
+        except SDKNotFoundException:
+            return False
+    if _arx_dll or _load_default_dll():
+        global on_callback, callback_ref, _callback_context, _dispatcher, _dispatcher_callback
         on_callback   = py_callback_function if py_callback_function else default_callback
-        callback_ref  = ctypes.byref(CALLBACK_DEFINITION(callback_wrapper))
-        identifier    = ctypes.c_wchar_p(identifier)
-        friendly_name = ctypes.c_wchar_p(friendly_name)
-        return bool(arx_dll.LogiArxInit(identifier, friendly_name, callback_ref))
+        _dispatcher   = dispatcher
+        registration  = (dispatcher, py_callback_function) if dispatcher is not None and py_callback_function else None
+        if registration != _dispatcher_callback:
+            if _dispatcher_callback is not None:
+                _dispatcher_callback[0]._off_any(_dispatcher_callback[1])
+            if registration is not None:
+                dispatcher.on_any(py_callback_function)
+            _dispatcher_callback = registration
+        if _callback_context is None:
+            _callback_context = logiArxCbContext(CALLBACK_DEFINITION(callback_wrapper), None)
+        callback_ref  = ctypes.byref(_callback_context)
+        _invalidate_caches(files = False)
+        result = bool(_arx_dll.LogiArxInit(identifier, friendly_name, callback_ref))
+        if result:
+            for image in list(_live_images):
+                image._resume()
+        return result
     else:
         return False
 
 def logi_arx_add_file_as(file_path, file_name, mime_type = None):
     """ sends a file to the device from local a file_path and assigns a file_name to it. mime_type, if assigned, specifies the MIME type of the file. """
-    if arx_dll:
-        file_path = ctypes.c_wchar_p(file_path)
-        file_name = ctypes.c_wchar_p(file_name)
-        mime_type = ctypes.c_wchar_p(mime_type) if mime_type else ctypes.c_wchar_p('')
-        return bool(arx_dll.LogiArxAddFileAs(file_path, file_name, mime_type))
+    if _arx_dll or _load_default_dll():
+        mime_type = mime_type if mime_type else ''
+        return bool(_arx_dll.LogiArxAddFileAs(file_path, file_name, mime_type))
     else:
         return False
 
 def logi_arx_add_content_as(content, size, file_name, mime_type = None):
-    """ sends content to the device and saves it to a virtual file called file_name. mime_type, if assigned, specifies the MIME type of the file. """
-    if arx_dll:
-        content   = ctypes.c_void_p(content)
-        size      = ctypes.c_int(size)
-        file_name = ctypes.c_wchar_p(file_name)
-        mime_type = ctypes.c_wchar_p(mime_type) if mime_type else ctypes.c_wchar_p('')
-        return bool(arx_dll.LogiArxAddContentAs(content, size, file_name, mime_type))
+    """ sends content to the device and saves it to a virtual file called file_name. mime_type, if assigned, specifies the MIME type of the file.
+    content is any object supporting the buffer protocol (bytes, bytearray, memoryview, mmap, numpy array, ...) and is passed to the SDK
+    without copying. size may be None to send the whole buffer. an int address or ctypes pointer is passed as is and needs a size. """
+    if _arx_dll or _load_default_dll():
+        mime_type = mime_type if mime_type else ''
+        with _BorrowedBuffer(content) as (address, nbytes):
+            if size is None:
+                if nbytes is None:
+                    raise ValueError('size is required for content without a buffer')
+                size = nbytes
+            elif nbytes is not None and size > nbytes:
+                raise ValueError('size {} is larger than the {} bytes of content'.format(size, nbytes))
+            return bool(_arx_dll.LogiArxAddContentAs(address, size, file_name, mime_type))
     else:
         return False
 
 def logi_arx_add_utf8_string_as(string_content, file_name, mime_type = None):
     """ sends a UTF8 string to the device and saves it to a virtual file called file_name. mime_type, if assigned, specifies the MIME type of the file. """
-    if arx_dll:
-        string_content = ctypes.c_wchar_p(string_content)
-        file_name      = ctypes.c_wchar_p(file_name)
-        mime_type      = ctypes.c_wchar_p(mime_type) if mime_type else ctypes.c_wchar_p('')
-        return bool(arx_dll.LogiArxAddUTF8StringAs(string_content, file_name, mime_type))
+    if _arx_dll or _load_default_dll():
+        mime_type      = mime_type if mime_type else ''
+        return bool(_arx_dll.LogiArxAddUTF8StringAs(string_content, file_name, mime_type))
     else:
         return False
 
 def logi_arx_add_image_from_bitmap(bitmap, width, height, file_name):
     """ compresses the image specified by the BGRA byte array bitmap (interpretting the array using width and height) into a png file with the name specified by file_name,
-    then sends it over to the the device. note that the color bit order is BGRA rather than standard RGBA bit order. """
-    if arx_dll:
-        bitmap    = ctypes.c_char_p(bitmap)
-        width     = ctypes.c_int(width)
-        height    = ctypes.c_int(height)
-        file_name = ctypes.c_wchar_p(file_name)
-        return bool(arx_dll.LogiArxAddImageFromBitmap(bitmap, width, height, file_name))
+    then sends it over to the the device. note that the color bit order is BGRA rather than standard RGBA bit order. bitmap is any object
+    supporting the buffer protocol and is passed to the SDK without copying, after checking it holds width * height * 4 bytes. """
+    if _arx_dll or _load_default_dll():
+        with _BorrowedBuffer(bitmap) as (address, nbytes):
+            if nbytes is not None and nbytes < width * height * 4:
+                raise ValueError('bitmap has {} bytes, a {}x{} BGRA image needs {}'.format(nbytes, width, height, width * height * 4))
+            return bool(_arx_dll.LogiArxAddImageFromBitmap(address, width, height, file_name))
     else:
         return False
 
 def logi_arx_set_index(file_name):
     """ sets which of the sent files is the index. (first one to be displayed in the applet) """
-    if arx_dll:
-        file_name = ctypes.c_wchar_p(file_name)
-        return bool(arx_dll.LogiArxSetIndex(file_name))
+    if _arx_dll or _load_default_dll():
+        _invalidate_caches(files = False)
+        return bool(_arx_dll.LogiArxSetIndex(file_name))
     else:
         return False
 
 def logi_arx_set_tag_property_by_id(tag_id, prop, new_value):
     """ change at runtime a prop (property) on the tag with the id tag_id from the old value to the new_value. """
-    if arx_dll:
-        tag_id    = ctypes.c_wchar_p(tag_id)
-        prop      = ctypes.c_wchar_p(prop)
-        new_value = ctypes.c_wchar_p(new_value)
-        return bool(arx_dll.LogiArxSetTagPropertyById(tag_id, prop, new_value))
+    if _arx_dll or _load_default_dll():
+        return bool(_arx_dll.LogiArxSetTagPropertyById(tag_id, prop, new_value))
     else:
         return False
 
 def logi_arx_set_tags_property_by_class(tag_class, prop, new_value):
     """ change at runtime a prop (property) on the tag with the class tag_class from the old value to the new_value. """
-    if arx_dll:
-        tag_class = ctypes.c_wchar_p(tag_class)
-        prop      = ctypes.c_wchar_p(prop)
-        new_value = ctypes.c_wchar_p(new_value)
-        return bool(arx_dll.LogiArxSetTagsPropertyByClass(tag_class, prop, new_value))
+    if _arx_dll or _load_default_dll():
+        return bool(_arx_dll.LogiArxSetTagsPropertyByClass(tag_class, prop, new_value))
     else:
         return False
 
 def logi_arx_set_tag_content_by_id(tag_id, new_content):
     """ change at runtime the content (innerHTML) of a tag with the id tag_id from the old content to the new_content. """
-    if arx_dll:
-        tag_id      = ctypes.c_wchar_p(tag_id)
-        new_content = ctypes.c_wchar_p(new_content)
-        return bool(arx_dll.LogiArxSetTagContentById(tag_id, new_content))
+    if _arx_dll or _load_default_dll():
+        return bool(_arx_dll.LogiArxSetTagContentById(tag_id, new_content))
     else:
         return False
 
 def logi_arx_set_tags_content_by_class(tag_class, new_content):
     """ change at runtime the content (innerHTML) of a tag with the class tag_class from the old content to the new_content. """
-    if arx_dll:
-        tag_class   = ctypes.c_wchar_p(tag_class)
-        new_content = ctypes.c_wchar_p(new_content)
-        return bool(arx_dll.LogiArxSetTagsPropertyByClass(tag_class, new_content))
+    if _arx_dll or _load_default_dll():
+        return bool(_arx_dll.LogiArxSetTagsContentByClass(tag_class, new_content))
     else:
         return False
 
 def logi_arx_get_last_error():
     """ each function returns a bool. to get detailed info on the last error code, call this function. """
-    if arx_dll:
-        return int(arx_dll.LogiArxGetLastError())
+    if _arx_dll or _load_default_dll():
+        return int(_arx_dll.LogiArxGetLastError())
     else:
         return False
 
 def logi_arx_shutdown():
     """ shuts down the applet on the app. """
-    if arx_dll:
-        arx_dll.LogiArxShutdown()
+    if _arx_dll or _load_default_dll():
+        _invalidate_caches()
+        for image in list(_live_images):
+            image._park()
+        _arx_dll.LogiArxShutdown()
         return True
     else:
-        return False
\ No newline at end of file
+        return False
+
+# Tag Cache
+#
+_monotonic = getattr(time, 'perf_counter', time.time)
+
+# every live cache of what the device is showing or holding, so the events that reset the applet can invalidate them all. tag values
+# are reset whenever the index page is (re)loaded, uploaded files only when a device arrives or the applet shuts down.
+_tag_caches  = weakref.WeakSet()
+_file_caches = weakref.WeakSet()
+# every live image stream, which send their last frame again when a device arrives and hold frames back while the applet is shut down
+_live_images = weakref.WeakSet()
+
+def _invalidate_caches(tags = True, files = True):
+    for cache in list(_tag_caches) if tags else []:
+        cache.invalidate()
+    for cache in list(_file_caches) if files else []:
+        cache.invalidate()
+
+class ArxTagCache(object):
+    """ remembers the last content and property values sent for each tag id and tag class, and skips the SDK call when a set_* call
+        would send the same value again. setting a tag class conservatively forgets the values remembered for tag ids under the same
+        content or property, and the other way around, because the SDK does not say which ids carry which classes.
+
+        with a window (in seconds), writes to the same tag and property that come sooner than window after the last one sent are held
+        back and collapse to the latest value, which flush() sends once the window has passed. held back writes are only sent by flush(),
+        so a caller that stops writing must keep calling it, unless max_delay is set: then a timer thread sends each held back write once
+        its window has passed, and at the latest max_delay seconds after it was held back. the cache forgets everything it
+        remembered when the index is set, a mobile device arrives, or the applet is initialized or shut down. pending writes survive that,
+        since they are still the newest values. """
+
+    def __init__(self, window = 0.0, max_delay = None):
+        self.window     = window
+        self.max_delay  = max_delay
+        self.sent       = 0
+        self.suppressed = 0
+        self.collapsed  = 0
+        self._values    = {}
+        self._sent_at   = {}
+        self._pending   = collections.OrderedDict()
+        self._held_at   = {}
+        self._timer     = None
+        self._lock      = threading.Lock()
+        _tag_caches.add(self)
+
+    def set_tag_content_by_id(self, tag_id, new_content):
+        """ cached logi_arx_set_tag_content_by_id. """
+        return self._write(('id', tag_id, None), new_content)
+
+    def set_tags_content_by_class(self, tag_class, new_content):
+        """ cached logi_arx_set_tags_content_by_class. """
+        return self._write(('class', tag_class, None), new_content)
+
+    def set_tag_property_by_id(self, tag_id, prop, new_value):
+        """ cached logi_arx_set_tag_property_by_id. """
+        return self._write(('id', tag_id, prop), new_value)
+
+    def set_tags_property_by_class(self, tag_class, prop, new_value):
+        """ cached logi_arx_set_tags_property_by_class. """
+        return self._write(('class', tag_class, prop), new_value)
+
+    def pending(self):
+        """ returns the number of writes held back for the next flush(). """
+        return len(self._pending)
+
+    def flush(self, force = False):
+        """ sends the held back writes whose window or max_delay has passed, or all of them with force. returns False if any SDK call
+            failed. """
+        now = _monotonic()
+        with self._lock:
+            due = [(key, value) for key, value in self._pending.items() if force or self._due(key, now) <= now]
+            for key, _ in due:
+                del self._pending[key]
+                del self._held_at[key]
+        result = True
+        for key, value in due:
+            result = self._send(key, value, now) and result
+        with self._lock:
+            self._schedule(_monotonic())
+        return result
+
+    def invalidate(self):
+        """ forgets every value remembered as shown, so the next write of each tag goes through. """
+        with self._lock:
+            self._values.clear()
+            self._sent_at.clear()
+
+    def stats(self):
+        """ returns a dict of SDK calls sent, writes suppressed as unchanged, writes collapsed into a later one and writes pending. """
+        return {
+            'sent':       self.sent,
+            'suppressed': self.suppressed,
+            'collapsed':  self.collapsed,
+            'pending':    len(self._pending),
+        }
+
+    def _due(self, key, now):
+        """ returns the time the held back write of key is due, once its window has passed or at its max_delay deadline. """
+        due = self._sent_at.get(key, now - self.window) + self.window
+        if self.max_delay is not None:
+            due = min(due, self._held_at[key] + self.max_delay)
+        return due
+
+    def _schedule(self, now):
+        """ starts the timer for the earliest due held back write, unless there is no max_delay or the timer is already running. """
+        if self.max_delay is None or self._timer is not None or not self._pending:
+            return
+        delay       = min(self._due(key, now) for key in self._pending) - now
+        self._timer = threading.Timer(max(delay, 0.0), self._expired)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expired(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def _write(self, key, value):
+        now = _monotonic()
+        with self._lock:
+            if key in self._pending:
+                self.collapsed += 1
+                if self._values.get(key, self) == value:
+                    del self._pending[key]
+                    del self._held_at[key]
+                else:
+                    self._pending[key] = value
+                return True
+            if self._values.get(key, self) == value:
+                self.suppressed += 1
+                return True
+            if self.window and key in self._sent_at and now - self._sent_at[key] < self.window:
+                self._pending[key] = value
+                self._held_at[key] = now
+                self._schedule(now)
+                return True
+        return self._send(key, value, now)
+
+    def _send(self, key, value, now):
+        kind, target, prop = key
+        if kind == 'id':
+            if prop is None:
+                result = logi_arx_set_tag_content_by_id(target, value)
+            else:
+                result = logi_arx_set_tag_property_by_id(target, prop, value)
+        else:
+            if prop is None:
+                result = logi_arx_set_tags_content_by_class(target, value)
+            else:
+                result = logi_arx_set_tags_property_by_class(target, prop, value)
+        with self._lock:
+            self.sent += 1
+            other = 'class' if kind == 'id' else 'id'
+            for stale in [stale for stale in self._values if stale[0] == other and stale[2] == prop]:
+                del self._values[stale]
+            if result:
+                self._values[key]  = value
+                self._sent_at[key] = now
+            else:
+                # the device may or may not show the value now, so the next write must go through
+                self._values.pop(key, None)
+        return result
+
+
+# Upload Cache
+#
+def _sha1(data = b''):
+    """ returns a hashlib.sha1 of data. hashlib is imported on first use, since loading OpenSSL is a noticeable part of the import time. """
+    import hashlib
+    return hashlib.sha1(data)
+
+def _content_digest(content, size):
+    """ returns the digest and length of the first size bytes of content, or of all of them if size is None, hashing buffers in place. """
+    with _BorrowedBuffer(content) as (address, nbytes):
+        if nbytes is None:
+            if size is None:
+                raise ValueError('size is required for content without a buffer')
+            nbytes = size
+        elif size is not None:
+            nbytes = min(size, nbytes)
+        if isinstance(address, ctypes.c_void_p):
+            address = address.value
+        elif isinstance(address, ctypes._Pointer):
+            address = ctypes.addressof(address.contents)
+        elif not isinstance(address, int):
+            address = ctypes.cast(address, ctypes.c_void_p).value
+        return _sha1((ctypes.c_char * nbytes).from_address(address)).digest(), nbytes
+
+class ArxUploadCache(object):
+    """ remembers a digest and mime type of the last file uploaded under each file_name, and skips the SDK call when add_*_as would upload
+        the same payload again, such as when an applet re-sends its pages and assets on every view switch. add_file_as reuses the
+        digest of a local file while its modification time and size are unchanged, so unchanged assets are not read again.
+
+        the cache forgets what the device holds when a mobile device arrives or the applet is shut down. """
+
+    def __init__(self):
+        self.hits        = 0
+        self.misses      = 0
+        self.bytes_sent  = 0
+        self.bytes_saved = 0
+        self._uploaded   = {}
+        self._file_stats = {}
+        self._lock       = threading.Lock()
+        _file_caches.add(self)
+
+    def add_file_as(self, file_path, file_name, mime_type = None):
+        """ cached logi_arx_add_file_as. """
+        stat = os.stat(file_path)
+        key  = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            known = self._file_stats.get(file_path)
+        if known and known[0] == key:
+            digest = known[1]
+        else:
+            sha1 = _sha1()
+            with open(file_path, 'rb') as local_file:
+                for chunk in iter(lambda: local_file.read(1 << 16), b''):
+                    sha1.update(chunk)
+            digest = sha1.digest()
+            with self._lock:
+                self._file_stats[file_path] = (key, digest)
+        return self._upload(file_name, (digest, mime_type), stat.st_size,
+                            lambda: logi_arx_add_file_as(file_path, file_name, mime_type))[0]
+
+    def add_content_as(self, content, size, file_name, mime_type = None, digest = None):
+        """ cached logi_arx_add_content_as. digest, if the caller already has it, is the SHA-1 digest of the content and skips hashing. """
+        return self.upload_content_as(content, size, file_name, mime_type, digest)[0]
+
+    def upload_content_as(self, content, size, file_name, mime_type = None, digest = None):
+        """ add_content_as, returning (result, sent) where sent is True if the content went to the SDK and False if the cache skipped it. """
+        if digest is None:
+            digest, nbytes = _content_digest(content, size)
+        elif size is None:
+            with _BorrowedBuffer(content) as (_, nbytes):
+                pass
+        else:
+            nbytes = size
+        return self._upload(file_name, (digest, mime_type), nbytes,
+                            lambda: logi_arx_add_content_as(content, size, file_name, mime_type))
+
+    def add_utf8_string_as(self, string_content, file_name, mime_type = None):
+        """ cached logi_arx_add_utf8_string_as. """
+        encoded = string_content.encode('utf-8') if not isinstance(string_content, bytes) else string_content
+        digest  = _sha1(encoded).digest()
+        return self._upload(file_name, (digest, mime_type), len(encoded),
+                            lambda: logi_arx_add_utf8_string_as(string_content, file_name, mime_type))[0]
+
+    def uploaded(self, file_name):
+        """ returns True if the cache knows the device holds a file called file_name. """
+        return file_name in self._uploaded
+
+    def invalidate(self):
+        """ forgets every file the device is known to hold, so the next upload of each goes through. local file digests are kept. """
+        with self._lock:
+            self._uploaded.clear()
+
+    def stats(self):
+        """ returns a dict of uploads skipped (hits) and sent (misses) and the payload bytes sent and saved. """
+        return {
+            'hits':        self.hits,
+            'misses':      self.misses,
+            'bytes_sent':  self.bytes_sent,
+            'bytes_saved': self.bytes_saved,
+        }
+
+    def _upload(self, file_name, entry, size, send):
+        """ returns (result, sent) of sending entry as file_name unless the device already holds it. """
+        with self._lock:
+            if self._uploaded.get(file_name) == entry:
+                self.hits        += 1
+                self.bytes_saved += size
+                return True, False
+            self.misses += 1
+        result = send()
+        with self._lock:
+            if result:
+                self.bytes_sent          += size
+                self._uploaded[file_name] = entry
+            else:
+                self._uploaded.pop(file_name, None)
+        return result, True
+
+
+# Live Images
+#
+def _percentile(samples, fraction):
+    """ returns the sample at the given fraction (0-1) of the sorted samples, or None if there are none. """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _prepare_bitmap(data, width, height, factor, swap):
+    """ returns (BGRA bytes, width, height) of the width x height 4 byte per pixel image data, keeping every factor-th pixel of every
+        factor-th row and swapping the R and B channels of RGBA data. """
+    if factor == 1 and not swap:
+        return data, width, height
+    out_width  = (width + factor - 1) // factor
+    out_height = (height + factor - 1) // factor
+    numpy      = sys.modules.get('numpy')
+    if numpy is not None:
+        pixels = numpy.frombuffer(data, numpy.uint8, width * height * 4).reshape(height, width, 4)[::factor, ::factor]
+        if swap:
+            pixels = pixels[:, :, (2, 1, 0, 3)]
+        return numpy.ascontiguousarray(pixels).tobytes(), out_width, out_height
+    stride   = width * 4
+    out_row  = out_width * 4
+    step     = 4 * factor
+    channels = (2, 1, 0, 3) if swap else (0, 1, 2, 3)
+    bitmap   = bytearray(out_row * out_height)
+    for row in range(out_height):
+        source = data[row * factor * stride:row * factor * stride + stride]
+        start  = row * out_row
+        for channel, source_channel in enumerate(channels):
+            bitmap[start + channel:start + out_row:4] = source[source_channel::step]
+    return bytes(bitmap), out_width, out_height
+
+class ArxLiveImage(object):
+    """ streams frames of a live image, such as a graph rendered every tick, to the device as the file file_name through
+        logi_arx_add_image_from_bitmap, which PNG-compresses every image inside the DLL.
+
+        submit() takes a frame from any thread and returns at once. the frame is copied into a single slot, so a newer frame replaces one
+        that was not taken yet (latest wins, counted as dropped). a worker thread sends at most max_fps frames per second, skips frames
+        identical to the last one sent (counted as deduplicated), and converts RGBA frames to BGRA and downscales them when sizes maps the
+        LOGI_ARX_DEVICETYPE_* of the current mobile device to a (max_width, max_height) for its screen. when a mobile device arrives, the
+        last frame is sent again. after logi_arx_shutdown, frames are held back until logi_arx_init, which sends the newest one. """
+
+    def __init__(self, file_name, width, height, max_fps = 10.0, channel_order = 'BGRA', sizes = None, latency_samples = 1024):
+        if channel_order.upper() not in ('BGRA', 'RGBA'):
+            raise ValueError('unsupported channel_order {!r}'.format(channel_order))
+        self.file_name     = file_name
+        self.width         = width
+        self.height        = height
+        self.interval      = 1.0 / max_fps if max_fps else 0.0
+        self.swap          = channel_order.upper() == 'RGBA'
+        self.sizes         = sizes if sizes is not None else {}
+        self.submitted     = 0
+        self.deduplicated  = 0
+        self.dropped       = 0
+        self.sent          = 0
+        self.failed        = 0
+        self._slot         = None
+        self._last         = None
+        self._last_key     = None
+        self._next_send    = 0.0
+        self._send_times   = collections.deque(maxlen = latency_samples)
+        self._frame_times  = collections.deque(maxlen = latency_samples)
+        self._condition    = threading.Condition(threading.Lock())
+        self._stopping     = False
+        self._parked       = False
+        self._thread       = None
+        _live_images.add(self)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ starts the worker thread. """
+        if self.running:
+            return
+        self._stopping = False
+        self._thread   = threading.Thread(target = self._run, name = 'logipy-arx-live-image')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = None):
+        """ sends the pending frame, if any and the applet is not shut down, then stops the worker thread and waits for it to exit. """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, frame, width = None, height = None):
+        """ queues frame, any buffer of width * height 4 byte pixels (bytes, bytearray, numpy array, ...), replacing a frame that was not
+            taken yet. width and height default to the stream's. """
+        width  = width if width is not None else self.width
+        height = height if height is not None else self.height
+        data   = frame if isinstance(frame, bytes) else memoryview(frame).tobytes()
+        if len(data) < width * height * 4:
+            raise ValueError('frame has {} bytes, a {}x{} image needs {}'.format(len(data), width, height, width * height * 4))
+        with self._condition:
+            if self._slot is not None:
+                self.dropped += 1
+            self._slot     = (data, width, height, _monotonic())
+            self.submitted += 1
+            self._condition.notify()
+
+    def invalidate(self):
+        """ forgets the frame the device shows and queues it again, unless a newer frame is pending. """
+        with self._condition:
+            self._last_key = None
+            if self._slot is None and self._last is not None:
+                data, width, height, _ = self._last
+                # latency is measured from now, the frame itself was already sent once
+                self._slot = (data, width, height, _monotonic())
+                self._condition.notify()
+
+    def _park(self):
+        """ holds frames back until _resume(), since the applet they would be sent to is shut down. """
+        with self._condition:
+            self._parked   = True
+            self._last_key = None
+
+    def _resume(self):
+        """ sends frames again, starting with the newest one, which the newly initialized applet does not hold. """
+        with self._condition:
+            self._parked = False
+            self._condition.notify()
+        self.invalidate()
+
+    def stats(self):
+        """ returns the frame counters, the p50/p99 milliseconds spent in the DLL per frame sent and the p50/p99 milliseconds from
+            submit() to the frame being sent. """
+        with self._condition:
+            send_times  = list(self._send_times)
+            frame_times = list(self._frame_times)
+        result = {
+            'submitted':    self.submitted,
+            'deduplicated': self.deduplicated,
+            'dropped':      self.dropped,
+            'sent':         self.sent,
+            'failed':       self.failed,
+        }
+        for name, samples in (('send', send_times), ('latency', frame_times)):
+            for label, fraction in (('p50', 0.50), ('p99', 0.99)):
+                value = _percentile(samples, fraction)
+                result['{}_{}_ms'.format(name, label)] = value * 1000.0 if value is not None else None
+        return result
+
+    def _factor(self, width, height):
+        size = self.sizes.get(mobile_device_type)
+        if not size:
+            return 1
+        max_width, max_height = size
+        return max(1, -(-width // max_width), -(-height // max_height))
+
+    def _run(self):
+        condition = self._condition
+        while True:
+            with condition:
+                while (self._slot is None or self._parked) and not self._stopping:
+                    condition.wait()
+                # hold frames back until the rate cap allows the next send, so the newest one submitted meanwhile wins
+                while not self._stopping and _monotonic() < self._next_send:
+                    condition.wait(self._next_send - _monotonic())
+                # a stream parked by logi_arx_shutdown keeps its pending frame for the next logi_arx_init
+                item, self._slot = (None, self._slot) if self._parked else (self._slot, None)
+                if item is None:
+                    # parked during the rate wait: wait for logi_arx_init again rather than ending the stream
+                    if self._stopping:
+                        break
+                    continue
+                self._last = item
+            data, width, height, submitted_at = item
+            factor = self._factor(width, height)
+            key    = (_sha1(data).digest(), width, height, factor)
+            if key == self._last_key:
+                self.deduplicated += 1
+                continue
+            bitmap, out_width, out_height = _prepare_bitmap(data, width, height, factor, self.swap)
+            started = _monotonic()
+            result  = logi_arx_add_image_from_bitmap(bitmap, out_width, out_height, self.file_name)
+            now     = _monotonic()
+            with condition:
+                if result:
+                    self.sent     += 1
+                    self._last_key = key
+                else:
+                    self.failed   += 1
+                self._next_send = started + self.interval
+                self._send_times.append(now - started)
+                self._frame_times.append(now - submitted_at)
+
+
+# Events
+#
+class ArxEventDispatcher(object):
+    """ hands Arx events to handlers away from the SDK's callback thread, so a slow handler never blocks the SDK.
+
+        pass the dispatcher to logi_arx_init. the callback then only appends (event_type, event_value, event_arg, time) to a bounded
+        deque, which is atomic without a lock; when more than max_pending events are waiting, the oldest are discarded and counted as
+        overflowed. events are dispatched on the dispatcher's thread after start(), on an asyncio loop after attach(loop), or by
+        calling dispatch_pending() from your own loop.
+
+        handlers are called as handler(event_type, event_value, event_arg, context), like logi_arx_init callbacks, and are looked up by
+        event type (on()) and, for taps, by tag id (on_tap()), after the handlers for every event (on_any()). on an asyncio loop, handlers
+        may be coroutine functions. the registration methods return the handler, so they can be used as decorators. """
+
+    def __init__(self, max_pending = 1024, latency_samples = 1024):
+        self.received       = 0
+        self.dispatched     = 0
+        self.overflowed     = 0
+        self.errors         = 0
+        self.max_depth      = 0
+        self._queue         = collections.deque(maxlen = max_pending)
+        self._any           = ()
+        self._by_type       = {}
+        self._by_tag        = {}
+        self._queue_times   = collections.deque(maxlen = latency_samples)
+        self._handler_times = collections.deque(maxlen = latency_samples)
+        self._lock          = threading.Lock()
+        self._wakeup        = threading.Event()
+        self._stopping      = False
+        self._thread        = None
+        self._loop          = None
+        self._scheduled     = False
+
+    def on(self, event_type, handler = None):
+        """ registers handler for events of event_type, a LOGI_ARX_EVENT_* constant. """
+        if handler is None:
+            return functools.partial(self.on, event_type)
+        with self._lock:
+            self._by_type[event_type] = self._by_type.get(event_type, ()) + (handler,)
+        return handler
+
+    def on_tap(self, tag_id, handler = None):
+        """ registers handler for taps on the tag with the id tag_id. """
+        if handler is None:
+            return functools.partial(self.on_tap, tag_id)
+        with self._lock:
+            self._by_tag[tag_id] = self._by_tag.get(tag_id, ()) + (handler,)
+        return handler
+
+    def on_any(self, handler):
+        """ registers handler for every event. """
+        with self._lock:
+            self._any = self._any + (handler,)
+        return handler
+
+    def off(self, handler):
+        """ unregisters handler from everything it was registered for. """
+        with self._lock:
+            self._any     = tuple(registered for registered in self._any if registered is not handler)
+            self._by_type = dict((key, tuple(registered for registered in handlers if registered is not handler))
+                                 for key, handlers in self._by_type.items())
+            self._by_tag  = dict((key, tuple(registered for registered in handlers if registered is not handler))
+                                 for key, handlers in self._by_tag.items())
+
+    def _off_any(self, handler):
+        """ unregisters one on_any() registration of handler, leaving any other registration of it in place. """
+        with self._lock:
+            handlers = list(self._any)
+            if handler in handlers:
+                handlers.remove(handler)
+                self._any = tuple(handlers)
+
+    def post(self, event_type, event_value, event_arg):
+        """ queues an event for dispatch. called on the SDK's callback thread, so it does not take locks or call handlers. """
+        queue = self._queue
+        if len(queue) == queue.maxlen:
+            self.overflowed += 1
+        queue.append((event_type, event_value, event_arg, _monotonic()))
+        self.received += 1
+        depth = len(queue)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        loop = self._loop
+        if loop is not None:
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon_threadsafe(self._dispatch_scheduled)
+        else:
+            self._wakeup.set()
+
+    def depth(self):
+        """ returns the number of events waiting for dispatch. """
+        return len(self._queue)
+
+    def dispatch_pending(self, max_events = None):
+        """ dispatches the queued events, or at most max_events of them, on the calling thread. returns the number dispatched. """
+        queue      = self._queue
+        dispatched = 0
+        while queue and (max_events is None or dispatched < max_events):
+            try:
+                event_type, event_value, event_arg, posted = queue.popleft()
+            except IndexError:
+                break
+            self._dispatch(event_type, event_value, event_arg, posted)
+            dispatched += 1
+        return dispatched
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ starts dispatching on a dedicated thread. """
+        if self.running:
+            return
+        self._stopping = False
+        self._thread   = threading.Thread(target = self._run, name = 'logipy-arx-events')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = None):
+        """ dispatches the queued events, then stops the dispatcher thread and waits for it to exit. """
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def attach(self, loop):
+        """ dispatches events on the asyncio loop from now on, scheduling coroutine handlers as tasks on it. None detaches. """
+        self._loop = loop
+        if loop is not None and self._queue:
+            self._scheduled = True
+            loop.call_soon_threadsafe(self._dispatch_scheduled)
+
+    def stats(self):
+        """ returns the event counters, the current and highest queue depth, and the p50/p99 milliseconds events waited in the queue and
+            handlers ran for. """
+        with self._lock:
+            queue_times   = list(self._queue_times)
+            handler_times = list(self._handler_times)
+        result = {
+            'received':   self.received,
+            'dispatched': self.dispatched,
+            'overflowed': self.overflowed,
+            'errors':     self.errors,
+            'depth':      len(self._queue),
+            'max_depth':  self.max_depth,
+        }
+        for name, samples in (('queue', queue_times), ('handler', handler_times)):
+            for label, fraction in (('p50', 0.50), ('p99', 0.99)):
+                value = _percentile(samples, fraction)
+                result['{}_{}_ms'.format(name, label)] = value * 1000.0 if value is not None else None
+        return result
+
+    def _dispatch(self, event_type, event_value, event_arg, posted):
+        _track_event(event_type, event_value)
+        handlers = self._any + self._by_type.get(event_type, ())
+        if event_type == LOGI_ARX_EVENT_TAP_ON_TAG:
+            handlers = handlers + self._by_tag.get(event_arg, ())
+        started = _monotonic()
+        for handler in handlers:
+            try:
+                result = handler(event_type, event_value, event_arg, None)
+                if result is not None and self._loop is not None and hasattr(result, '__await__'):
+                    import asyncio
+                    asyncio.ensure_future(result, loop = self._loop)
+            except Exception:
+                import logging
+                self.errors += 1
+                logging.getLogger(__name__).exception('Arx event handler %r failed', handler)
+        finished = _monotonic()
+        with self._lock:
+            self._queue_times.append(started - posted)
+            if handlers:
+                self._handler_times.append(finished - started)
+        self.dispatched += 1
+
+    def _dispatch_scheduled(self):
+        self._scheduled = False
+        self.dispatch_pending()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.dispatch_pending()
+            if self._stopping:
+                self.dispatch_pending()
+                break
+
+
+# State Sync
+#
+STATE_SYNC_TAG_ID = 'logipy-state'
+
+# the runtime script ArxStateSync.inject() adds to the index page. it watches the hidden signal tag, whose content ArxStateSync sets to
+# the number of the latest state file, and applies every state file it has not applied yet in order. the files rotate through
+# STATE_SYNC_FILES names, so the page only misses updates if it falls that many behind.
+STATE_SYNC_FILES = 16
+
+_STATE_SYNC_SCRIPT = '''<div id="%(tag)s" style="display:none">0</div>
+<script>
+(function () {
+    var signal = document.getElementById('%(tag)s'), applied = 0, loading = false;
+    function assign(element, path, value) {
+        var parts = path.split('.'), target = element;
+        for (var i = 0; i < parts.length - 1; i++) { target = target[parts[i]]; }
+        target[parts[parts.length - 1]] = value;
+    }
+    function apply(diff) {
+        for (var id in diff) {
+            var element = document.getElementById(id), value = diff[id];
+            if (!element) { continue; }
+            if (value !== null && typeof value === 'object') {
+                for (var path in value) { assign(element, path, value[path]); }
+            } else {
+                element.innerHTML = value;
+            }
+        }
+    }
+    function next() {
+        var latest = parseInt(signal.textContent, 10) || 0;
+        if (loading || applied >= latest) { return; }
+        var version = latest - applied > %(files)d ? latest - %(files)d + 1 : applied + 1;
+        var request = new XMLHttpRequest();
+        loading = true;
+        request.open('GET', '%(prefix)s' + (version %% %(files)d) + '.json?v=' + version, true);
+        request.onload = function () {
+            apply(JSON.parse(request.responseText));
+            applied = version;
+            loading = false;
+            next();
+        };
+        request.onerror = function () { loading = false; };
+        request.send();
+    }
+    new MutationObserver(next).observe(signal, { childList: true, characterData: true, subtree: true });
+})();
+</script>
+'''
+
+class ArxStateSync(object):
+    """ keeps the tags of an applet page in sync with a python dict with as few SDK calls as possible.
+
+        inject() adds a runtime script and a hidden signal tag to the index page. publish(state) then compares state with the state
+        published last and sends only the changed keys. a key is a tag id; a string or number value is the tag's content, a dict value
+        maps properties such as 'style.width' to their values. the changes go out as one JSON file through logi_arx_add_utf8_string_as,
+        followed by a signal tag update telling the page script to apply it, so any number of changes costs two SDK calls. when no more
+        than per_tag_max tags and properties changed, they are set with logi_arx_set_tag_content_by_id and
+        logi_arx_set_tag_property_by_id instead, which is cheaper for tiny changes.
+
+        the published state is forgotten when the index is set, a mobile device arrives or the applet is initialized or shut down, so
+        the next publish() sends the whole state. keys missing from a published state are left as they are on the page. """
+
+    def __init__(self, per_tag_max = 2, file_prefix = 'logipy-state-'):
+        self.per_tag_max  = per_tag_max
+        self.file_prefix  = file_prefix
+        self.version      = 0
+        self.files_sent   = 0
+        self.tag_calls    = 0
+        self.bytes_sent   = 0
+        self._published   = {}
+        self._lock        = threading.Lock()
+        _tag_caches.add(self)
+
+    def runtime_script(self):
+        """ returns the HTML of the signal tag and runtime script to place in the body of the index page. """
+        return _STATE_SYNC_SCRIPT % {'tag': STATE_SYNC_TAG_ID, 'files': STATE_SYNC_FILES, 'prefix': self.file_prefix}
+
+    def inject(self, index_html):
+        """ returns index_html with the runtime script added before </body>, or at the end if there is none. """
+        position = index_html.lower().rfind('</body>')
+        if position < 0:
+            return index_html + self.runtime_script()
+        return index_html[:position] + self.runtime_script() + index_html[position:]
+
+    def diff(self, state):
+        """ returns the changes publish(state) would send, as a dict of tag id -> content, or tag id -> dict of changed properties. """
+        changes = {}
+        for tag_id, value in state.items():
+            published = self._published.get(tag_id, self)
+            if isinstance(value, dict):
+                published = published if isinstance(published, dict) else {}
+                changed   = dict((prop, prop_value) for prop, prop_value in value.items()
+                                 if prop not in published or published[prop] != prop_value)
+                if changed:
+                    changes[tag_id] = changed
+            elif published != value:
+                changes[tag_id] = value
+        return changes
+
+    def publish(self, state):
+        """ sends the changes between state and the state published last. returns False if an SDK call failed, in which case the
+            changes are sent again by the next publish(). """
+        import json
+        with self._lock:
+            changes = self.diff(state)
+            if not changes:
+                return True
+            updates = sum(len(value) if isinstance(value, dict) else 1 for value in changes.values())
+            if updates <= self.per_tag_max:
+                result = self._send_per_tag(changes)
+            else:
+                self.version += 1
+                payload = json.dumps(changes, separators = (',', ':'))
+                name    = '{}{}.json'.format(self.file_prefix, self.version % STATE_SYNC_FILES)
+                result  = logi_arx_add_utf8_string_as(payload, name, 'application/json')
+                result  = result and logi_arx_set_tag_content_by_id(STATE_SYNC_TAG_ID, str(self.version))
+                self.files_sent += 1
+                self.bytes_sent += len(payload.encode('utf-8'))
+                if not result:
+                    # the page did not see this version, so it must not wait for it
+                    self.version -= 1
+            if result:
+                for tag_id, value in changes.items():
+                    if isinstance(value, dict):
+                        published = self._published.get(tag_id)
+                        published = dict(published) if isinstance(published, dict) else {}
+                        published.update(value)
+                        self._published[tag_id] = published
+                    else:
+                        self._published[tag_id] = value
+            return result
+
+    def invalidate(self):
+        """ forgets the published state, so the next publish() sends all of it. """
+        with self._lock:
+            self._published.clear()
+            self.version = 0
+
+    def stats(self):
+        """ returns the state file, per-tag call and payload byte counters and the current version. """
+        return {
+            'version':    self.version,
+            'files_sent': self.files_sent,
+            'tag_calls':  self.tag_calls,
+            'bytes_sent': self.bytes_sent,
+        }
+
+    def _send_per_tag(self, changes):
+        result = True
+        for tag_id, value in changes.items():
+            if isinstance(value, dict):
+                for prop, prop_value in value.items():
+                    result = logi_arx_set_tag_property_by_id(tag_id, prop, _text(prop_value)) and result
+                    self.tag_calls  += 1
+                    self.bytes_sent += len(_text(prop_value).encode('utf-8'))
+            else:
+                result = logi_arx_set_tag_content_by_id(tag_id, _text(value)) and result
+                self.tag_calls  += 1
+                self.bytes_sent += len(_text(value).encode('utf-8'))
+        return result
+
+def _text(value):
+    """ returns value as the string the page script would show for it, so a per-tag update shows the same as a state file. """
+    if value is True or value is False:
+        return 'true' if value else 'false'
+    if value is None:
+        # the page script assigns null from a state file, which innerHTML and style properties take as an empty string
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # javascript numbers have no separate integer type and print 1.0 as 1
+        return '{:d}'.format(int(value))
+    return value if isinstance(value, str) else '{}'.format(value)
@@ -0,0 +1,237 @@
+"""
+logi_arx_bundle.py : Parallel preparation and ordered upload of Arx applet bundles
+
+Logitech Gaming Arx Control SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import string
+import time
+
+from logipy import logi_arx
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# MIME types of the Arx applet formats the python mimetypes table may not know on every platform
+_MIME_TYPES = {
+    '.html':  'text/html',
+    '.htm':   'text/html',
+    '.css':   'text/css',
+    '.js':    'application/javascript',
+    '.json':  'application/json',
+    '.svg':   'image/svg+xml',
+    '.png':   'image/png',
+    '.jpg':   'image/jpeg',
+    '.jpeg':  'image/jpeg',
+    '.gif':   'image/gif',
+    '.woff':  'application/font-woff',
+    '.woff2': 'font/woff2',
+    '.ttf':   'font/ttf',
+}
+
+# upload order by MIME type. pages are sent after the stylesheets, scripts, fonts and images they reference, so the index never shows
+# with missing assets, and the index page itself always goes last.
+_UPLOAD_RANKS = (
+    ('font/', 0),
+    ('application/font', 0),
+    ('image/', 1),
+    ('text/css', 2),
+    ('application/json', 3),
+    ('application/javascript', 4),
+    ('text/html', 6),
+)
+_OTHER_RANK = 5
+
+_TEXT_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+_CSS_COMMENTS  = re.compile(r'/\*.*?\*/', re.DOTALL)
+_CSS_SPACES    = re.compile(r'\s*([{}:;,>])\s*')
+_BLANK_LINES   = re.compile(r'\n\s*\n+')
+
+
+def guess_mime_type(file_name):
+    """ returns the MIME type for file_name from its extension, or application/octet-stream. """
+    extension = os.path.splitext(file_name)[1].lower()
+    return _MIME_TYPES.get(extension) or mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+def _is_text(mime_type):
+    return mime_type.startswith(_TEXT_TYPES)
+
+def _upload_rank(mime_type):
+    for prefix, rank in _UPLOAD_RANKS:
+        if mime_type.startswith(prefix):
+            return rank
+    return _OTHER_RANK
+
+def minify(text, mime_type):
+    """ returns text with comments and redundant whitespace removed for CSS, and with indentation and blank lines removed for
+        JavaScript and HTML. the rewrites are conservative and leave string contents alone except for leading whitespace. """
+    if mime_type == 'text/css':
+        text = _CSS_COMMENTS.sub('', text)
+        text = _CSS_SPACES.sub(r'\1', text)
+        return ' '.join(text.split())
+    if mime_type in ('application/javascript', 'text/html'):
+        text = '\n'.join(line.strip() for line in text.splitlines())
+        return _BLANK_LINES.sub('\n', text).strip()
+    return text
+
+
+class ArxAsset(object):
+    """ a file of an Arx applet bundle: the local path it is read from, the file_name it is saved as on the device, its MIME type and
+        whether it is templated with string.Template $placeholders and minified before the upload. None lets the bundle decide. """
+
+    def __init__(self, path, file_name = None, mime_type = None, template = None, minify = None):
+        self.path      = path
+        self.file_name = file_name if file_name else os.path.basename(path)
+        self.mime_type = mime_type if mime_type else guess_mime_type(self.file_name)
+        self.template  = template
+        self.minify    = minify
+
+    def __repr__(self):
+        return 'ArxAsset({!r}, {!r})'.format(self.path, self.file_name)
+
+
+def _prepare_asset(asset, context, minify_assets):
+    """ reads, templates, minifies and hashes one asset on an executor worker. returns (payload, SHA-1 digest, bytes read, seconds spent).
+        it only takes and returns picklable values, so it can also run on a ProcessPoolExecutor passed as executor. """
+    started = _clock()
+    with open(asset.path, 'rb') as asset_file:
+        payload = asset_file.read()
+    size = len(payload)
+    if _is_text(asset.mime_type):
+        use_template = asset.template if asset.template is not None else context is not None
+        use_minify   = asset.minify if asset.minify is not None else minify_assets
+        if use_template or use_minify:
+            text = payload.decode('utf-8')
+            if use_template:
+                text = string.Template(text).safe_substitute(context or {})
+            if use_minify:
+                text = minify(text, asset.mime_type)
+            payload = text.encode('utf-8')
+    return payload, hashlib.sha1(payload).digest(), size, _clock() - started
+
+def _directory_assets(directory):
+    """ returns an ArxAsset for every file below directory, skipping hidden files and directories, named by its relative path. """
+    assets = []
+    for root, directories, files in os.walk(directory):
+        directories[:] = sorted(name for name in directories if not name.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.'):
+                path = os.path.join(root, name)
+                assets.append(ArxAsset(path, os.path.relpath(path, directory).replace(os.sep, '/')))
+    return assets
+
+def load_manifest(source):
+    """ returns (assets, index file_name, template context, minify) for a bundle source. the source is a directory, the path to a JSON
+        manifest, or a manifest dict:
+
+            {
+                "root":     "applet",                  (optional, relative to the manifest file)
+                "index":    "index.html",
+                "context":  {"title": "LogiPy"},       (optional, enables templating of text assets)
+                "minify":   true,                      (optional)
+                "assets":   ["index.html", "style.css", {"path": "img/logo.png", "name": "logo.png", "minify": false}]
+            }
+
+        for a directory, every file is an asset and index.html is the index if there is one. """
+    if isinstance(source, dict):
+        manifest, base = source, os.getcwd()
+    elif os.path.isdir(source):
+        assets = _directory_assets(source)
+        index  = 'index.html' if any(asset.file_name == 'index.html' for asset in assets) else None
+        return assets, index, None, False
+    else:
+        with open(source, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+        base = os.path.dirname(os.path.abspath(source))
+    root   = os.path.join(base, manifest.get('root', ''))
+    assets = []
+    for entry in manifest.get('assets', ()):
+        if not isinstance(entry, dict):
+            entry = {'path': entry}
+        path = os.path.join(root, entry['path'])
+        assets.append(ArxAsset(path, entry.get('name', entry['path'].replace(os.sep, '/')), entry.get('mime'),
+                               entry.get('template'), entry.get('minify')))
+    if not assets:
+        assets = _directory_assets(root)
+    return assets, manifest.get('index'), manifest.get('context'), bool(manifest.get('minify', False))
+
+
+# the upload cache of the last incremental deploy_bundle() calls, which knows what the device already holds
+_default_cache = None
+
+def deploy_bundle(directory_or_manifest, incremental = True, cache = None, executor = None, workers = None, set_index = True):
+    """ prepares every asset of an Arx applet bundle in parallel and uploads them in dependency order, fonts, images, stylesheets and
+        scripts before pages, with the index page last, then makes it the index. see load_manifest() for the bundle formats.
+
+        preparation (reading, templating, minifying, hashing) runs on executor, any concurrent.futures executor, or on a thread pool of
+        workers threads. uploads start as soon as the next asset in order is ready. with incremental, assets whose content the device
+        already holds according to cache, an ArxUploadCache shared by default between calls, are not sent again.
+
+        returns a report dict with 'ok', 'index', 'bytes_read', 'bytes_sent', 'bytes_skipped', 'bytes_failed', 'prepare_seconds',
+        'upload_seconds', 'seconds' and per asset in upload order 'assets': dicts of 'file_name', 'mime_type', 'bytes', 'sent', 'ok',
+        'prepare_ms' and 'upload_ms'. only uploads the SDK accepted count as sent, the payload of a failed one goes to 'bytes_failed'. """
+    global _default_cache
+    from concurrent.futures import ThreadPoolExecutor
+    started = _clock()
+    assets, index, context, minify_assets = load_manifest(directory_or_manifest)
+    if incremental and cache is None:
+        if _default_cache is None:
+            _default_cache = logi_arx.ArxUploadCache()
+        cache = _default_cache
+    ordered = sorted(assets, key = lambda asset: (asset.file_name == index, _upload_rank(asset.mime_type)))
+    owned   = executor is None
+    if owned:
+        executor = ThreadPoolExecutor(max_workers = workers or min(8, (os.cpu_count() if hasattr(os, 'cpu_count') else None) or 4))
+    report = {
+        'ok':              True,
+        'index':           index,
+        'bytes_read':      0,
+        'bytes_sent':      0,
+        'bytes_skipped':   0,
+        'bytes_failed':    0,
+        'prepare_seconds': 0.0,
+        'upload_seconds':  0.0,
+        'assets':          [],
+    }
+    try:
+        futures = [executor.submit(_prepare_asset, asset, context, minify_assets) for asset in ordered]
+        for asset, future in zip(ordered, futures):
+            payload, digest, size, prepare_seconds = future.result()
+            upload_started = _clock()
+            if incremental:
+                result, sent = cache.upload_content_as(payload, len(payload), asset.file_name, asset.mime_type, digest = digest)
+            else:
+                result = logi_arx.logi_arx_add_content_as(payload, len(payload), asset.file_name, asset.mime_type)
+                sent   = True
+            upload_seconds = _clock() - upload_started
+            sent           = sent and bool(result)
+            report['ok']              = report['ok'] and bool(result)
+            report['bytes_read']     += size
+            report['bytes_sent' if sent else 'bytes_skipped' if result else 'bytes_failed'] += len(payload)
+            report['prepare_seconds'] += prepare_seconds
+            report['upload_seconds']  += upload_seconds
+            report['assets'].append({
+                'file_name':  asset.file_name,
+                'mime_type':  asset.mime_type,
+                'bytes':      len(payload),
+                'sent':       sent,
+                'ok':         bool(result),
+                'prepare_ms': prepare_seconds * 1000.0,
+                'upload_ms':  upload_seconds * 1000.0,
+            })
+    finally:
+        if owned:
+            executor.shutdown(wait = False)
+    if set_index and index:
+        report['ok'] = logi_arx.logi_arx_set_index(index) and report['ok']
+    report['seconds'] = _clock() - started
+    return report
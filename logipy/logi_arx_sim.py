@@ -0,0 +1,194 @@
+"""
+logi_arx_sim.py : Simulated Arx Control SDK backend for headless testing and benchmarking
+
+Logitech Gaming Arx Control SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import collections
+import ctypes
+import functools
+
+from logipy import logi_arx
+from logipy import logi_sim
+
+# values LogiArxGetLastError reports for the failures the simulation models
+SIM_ERROR_NONE             = 0
+SIM_ERROR_NOT_INITIALIZED  = 1
+SIM_ERROR_INVALID_ARGUMENT = 2
+
+def _address(arg):
+    """ returns the int address of a pointer argument passed as an int, c_void_p, ctypes array or pointer. """
+    if isinstance(arg, ctypes._SimpleCData):
+        return arg.value
+    if isinstance(arg, (ctypes.Array, ctypes._Pointer)):
+        return ctypes.addressof(arg)
+    return arg
+
+def _wire_bytes(*values):
+    """ returns the UTF-8 size of the string arguments of a call, as an estimate of what the call sends to the device. """
+    return sum(len(value.encode('utf-8')) for value in values if value)
+
+def _entry_point(*converters):
+    """ logi_sim.entry_point that also sets last_error from the result of the call, like the SDK does. """
+    def decorator(function):
+        name = function.__name__
+        @functools.wraps(function)
+        def tracked(self, *values):
+            result = function(self, *values)
+            self.last_error = SIM_ERROR_NONE if result or name == 'LogiArxShutdown' else self.last_error or SIM_ERROR_INVALID_ARGUMENT
+            return result
+        return logi_sim.entry_point(*converters)(tracked)
+    return decorator
+
+
+class SimulatedArxDll(object):
+    """ a pure python stand-in for LogitechGArxControl.dll that can be installed with logi_arx.logi_arx_set_backend().
+
+        it keeps the files sent to the device (files, file_name -> (bytes, mime type)), the index, and the content and properties set
+        on tags by id and by class. every call is counted in call_counts and, if record is set, logged in calls as (timestamp, entry
+        point, arguments), and bytes_sent adds up the payload and string bytes the calls would send to the device. latency injects a
+        busy-wait of that many seconds into every call, or into the calls named in a dict of entry point -> seconds. like the real SDK,
+        calls other than LogiArxInit return False until it was called. fire_event() delivers an event through the registered callback. """
+
+    def __init__(self, latency = 0.0, record = True, log_size = None):
+        self.latency = latency
+        self.record  = record
+        self.calls   = collections.deque(maxlen = log_size)
+        self.reset()
+
+    def reset(self):
+        """ clears the device state, counters and call log. """
+        self.call_counts      = collections.Counter()
+        self.bytes_sent       = 0
+        self.last_error       = SIM_ERROR_NONE
+        self.initialized      = False
+        self.identifier       = None
+        self.callback         = None
+        self.files            = {}
+        self.index            = None
+        self.tag_content      = {}
+        self.tag_properties   = {}
+        self.class_content    = {}
+        self.class_properties = {}
+        self.calls.clear()
+
+    def stats(self):
+        """ returns the call counts per entry point, the total number of calls and the bytes sent to the device. """
+        return {
+            'calls':       sum(self.call_counts.values()),
+            'call_counts': dict(self.call_counts),
+            'bytes_sent':  self.bytes_sent,
+        }
+
+    def fire_event(self, event_type, event_value = 0, event_arg = None):
+        """ calls the callback registered with LogiArxInit as the SDK's callback thread would. returns False if there is none. """
+        if self.callback is None:
+            return False
+        self.callback.arxCallBack(event_type, event_value, event_arg, self.callback.arxContext)
+        return True
+
+    def _send(self, size):
+        if not self.initialized:
+            self.last_error = SIM_ERROR_NOT_INITIALIZED
+            return 0
+        self.bytes_sent += size
+        return 1
+
+    # LogitechGArxControl.dll entry points
+    @_entry_point()
+    def LogiArxInit(self, identifier, friendly_name, callback):
+        # logi_arx passes ctypes.byref(logiArxCbContext), which keeps the struct in _obj
+        context          = getattr(callback, '_obj', callback)
+        self.callback    = context if isinstance(context, logi_arx.logiArxCbContext) else None
+        self.identifier  = identifier
+        self.initialized = True
+        return 1
+
+    @_entry_point()
+    def LogiArxAddFileAs(self, file_path, file_name, mime_type):
+        if not self.initialized:
+            return self._send(0)
+        try:
+            with open(file_path, 'rb') as local_file:
+                content = local_file.read()
+        except (IOError, OSError):
+            return 0
+        self.files[file_name] = (content, mime_type)
+        return self._send(len(content) + _wire_bytes(file_name, mime_type))
+
+    @_entry_point(_address)
+    def LogiArxAddContentAs(self, content, size, file_name, mime_type):
+        if not self.initialized:
+            return self._send(0)
+        self.files[file_name] = (ctypes.string_at(content, size), mime_type)
+        return self._send(size + _wire_bytes(file_name, mime_type))
+
+    @_entry_point()
+    def LogiArxAddUTF8StringAs(self, string_content, file_name, mime_type):
+        if not self.initialized:
+            return self._send(0)
+        content = string_content.encode('utf-8')
+        self.files[file_name] = (content, mime_type)
+        return self._send(len(content) + _wire_bytes(file_name, mime_type))
+
+    @_entry_point(_address)
+    def LogiArxAddImageFromBitmap(self, bitmap, width, height, file_name):
+        if not self.initialized:
+            return self._send(0)
+        self.files[file_name] = (ctypes.string_at(bitmap, width * height * 4), 'image/png')
+        return self._send(width * height * 4 + _wire_bytes(file_name))
+
+    @_entry_point()
+    def LogiArxSetIndex(self, file_name):
+        if not self.initialized:
+            return self._send(0)
+        if file_name not in self.files:
+            return 0
+        self.index = file_name
+        self.tag_content.clear()
+        self.tag_properties.clear()
+        self.class_content.clear()
+        self.class_properties.clear()
+        return self._send(_wire_bytes(file_name))
+
+    @_entry_point()
+    def LogiArxSetTagPropertyById(self, tag_id, prop, new_value):
+        if not self.initialized:
+            return self._send(0)
+        self.tag_properties[tag_id, prop] = new_value
+        return self._send(_wire_bytes(tag_id, prop, new_value))
+
+    @_entry_point()
+    def LogiArxSetTagsPropertyByClass(self, tag_class, prop, new_value):
+        if not self.initialized:
+            return self._send(0)
+        self.class_properties[tag_class, prop] = new_value
+        return self._send(_wire_bytes(tag_class, prop, new_value))
+
+    @_entry_point()
+    def LogiArxSetTagContentById(self, tag_id, new_content):
+        if not self.initialized:
+            return self._send(0)
+        self.tag_content[tag_id] = new_content
+        return self._send(_wire_bytes(tag_id, new_content))
+
+    @_entry_point()
+    def LogiArxSetTagsContentByClass(self, tag_class, new_content):
+        if not self.initialized:
+            return self._send(0)
+        self.class_content[tag_class] = new_content
+        return self._send(_wire_bytes(tag_class, new_content))
+
+    def LogiArxGetLastError(self):
+        # not an _entry_point, so reading the error does not reset it
+        self.call_counts['LogiArxGetLastError'] += 1
+        return self.last_error
+
+    @_entry_point()
+    def LogiArxShutdown(self):
+        self.initialized = False
+        return None
@@ -8,71 +8,250 @@ Author: Tom Lambert
 Email: devtechsupport@logitech.com
 """
 
+import collections
 import ctypes
+import functools
+import itertools
+import math
+import operator
 import os
-import platform
-import struct
+import sys
+import threading
+import time
+
+try:
+    from types import MappingProxyType as _frozen_dict
+except ImportError:
+    _frozen_dict = dict
+
+
+def _loaded_numpy():
+    """ returns numpy if something already imported it, without importing it. arrays can only exist once numpy was imported,
+        so the optional numpy paths check for it this way instead of paying for the import in every process. """
+    return sys.modules.get('numpy')
 
 # Helpers
 #
-class Color:
-    """ an RGBA color object that can be created using RGB, RGBA, color name, or a hex_code. """
-    def __init__(self, *args, **kwargs):
+_NAMED_COLORS = {
+    'red':    (255, 0, 0),
+    'orange': (255, 165, 0),
+    'yellow': (255, 255, 0),
+    'green':  (0, 255, 0),
+    'blue':   (0, 0, 255),
+    'indigo': (75, 0, 130),
+    'violet': (238, 130, 238),
+    'cyan':   (0, 220, 255),
+    'pink':   (255, 0, 255),
+    'purple': (128, 0, 255),
+    'white':  (255, 255, 255),
+    'black':  (0, 0, 0),
+}
+
+# byte (0-255) to SDK percentage (0-100), rounded the same way as Color.rgb_percent().
+_BYTE_PERCENT = tuple(int((value / 255.0) * 100) for value in range(256))
+
+def _rgb_percent(red, green, blue):
+    """ converts 0-255 channels to SDK percentages, using the lookup table for byte values. """
+    try:
+        if red >= 0 and green >= 0 and blue >= 0:
+            return _BYTE_PERCENT[red], _BYTE_PERCENT[green], _BYTE_PERCENT[blue]
+    except (IndexError, TypeError):
+        pass
+    return int((red / 255.0) * 100), int((green / 255.0) * 100), int((blue / 255.0) * 100)
+
+def _parse_hex_code(hex_code):
+    """ returns the (red, green, blue) of a 'rrggbb' or '#rrggbb' string. """
+    digits = hex_code[1:] if hex_code.startswith('#') else hex_code
+    if len(digits) != 6:
+        raise ValueError('invalid color name or hex code {!r}'.format(hex_code))
+    value = int(digits, 16)
+    return (value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff
+
+_COLOR_CACHE_SIZE = 1024
+_color_cache      = {}
+
+class Color(object):
+    """ an immutable RGBA color object that can be created using RGB, RGBA, color name, or a hex_code.
+        colors created from a color name or hex_code are cached, so repeated calls return the same object. """
+
+    __slots__ = ('_red', '_green', '_blue', '_alpha', '_percent', '_hex_code')
+
+    def __new__(cls, *args, **kwargs):
+        if args and not kwargs:
+            if not isinstance(args[0], str):
+                return cls._create(args[0], args[1], args[2], args[3] if len(args) > 3 else 255)
+            if cls is Color:
+                color = _color_cache.get(args)
+                if color is None:
+                    if len(_color_cache) >= _COLOR_CACHE_SIZE:
+                        _color_cache.clear()
+                    color = _color_cache[args] = cls._parse(args, kwargs)
+                return color
+        return cls._parse(args, kwargs)
+
+    @classmethod
+    def _parse(cls, args, kwargs):
         red, green, blue, alpha = 0, 0, 0, 255
-        hex_code = None
-        if len(args) > 0:
-            if isinstance(args[0], int):
-                red, green, blue = args[0], args[1], args[2]
-                if len(args) > 3:
-                    alpha = args[3]
-            elif isinstance(args[0], str):
+        hex_code = kwargs.pop('hex', None)
+        if args:
+            if isinstance(args[0], str):
                 if len(args) > 1:
                     alpha = args[1]
-                if args[0] == 'red':
-                    red, green, blue = 255, 0, 0
-                elif args[0] == 'orange':
-                    red, green, blue = 255, 165, 0
-                elif args[0] == 'yellow':
-                    red, green, blue = 255, 255, 0
-                elif args[0] == 'green':
-                    red, green, blue = 0, 255, 0
-                elif args[0] == 'blue':
-                    red, green, blue = 0, 0, 255
-                elif args[0] == 'indigo':
-                    red, green, blue = 75, 0, 130
-                elif args[0] == 'violet':
-                    red, green, blue = 238, 130, 238
-                elif args[0] == 'cyan':
-                    red, green, blue = 0, 220, 255
-                elif args[0] == 'pink':
-                    red, green, blue = 255, 0, 255
-                elif args[0] == 'purple':
-                    red, green, blue = 128, 0, 255
-                elif args[0] == 'white':
-                    red, green, blue = 255, 255, 255
-                elif args[0] == 'black':
-                    red, green, blue = 0, 0, 0
+                named = _NAMED_COLORS.get(args[0])
+                if named is None:
+                    hex_code = hex_code or args[0]
                 else:
-                    hex_code = args[0]
-                    hex_code = kwargs.pop('hex', hex_code)
+                    red, green, blue = named
+            else:
+                red, green, blue = args[0], args[1], args[2]
+                if len(args) > 3:
+                    alpha = args[3]
         if hex_code:
-            hex_code = hex_code.replace('#', '')
-            self.red, self.green, self.blue = struct.unpack('BBB', hex_code.decode('hex'))
-            self.alpha = alpha
-        elif any(x in ['red', 'blue', 'green', 'alpha'] for x in kwargs):
-            self.red = kwargs.pop('red', red)
-            self.green = kwargs.pop('green', green)
-            self.blue = kwargs.pop('blue', blue)
-            self.alpha = kwargs.pop('alpha', alpha)
-        else:
-            self.red = red
-            self.green = green
-            self.blue = blue
-            self.alpha = alpha
-        self.hex_code = '#{h}'.format(h=struct.pack('BBB', *(self.red, self.green, self.blue)).encode('hex'))
+            red, green, blue = _parse_hex_code(hex_code)
+        elif kwargs:
+            red   = kwargs.pop('red', red)
+            green = kwargs.pop('green', green)
+            blue  = kwargs.pop('blue', blue)
+        return cls._create(red, green, blue, kwargs.pop('alpha', alpha))
+
+    @classmethod
+    def _create(cls, red, green, blue, alpha):
+        self           = object.__new__(cls)
+        self._red      = red
+        self._green    = green
+        self._blue     = blue
+        self._alpha    = alpha
+        self._percent  = _rgb_percent(red, green, blue)
+        self._hex_code = None
+        return self
+
+    red   = property(operator.attrgetter('_red'))
+    green = property(operator.attrgetter('_green'))
+    blue  = property(operator.attrgetter('_blue'))
+    alpha = property(operator.attrgetter('_alpha'))
+
+    @property
+    def hex_code(self):
+        """ the '#rrggbb' hex code of the color, computed on first access. """
+        if self._hex_code is None:
+            self._hex_code = '#{:02x}{:02x}{:02x}'.format(self._red, self._green, self._blue)
+        return self._hex_code
 
     def rgb_percent(self):
-        return int((self.red / 255.0) * 100), int((self.green / 255.0) * 100), int((self.blue / 255.0) * 100)
+        return self._percent
+
+    def __reduce__(self):
+        return Color, (self._red, self._green, self._blue, self._alpha)
+
+    def __eq__(self, other):
+        if not isinstance(other, Color):
+            return NotImplemented
+        return (self._red, self._green, self._blue, self._alpha) == (other._red, other._green, other._blue, other._alpha)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((self._red, self._green, self._blue, self._alpha))
+
+    def __repr__(self):
+        return 'Color({}, {}, {}, {})'.format(self._red, self._green, self._blue, self._alpha)
+
+
+def _color_channels(color):
+    """ returns the 0-255 (red, green, blue, alpha) of a Color or of a (red, green, blue[, alpha]) tuple. """
+    if isinstance(color, Color):
+        return color._red, color._green, color._blue, color._alpha
+    if len(color) > 3:
+        return color[0], color[1], color[2], color[3]
+    return color[0], color[1], color[2], 255
+
+def colors_to_percent(colors):
+    """ converts a sequence of Color objects or 0-255 (red, green, blue[, alpha]) tuples, or an (N, 3) or (N, 4) uint8 numpy array,
+        to a list of (red, green, blue) SDK percentages in one call. """
+    numpy = _loaded_numpy()
+    if numpy is not None and isinstance(colors, numpy.ndarray):
+        return [tuple(row) for row in numpy.take(numpy.array(_BYTE_PERCENT, numpy.uint8), colors[:, :3]).tolist()]
+    return [color._percent if isinstance(color, Color) else _rgb_percent(color[0], color[1], color[2]) for color in colors]
+
+def colors_to_bitmap(colors):
+    """ packs a sequence of Color objects or 0-255 (red, green, blue[, alpha]) tuples, or an (N, 3) or (N, 4) uint8 numpy array,
+        into a BGRA byte string with LOGI_LED_BITMAP_BYTES_PER_KEY bytes per color, such as one bitmap row or a whole bitmap. """
+    numpy = _loaded_numpy()
+    if numpy is not None and isinstance(colors, numpy.ndarray):
+        bitmap = numpy.empty((len(colors), LOGI_LED_BITMAP_BYTES_PER_KEY), numpy.uint8)
+        bitmap[:, :3] = colors[:, 2::-1]
+        bitmap[:, 3]  = colors[:, 3] if colors.shape[1] > 3 else 255
+        return bitmap.tobytes()
+    bitmap = bytearray()
+    for color in colors:
+        red, green, blue, alpha = _color_channels(color)
+        bitmap += bytearray((blue, green, red, alpha))
+    return bytes(bitmap)
+
+class Palette(object):
+    """ a fixed table of colors, precomputed once as Color objects, SDK percentages and BGRA bytes so animations can index it every frame
+        without any per-frame arithmetic. values are mapped to entries with index(), map_percent() and map_bitmap(). """
+
+    def __init__(self, colors):
+        self.colors   = tuple(color if isinstance(color, Color) else Color(*color) for color in colors)
+        if not self.colors:
+            raise ValueError('a palette needs at least one color')
+        self.percents = tuple(color._percent for color in self.colors)
+        self.bitmap   = colors_to_bitmap(self.colors)
+        self._cells   = tuple(self.bitmap[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY] for offset in range(0, len(self.bitmap), LOGI_LED_BITMAP_BYTES_PER_KEY))
+        self._array   = None
+
+    @classmethod
+    def gradient(cls, stops, steps):
+        """ creates a palette of steps colors interpolated linearly between evenly spaced stops, given as Color objects, color names or tuples. """
+        stops = [_color_channels(stop if isinstance(stop, (Color, tuple, list)) else Color(stop)) for stop in stops]
+        if len(stops) == 1 or steps == 1:
+            return cls([stops[0]] * steps)
+        colors = []
+        for step in range(steps):
+            position = step * (len(stops) - 1) / float(steps - 1)
+            segment  = min(int(position), len(stops) - 2)
+            weight   = position - segment
+            start    = stops[segment]
+            end      = stops[segment + 1]
+            colors.append(tuple(int(round(a + (b - a) * weight)) for a, b in zip(start, end)))
+        return cls(colors)
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __getitem__(self, index):
+        return self.colors[index]
+
+    def percent(self, index):
+        """ returns the precomputed (red, green, blue) SDK percentages of an entry. """
+        return self.percents[index]
+
+    def index(self, value, low = 0.0, high = 1.0):
+        """ returns the entry index for a value in the range low-high, clamped to the palette. """
+        last  = len(self.colors) - 1
+        index = int((value - low) * last / (high - low) + 0.5)
+        return 0 if index < 0 else last if index > last else index
+
+    def map_percent(self, values, low = 0.0, high = 1.0):
+        """ maps each value in the range low-high to the SDK percentages of its entry. """
+        percents = self.percents
+        return [percents[self.index(value, low, high)] for value in values]
+
+    def map_bitmap(self, values, low = 0.0, high = 1.0):
+        """ maps each value in the range low-high to the BGRA bytes of its entry and returns them packed, e.g. a value per key
+            of the bitmap gives a complete bitmap for logi_led_set_lighting_from_bitmap. values can be a numpy array. """
+        numpy = _loaded_numpy()
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            if self._array is None:
+                self._array = numpy.frombuffer(self.bitmap, numpy.uint8).reshape(-1, LOGI_LED_BITMAP_BYTES_PER_KEY)
+            last    = len(self.colors) - 1
+            indices = numpy.clip(((values.ravel() - low) * (last / float(high - low)) + 0.5).astype(numpy.intp), 0, last)
+            return self._array[indices].tobytes()
+        cells = self._cells
+        return b''.join([cells[self.index(value, low, high)] for value in values])
 
 
 # DLL Definitions
@@ -212,177 +391,375 @@ LOGI_DEVICETYPE_PERKEY_RGB      = 1 << LOGI_DEVICETYPE_PERKEY_RGB_ORD
 LOGI_DEVICETYPE_ALL             = LOGI_DEVICETYPE_MONOCHROME | LOGI_DEVICETYPE_RGB | LOGI_DEVICETYPE_PERKEY_RGB
 
 
+# Key Index
+#
+# position of each key in the LOGI_LED_BITMAP_WIDTH x LOGI_LED_BITMAP_HEIGHT bitmap, one tuple per row. None marks a cell without a key.
+# the G keys and logos are not part of the bitmap and can only be addressed by key name.
+KEY_BITMAP_LAYOUT = (
+    (ESC, F1, F2, F3, F4, F5, F6, F7, F8, F9, F10, F11, F12, PRINT_SCREEN, SCROLL_LOCK, PAUSE_BREAK, None, None, None, None, None),
+    (TILDE, ONE, TWO, THREE, FOUR, FIVE, SIX, SEVEN, EIGHT, NINE, ZERO, MINUS, EQUALS, BACKSPACE, INSERT, HOME, PAGE_UP, NUM_LOCK, NUM_SLASH, NUM_ASTERISK, NUM_MINUS),
+    (TAB, Q, W, E, R, T, Y, U, I, O, P, OPEN_BRACKET, CLOSE_BRACKET, BACKSLASH, KEYBOARD_DELETE, END, PAGE_DOWN, NUM_SEVEN, NUM_EIGHT, NUM_NINE, NUM_PLUS),
+    (CAPS_LOCK, A, S, D, F, G, H, J, K, L, SEMICOLON, APOSTROPHE, None, ENTER, None, None, None, NUM_FOUR, NUM_FIVE, NUM_SIX, None),
+    (LEFT_SHIFT, None, Z, X, C, V, B, N, M, COMMA, PERIOD, FORWARD_SLASH, None, RIGHT_SHIFT, None, ARROW_UP, None, NUM_ONE, NUM_TWO, NUM_THREE, NUM_ENTER),
+    (LEFT_CONTROL, LEFT_WINDOWS, LEFT_ALT, None, None, SPACE, None, None, None, None, RIGHT_ALT, RIGHT_WINDOWS, APPLICATION_SELECT, RIGHT_CONTROL, ARROW_LEFT, ARROW_DOWN, ARROW_RIGHT, NUM_ZERO, None, NUM_PERIOD, None),
+)
+
+# (key name, USB HID usage id, Quartz virtual key code) for every key of the bitmap.
+_KEY_CODES = (
+    (ESC, 0x29, 0x35), (F1, 0x3a, 0x7a), (F2, 0x3b, 0x78), (F3, 0x3c, 0x63), (F4, 0x3d, 0x76), (F5, 0x3e, 0x60), (F6, 0x3f, 0x61),
+    (F7, 0x40, 0x62), (F8, 0x41, 0x64), (F9, 0x42, 0x65), (F10, 0x43, 0x6d), (F11, 0x44, 0x67), (F12, 0x45, 0x6f),
+    (PRINT_SCREEN, 0x46, 0x69), (SCROLL_LOCK, 0x47, 0x6b), (PAUSE_BREAK, 0x48, 0x71),
+    (TILDE, 0x35, 0x32), (ONE, 0x1e, 0x12), (TWO, 0x1f, 0x13), (THREE, 0x20, 0x14), (FOUR, 0x21, 0x15), (FIVE, 0x22, 0x17),
+    (SIX, 0x23, 0x16), (SEVEN, 0x24, 0x1a), (EIGHT, 0x25, 0x1c), (NINE, 0x26, 0x19), (ZERO, 0x27, 0x1d), (MINUS, 0x2d, 0x1b),
+    (EQUALS, 0x2e, 0x18), (BACKSPACE, 0x2a, 0x33), (INSERT, 0x49, 0x72), (HOME, 0x4a, 0x73), (PAGE_UP, 0x4b, 0x74),
+    (NUM_LOCK, 0x53, 0x47), (NUM_SLASH, 0x54, 0x4b), (NUM_ASTERISK, 0x55, 0x43), (NUM_MINUS, 0x56, 0x4e),
+    (TAB, 0x2b, 0x30), (Q, 0x14, 0x0c), (W, 0x1a, 0x0d), (E, 0x08, 0x0e), (R, 0x15, 0x0f), (T, 0x17, 0x11), (Y, 0x1c, 0x10),
+    (U, 0x18, 0x20), (I, 0x0c, 0x22), (O, 0x12, 0x1f), (P, 0x13, 0x23), (OPEN_BRACKET, 0x2f, 0x21), (CLOSE_BRACKET, 0x30, 0x1e),
+    (BACKSLASH, 0x31, 0x2a), (KEYBOARD_DELETE, 0x4c, 0x75), (END, 0x4d, 0x77), (PAGE_DOWN, 0x4e, 0x79),
+    (NUM_SEVEN, 0x5f, 0x59), (NUM_EIGHT, 0x60, 0x5b), (NUM_NINE, 0x61, 0x5c), (NUM_PLUS, 0x57, 0x45),
+    (CAPS_LOCK, 0x39, 0x39), (A, 0x04, 0x00), (S, 0x16, 0x01), (D, 0x07, 0x02), (F, 0x09, 0x03), (G, 0x0a, 0x05), (H, 0x0b, 0x04),
+    (J, 0x0d, 0x26), (K, 0x0e, 0x28), (L, 0x0f, 0x25), (SEMICOLON, 0x33, 0x29), (APOSTROPHE, 0x34, 0x27), (ENTER, 0x28, 0x24),
+    (NUM_FOUR, 0x5c, 0x56), (NUM_FIVE, 0x5d, 0x57), (NUM_SIX, 0x5e, 0x58),
+    (LEFT_SHIFT, 0xe1, 0x38), (Z, 0x1d, 0x06), (X, 0x1b, 0x07), (C, 0x06, 0x08), (V, 0x19, 0x09), (B, 0x05, 0x0b), (N, 0x11, 0x2d),
+    (M, 0x10, 0x2e), (COMMA, 0x36, 0x2b), (PERIOD, 0x37, 0x2f), (FORWARD_SLASH, 0x38, 0x2c), (RIGHT_SHIFT, 0xe5, 0x3c),
+    (ARROW_UP, 0x52, 0x7e), (NUM_ONE, 0x59, 0x53), (NUM_TWO, 0x5a, 0x54), (NUM_THREE, 0x5b, 0x55), (NUM_ENTER, 0x58, 0x4c),
+    (LEFT_CONTROL, 0xe0, 0x3b), (LEFT_WINDOWS, 0xe3, 0x37), (LEFT_ALT, 0xe2, 0x3a), (SPACE, 0x2c, 0x31), (RIGHT_ALT, 0xe6, 0x3d),
+    (RIGHT_WINDOWS, 0xe7, 0x36), (APPLICATION_SELECT, 0x65, 0x6e), (RIGHT_CONTROL, 0xe4, 0x3e),
+    (ARROW_LEFT, 0x50, 0x7b), (ARROW_DOWN, 0x51, 0x7d), (ARROW_RIGHT, 0x4f, 0x7c), (NUM_ZERO, 0x62, 0x52), (NUM_PERIOD, 0x63, 0x41),
+)
+
+# read-only lookup tables, a bitmap cell is row * LOGI_LED_BITMAP_WIDTH + column.
+KEY_TO_BITMAP_CELL = _frozen_dict(dict(
+    (key_name, row * LOGI_LED_BITMAP_WIDTH + column)
+    for row, keys in enumerate(KEY_BITMAP_LAYOUT) for column, key_name in enumerate(keys) if key_name is not None))
+BITMAP_CELL_TO_KEY = _frozen_dict(dict((cell, key_name) for key_name, cell in KEY_TO_BITMAP_CELL.items()))
+KEY_TO_HID_CODE    = _frozen_dict(dict((key_name, hid_code) for key_name, hid_code, quartz_code in _KEY_CODES))
+HID_CODE_TO_KEY    = _frozen_dict(dict((hid_code, key_name) for key_name, hid_code, quartz_code in _KEY_CODES))
+KEY_TO_QUARTZ_CODE = _frozen_dict(dict((key_name, quartz_code) for key_name, hid_code, quartz_code in _KEY_CODES))
+QUARTZ_CODE_TO_KEY = _frozen_dict(dict((quartz_code, key_name) for key_name, hid_code, quartz_code in _KEY_CODES))
+
+def key_bitmap_position(key_name):
+    """ returns the (column, row) of the key in the bitmap, or None if the key is not part of the bitmap. """
+    cell = KEY_TO_BITMAP_CELL.get(key_name)
+    if cell is None:
+        return None
+    return cell % LOGI_LED_BITMAP_WIDTH, cell // LOGI_LED_BITMAP_WIDTH
+
+def key_bitmap_offset(key_name):
+    """ returns the byte offset of the key's BGRA value in the bitmap, or None if the key is not part of the bitmap. """
+    cell = KEY_TO_BITMAP_CELL.get(key_name)
+    if cell is None:
+        return None
+    return cell * LOGI_LED_BITMAP_BYTES_PER_KEY
+
 # Required Globals
 #
 _LOGI_SHARED_SDK_LED            = ctypes.c_int(1)
 
-class SDKNotFoundException:
+class SDKNotFoundException(Exception):
     pass
 
+# signatures of the exported functions, bound once when the DLL is loaded so calls take plain python values and ctypes checks and converts
+# them through the declared argument types instead of guessing a C type per call. key names are the LogiLed::KeyName enum, an int.
+_c_int     = ctypes.c_int
+_c_wchar_p = ctypes.c_wchar_p
+_PROTOTYPES = {
+    'LogiLedInit':                            (ctypes.c_bool, ()),
+    'LogiLedSetTargetDevice':                 (ctypes.c_bool, (_c_int,)),
+    'LogiLedSaveCurrentLighting':             (ctypes.c_bool, ()),
+    'LogiLedRestoreLighting':                 (ctypes.c_bool, ()),
+    'LogiLedSetLighting':                     (ctypes.c_bool, (_c_int, _c_int, _c_int)),
+    'LogiLedFlashLighting':                   (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int, _c_int)),
+    'LogiLedPulseLighting':                   (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int, _c_int)),
+    'LogiLedStopEffects':                     (ctypes.c_bool, ()),
+    'LogiLedSetLightingFromBitmap':           (ctypes.c_bool, (ctypes.c_void_p,)),
+    'LogiLedSetLightingForKeyWithScanCode':   (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int)),
+    'LogiLedSetLightingForKeyWithHidCode':    (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int)),
+    'LogiLedSetLightingForKeyWithQuartzCode': (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int)),
+    'LogiLedSetLightingForKeyWithKeyName':    (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int)),
+    'LogiLedSaveLightingForKey':              (ctypes.c_bool, (_c_int,)),
+    'LogiLedRestoreLightingForKey':           (ctypes.c_bool, (_c_int,)),
+    'LogiLedFlashSingleKey':                  (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int, _c_int, _c_int)),
+    'LogiLedPulseSingleKey':                  (ctypes.c_bool, (_c_int, _c_int, _c_int, _c_int, _c_int, _c_int, _c_int, _c_int, ctypes.c_bool)),
+    'LogiLedStopEffectsOnKey':                (ctypes.c_bool, (_c_int,)),
+    'LogiLedShutdown':                        (None, ()),
+    'LogiGetConfigOptionNumber':              (ctypes.c_bool, (_c_wchar_p, ctypes.POINTER(ctypes.c_double), _c_int)),
+    'LogiGetConfigOptionBool':                (ctypes.c_bool, (_c_wchar_p, ctypes.POINTER(ctypes.c_bool), _c_int)),
+    'LogiGetConfigOptionColor':               (ctypes.c_bool, (_c_wchar_p, ctypes.POINTER(_c_int), ctypes.POINTER(_c_int), ctypes.POINTER(_c_int), _c_int)),
+    'LogiGetConfigOptionKeyInput':            (ctypes.c_bool, (_c_wchar_p, ctypes.c_char_p, _c_int)),
+    'LogiSetConfigOptionLabel':               (ctypes.c_bool, (_c_wchar_p, _c_wchar_p, _c_int)),
+}
+
+def bind_prototypes(dll):
+    """ sets restype and argtypes on every exported function of a ctypes library once. ctypes caches the function objects on the library,
+        so later calls go straight to the prototyped function without building ctypes arguments by hand. returns the library. """
+    if isinstance(dll, ctypes.CDLL):
+        for name, (restype, argtypes) in _PROTOTYPES.items():
+            function = getattr(dll, name, None)
+            if function is not None:
+                function.restype  = restype
+                function.argtypes = argtypes
+    return dll
+
 def load_dll(path_dll = None):
+    """ loads LogitechLed.dll from path_dll, the path in the LOGIPY_LED_DLL environment variable, or the Logitech Gaming Software
+        install directory, in that order. raises SDKNotFoundException if the DLL is not there. """
+    if not path_dll:
+        path_dll = os.environ.get('LOGIPY_LED_DLL')
     if not path_dll:
+        subpath_lgs = os.environ.get('ProgramW6432') or os.environ.get('ProgramFiles')
+        if not subpath_lgs:
+            raise SDKNotFoundException('The SDK DLL was not found.')
+        import platform
         bitness = 'x86' if platform.architecture()[0] == '32bit' else 'x64'
         subpath_dll = r'/Logitech Gaming Software/SDK/LED/{}/LogitechLed.dll'.format(bitness)
-        try:
-            subpath_lgs = os.environ['ProgramW6432']
-        except KeyError:
-            subpath_lgs = os.environ['ProgramFiles']
         path_dll = subpath_lgs + subpath_dll
     if os.path.exists(path_dll):
-        return ctypes.cdll.LoadLibrary(path_dll)
+        return bind_prototypes(ctypes.cdll.LoadLibrary(path_dll))
     else:
         raise SDKNotFoundException('The SDK DLL was not found.')
 
-try:
-    led_dll = load_dll()
-except SDKNotFoundException as exception_sdk:
-    led_dll = None
+# the SDK keeps its state per thread, so the target device last set is tracked per thread too
+_thread_state = threading.local()
+
+# the DLL is looked up on the first SDK call rather than at import, so importing the module for its constants or Color stays cheap.
+_led_dll        = None
+_led_dll_loaded = False
+_led_dll_lock   = threading.Lock()
+
+def _load_default_dll():
+    """ loads the DLL the first time an SDK function needs it. returns it, or None if it was not found, and never tries again. """
+    global _led_dll, _led_dll_loaded, led_dll
+    with _led_dll_lock:
+        if not _led_dll_loaded:
+            try:
+                _led_dll = load_dll()
+            except SDKNotFoundException:
+                _led_dll = None
+            _led_dll_loaded = True
+            led_dll         = _led_dll
+    return _led_dll
+
+# led_dll, for callers that use the DLL directly, becomes a module global once the DLL is loaded. before that, __getattr__ loads it on
+# first access (PEP 562), and pythons older than 3.7, which do not call a module's __getattr__, load it at import as they always did.
+def __getattr__(name):
+    if name == 'led_dll':
+        return _load_default_dll()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+if sys.version_info < (3, 7):
+    _load_default_dll()
+
+def logi_led_set_backend(backend):
+    """ replaces the object the wrapped SDK functions call into and returns the previous one. a backend is anything exposing the LogiLed* and
+        LogiGetConfigOption*/LogiSetConfigOptionLabel entry points of LogitechLed.dll, such as the ctypes library returned by load_dll() or a
+        logi_led_sim.SimulatedLedDll. ctypes libraries get their prototypes bound. passing None makes every function return False as if
+        the DLL was not found. """
+    global _led_dll, _led_dll_loaded, led_dll
+    with _led_dll_lock:
+        previous, _led_dll = _led_dll, bind_prototypes(backend)
+        _led_dll_loaded    = True
+        led_dll            = _led_dll
+    return previous
+
+def logi_led_get_backend():
+    """ returns the object the wrapped SDK functions currently call into, loading the DLL if nothing was set yet, or None. """
+    return _led_dll or _load_default_dll()
 
 
 # Wrapped SDK Functions
 #
-def logi_led_init():
-    """ initializes the sdk for the current thread. """
-    if led_dll:
-        return bool(led_dll.LogiLedInit())
+def logi_led_init(path_dll = None):
+    """ initializes the sdk for the current thread. the DLL is loaded on first use, from path_dll if given. """
+    if path_dll:
+        try:
+            logi_led_set_backend(load_dll(path_dll))
+        except SDKNotFoundException:
+            return False
+    if _led_dll or _load_default_dll():
+        result = bool(_led_dll.LogiLedInit())
+        _thread_state.target_device = LOGI_DEVICETYPE_ALL if result else None
+        return result
     else:
         return False
 
 def logi_led_set_target_device(target_device):
     """ sets the target device or device group that is affected by the subsequent lighting calls. """
-    if led_dll:
-        target_device = ctypes.c_int(target_device)
-        return bool(led_dll.LogiLedSetTargetDevice(target_device))
+    if _led_dll or _load_default_dll():
+        result = bool(_led_dll.LogiLedSetTargetDevice(target_device))
+        _thread_state.target_device = target_device if result else None
+        return result
     else:
         return False
 
+def logi_led_get_target_device():
+    """ returns the target device set on the current thread through logi_led_init or logi_led_set_target_device, or None if unknown. """
+    return getattr(_thread_state, 'target_device', None)
+
 def logi_led_save_current_lighting():
     """ saves the current lighting that can be restored later. """
-    if led_dll:
-        return bool(led_dll.LogiLedSaveCurrentLighting())
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSaveCurrentLighting())
     else:
         return False
 
 def logi_led_restore_lighting():
     """ restores the last saved lighting. """
-    if led_dll:
-        return bool(led_dll.LogiLedRestoreLighting())
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedRestoreLighting())
     else:
         return False
 
 def logi_led_set_lighting(red_percentage, green_percentage, blue_percentage):
     """ sets the lighting to the color of the combined RGB percentages. note that RGB ranges from 0-255, but this function ranges from 0-100. """
-    if led_dll:
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        return bool(led_dll.LogiLedSetLighting(red_percentage, green_percentage, blue_percentage))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSetLighting(red_percentage, green_percentage, blue_percentage))
     else:
         return False
 
 def logi_led_flash_lighting(red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval):
     """ flashes the lighting color of the combined RGB percentages over the specified millisecond duration and millisecond interval.
         specifying a duration of 0 will cause the effect to be infinite until reset. note that RGB ranges from 0-255, but this function ranges from 0-100. """
-    if led_dll:
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        ms_duration      = ctypes.c_int(ms_duration)
-        ms_interval      = ctypes.c_int(ms_interval)
-        return bool(led_dll.LogiLedFlashLighting(red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedFlashLighting(red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval))
     else:
         return False
 
 def logi_led_pulse_lighting(red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval):
     """ pulses the lighting color of the combined RGB percentages over the specified millisecond duration and millisecond interval.
         specifying a duration of 0 will cause the effect to be infinite until reset. note that RGB ranges from 0-255, but this function ranges from 0-100. """
-    if led_dll:
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        ms_duration      = ctypes.c_int(ms_duration)
-        ms_interval      = ctypes.c_int(ms_interval)
-        return bool(led_dll.LogiLedPulseLighting(red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedPulseLighting(red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval))
     else:
         return False
 
 def logi_led_stop_effects():
     """ stops the pulse and flash effects. """
-    if led_dll:
-        return bool(led_dll.LogiLedStopEffects())
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedStopEffects())
     else:
         return False
 
+_BITMAP_ARRAY = ctypes.c_ubyte * LOGI_LED_BITMAP_SIZE
+
+def _bitmap_pointer(bitmap):
+    """ returns an argument for LogiLedSetLightingFromBitmap that points at the memory of bitmap without copying it. writable arrays are
+        wrapped with from_buffer, which costs less than a c_void_p built from ndarray.ctypes.data. """
+    if isinstance(bitmap, bytes):
+        if len(bitmap) < LOGI_LED_BITMAP_SIZE:
+            raise ValueError('the bitmap must be at least {} bytes long, got {}'.format(LOGI_LED_BITMAP_SIZE, len(bitmap)))
+        return bitmap
+    if isinstance(bitmap, ctypes.Array):
+        if ctypes.sizeof(bitmap) < LOGI_LED_BITMAP_SIZE:
+            raise ValueError('the bitmap must be at least {} bytes long, got {}'.format(LOGI_LED_BITMAP_SIZE, ctypes.sizeof(bitmap)))
+        return bitmap
+    numpy = _loaded_numpy()
+    if numpy is not None and isinstance(bitmap, numpy.ndarray):
+        if bitmap.dtype != numpy.uint8 or bitmap.nbytes != LOGI_LED_BITMAP_SIZE or not bitmap.flags['C_CONTIGUOUS']:
+            raise ValueError('the bitmap array must be a C-contiguous uint8 array of {} bytes, use logi_led_set_lighting_from_array for other layouts'.format(LOGI_LED_BITMAP_SIZE))
+        if bitmap.flags['WRITEABLE']:
+            return _BITMAP_ARRAY.from_buffer(bitmap)
+        return ctypes.c_void_p(bitmap.ctypes.data)
+    view = memoryview(bitmap)
+    if view.nbytes < LOGI_LED_BITMAP_SIZE:
+        raise ValueError('the bitmap must be at least {} bytes long, got {}'.format(LOGI_LED_BITMAP_SIZE, view.nbytes))
+    if view.readonly:
+        return _BITMAP_ARRAY.from_buffer_copy(view)
+    return _BITMAP_ARRAY.from_buffer(bitmap)
+
 def logi_led_set_lighting_from_bitmap(bitmap):
     """ sets the color of each key in a 21x6 rectangular area specified by the BGRA byte array bitmap. each element corresponds to the physical location of each key.
-        note that the color bit order is BGRA rather than standard RGBA bit order. this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        bitmap = ctypes.c_char_p(bitmap)
-        return bool(led_dll.LogiLedSetLightingFromBitmap(bitmap))
+        note that the color bit order is BGRA rather than standard RGBA bit order. this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices.
+        bitmap can be a byte string or any writable buffer (bytearray, array('B'), ctypes array, C-contiguous uint8 numpy array), which is passed to the DLL without copying. """
+    if _led_dll or _load_default_dll():
+        # full length byte strings go to the c_void_p prototype as they are, without the extra call
+        if not isinstance(bitmap, bytes) or len(bitmap) < LOGI_LED_BITMAP_SIZE:
+            bitmap = _bitmap_pointer(bitmap)
+        return bool(_led_dll.LogiLedSetLightingFromBitmap(bitmap))
     else:
         return False
 
+def logi_led_set_lighting_from_array(pixels, channel_order = 'BGRA'):
+    """ sets the color of each key from a LOGI_LED_BITMAP_HEIGHT x LOGI_LED_BITMAP_WIDTH grid of 3 or 4 byte pixels, such as a (6, 21, 4) or (6, 21, 3) uint8
+        numpy array or a flat bytes/bytearray/array('B')/memoryview in row order. channel_order is 'BGRA' or 'RGBA' ('BGR' or 'RGB' for 3 channels).
+        BGRA input with 4 channels is passed to the DLL without copying, other layouts are swizzled into a BGRA bitmap with vectorized slicing.
+        this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
+    numpy = _loaded_numpy()
+    order = channel_order.upper()
+    if order not in ('BGRA', 'RGBA', 'BGR', 'RGB'):
+        raise ValueError('unsupported channel_order {!r}'.format(channel_order))
+    swap = order.startswith('RGB')
+    if numpy is not None and isinstance(pixels, numpy.ndarray):
+        if pixels.dtype != numpy.uint8 or pixels.shape not in ((LOGI_LED_BITMAP_HEIGHT, LOGI_LED_BITMAP_WIDTH, 3), (LOGI_LED_BITMAP_HEIGHT, LOGI_LED_BITMAP_WIDTH, 4)):
+            raise ValueError('pixels must be a uint8 array of shape ({0}, {1}, 3) or ({0}, {1}, 4), got {2} {3}'.format(LOGI_LED_BITMAP_HEIGHT, LOGI_LED_BITMAP_WIDTH, pixels.dtype, pixels.shape))
+        channels = pixels.shape[2]
+        if channels == 4 and not swap and pixels.flags['C_CONTIGUOUS']:
+            return logi_led_set_lighting_from_bitmap(pixels)
+        bitmap = numpy.empty((LOGI_LED_BITMAP_HEIGHT, LOGI_LED_BITMAP_WIDTH, 4), numpy.uint8)
+        bitmap[..., :3] = pixels[..., 2::-1] if swap else pixels[..., :3]
+        bitmap[..., 3]  = pixels[..., 3] if channels == 4 else 255
+        return logi_led_set_lighting_from_bitmap(bitmap)
+    view = memoryview(pixels)
+    if view.itemsize != 1 or view.ndim != 1:
+        view = view.cast('B')
+    keys     = LOGI_LED_BITMAP_WIDTH * LOGI_LED_BITMAP_HEIGHT
+    channels = len(view) // keys
+    if channels not in (3, 4) or len(view) != keys * channels:
+        raise ValueError('pixels must hold {} or {} bytes, got {}'.format(keys * 3, keys * 4, len(view)))
+    if channels == 4 and not swap:
+        return logi_led_set_lighting_from_bitmap(pixels)
+    bitmap = bytearray(LOGI_LED_BITMAP_SIZE)
+    if swap:
+        bitmap[0::4], bitmap[2::4] = view[2::channels], view[0::channels]
+    else:
+        bitmap[0::4], bitmap[2::4] = view[0::channels], view[2::channels]
+    bitmap[1::4] = view[1::channels]
+    bitmap[3::4] = view[3::channels] if channels == 4 else b'\xff' * keys
+    return logi_led_set_lighting_from_bitmap(bitmap)
+
 def logi_led_set_lighting_for_key_with_scan_code(key_code, red_percentage, green_percentage, blue_percentage):
     """ sets the lighting to the color of the combined RGB percentages for the specified key code. note that RGB ranges from 0-255, but this function ranges from 0-100. 
         this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_code         = ctypes.c_int(key_code)
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        return bool(led_dll.LogiLedSetLightingForKeyWithScanCode(key_code, red_percentage, green_percentage, blue_percentage))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSetLightingForKeyWithScanCode(key_code, red_percentage, green_percentage, blue_percentage))
     else:
         return False
 
 def logi_led_set_lighting_for_key_with_hid_code(key_code, red_percentage, green_percentage, blue_percentage):
     """ sets the lighting to the color of the combined RGB percentages for the specified key code. note that RGB ranges from 0-255, but this function ranges from 0-100. 
         this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_code         = ctypes.c_int(key_code)
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        return bool(led_dll.LogiLedSetLightingForKeyWithHidCode(key_code, red_percentage, green_percentage, blue_percentage))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSetLightingForKeyWithHidCode(key_code, red_percentage, green_percentage, blue_percentage))
     else:
         return False
 
 def logi_led_set_lighting_for_key_with_quartz_code(key_code, red_percentage, green_percentage, blue_percentage):
     """ sets the lighting to the color of the combined RGB percentages for the specified key code. note that RGB ranges from 0-255, but this function ranges from 0-100. 
         this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_code         = ctypes.c_int(key_code)
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        return bool(led_dll.LogiLedSetLightingForKeyWithQuartzCode(key_code, red_percentage, green_percentage, blue_percentage))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSetLightingForKeyWithQuartzCode(key_code, red_percentage, green_percentage, blue_percentage))
     else:
         return False
 
 def logi_led_set_lighting_for_key_with_key_name(key_name, red_percentage, green_percentage, blue_percentage):
     """ sets the lighting to the color of the combined RGB percentages for the specified key name. note that RGB ranges from 0-255, but this function ranges from 0-100. 
         this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_name         = ctypes.c_int(key_name)
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        return bool(led_dll.LogiLedSetLightingForKeyWithKeyName(key_name, red_percentage, green_percentage, blue_percentage))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSetLightingForKeyWithKeyName(key_name, red_percentage, green_percentage, blue_percentage))
     else:
         return False
 
 def logi_led_save_lighting_for_key(key_name):
     """ saves the current lighting for the specified key name that can be restored later. this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_name = ctypes.c_int(key_name)
-        return bool(led_dll.LogiLedSaveLightingForKey(key_name))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedSaveLightingForKey(key_name))
     else:
         return False
 
 def logi_led_restore_lighting_for_key(key_name):
     """ restores the last saved lighting for the specified key name. this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_name = ctypes.c_int(key_name)
-        return bool(led_dll.LogiLedRestoreLightingForKey(key_name))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedRestoreLightingForKey(key_name))
     else:
         return False
 
@@ -390,14 +767,8 @@ def logi_led_flash_single_key(key_name, red_percentage, green_percentage, blue_p
     """ flashes the lighting color of the combined RGB percentages over the specified millisecond duration and millisecond interval for the specified key name.
         specifying a duration of 0 will cause the effect to be infinite until reset. note that RGB ranges from 0-255, but this function ranges from 0-100. 
         this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_name         = ctypes.c_int(key_name)
-        red_percentage   = ctypes.c_int(red_percentage)
-        green_percentage = ctypes.c_int(green_percentage)
-        blue_percentage  = ctypes.c_int(blue_percentage)
-        ms_duration      = ctypes.c_int(ms_duration)
-        ms_interval      = ctypes.c_int(ms_interval)
-        return bool(led_dll.LogiLedFlashSingleKey(key_name, red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedFlashSingleKey(key_name, red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval))
     else:
         return False
 
@@ -406,32 +777,23 @@ def logi_led_pulse_single_key(key_name, red_percentage_start, green_percentage_s
         the color will gradually change from the starting color to the ending color. if no ending color is specified, the ending color will be black.
         the effect will stop after one interval unless is_infinite is set to True. note that RGB ranges from 0-255, but this function ranges from 0-100.
         this function only applies to LOGI_DEVICETYPE_PERKEY_RGB devices. """
-    if led_dll:
-        key_name               = ctypes.c_int(key_name)
-        red_percentage_start   = ctypes.c_int(red_percentage_start)
-        green_percentage_start = ctypes.c_int(green_percentage_start)
-        blue_percentage_start  = ctypes.c_int(blue_percentage_start)
-        red_percentage_end     = ctypes.c_int(red_percentage_end)
-        green_percentage_end   = ctypes.c_int(green_percentage_end)
-        blue_percentage_end    = ctypes.c_int(blue_percentage_end)
-        ms_duration            = ctypes.c_int(ms_duration)
-        is_infinite            = ctypes.c_bool(is_infinite)
-        return bool(led_dll.LogiLedPulseSingleKey(key_name, red_percentage_start, green_percentage_start, blue_percentage_start, red_percentage_end, green_percentage_end, blue_percentage_end, ms_duration, is_infinite))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedPulseSingleKey(key_name, red_percentage_start, green_percentage_start, blue_percentage_start, red_percentage_end, green_percentage_end, blue_percentage_end, ms_duration, is_infinite))
     else:
         return False
 
 def logi_led_stop_effects_on_key(key_name):
     """ stops the pulse and flash effects on a single key. """
-    if led_dll:
-        key_name = ctypes.c_int(key_name)
-        return bool(led_dll.LogiLedStopEffectsOnKey(key_name))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiLedStopEffectsOnKey(key_name))
     else:
         return False
 
 def logi_led_shutdown():
     """ shutdowns the SDK for the thread. """
-    if led_dll:
-        return bool(led_dll.LogiLedShutdown())
+    if _led_dll or _load_default_dll():
+        _led_dll.LogiLedShutdown()
+        return True
     else:
         return False
 
@@ -440,10 +802,9 @@ def logi_led_get_config_option_number(key, default=0):
 
          for example, get the low health threshold:
           logi_led_get_config_option_number('health/low_health_threshold', 20.0) """
-    if led_dll:
-        key     = ctypes.c_wchar_p(key)
+    if _led_dll or _load_default_dll():
         default = ctypes.c_double(default)
-        if led_dll.LogiGetConfigOptionNumber(key, ctypes.pointer(default), _LOGI_SHARED_SDK_LED):
+        if _led_dll.LogiGetConfigOptionNumber(key, ctypes.pointer(default), _LOGI_SHARED_SDK_LED):
             return default.value
     return None
 
@@ -452,10 +813,9 @@ def logi_led_get_config_option_bool(key, default=False):
 
          for example, check if the effect is enabled:
           logi_led_get_config_option_bool('health/pulse_on_low', True) """
-    if led_dll:
-        key     = ctypes.c_wchar_p(key)
+    if _led_dll or _load_default_dll():
         default = ctypes.c_bool(default)
-        if led_dll.LogiGetConfigOptionBool(key, ctypes.pointer(default), _LOGI_SHARED_SDK_LED):
+        if _led_dll.LogiGetConfigOptionBool(key, ctypes.pointer(default), _LOGI_SHARED_SDK_LED):
             return default.value
     return None
 
@@ -468,8 +828,7 @@ def logi_led_get_config_option_color(key, *args):
          logi_led_get_config_option_color('health/pulse_color', Color('red'))
          logi_led_get_config_option_color('health/pulse_color', Color('#ff0000'))
          logi_led_get_config_option_color('health/pulse_color', Color(255, 0, 0)) """
-    if led_dll:
-        key              = ctypes.c_wchar_p(key)
+    if _led_dll or _load_default_dll():
         default          = None
         red_percentage   = 0
         green_percentage = 0
@@ -488,7 +847,7 @@ def logi_led_get_config_option_color(key, *args):
             red   = ctypes.c_int(int((red_percentage / 100.0) * 255))
             green = ctypes.c_int(int((green_percentage / 100.0) * 255))
             blue  = ctypes.c_int(int((blue_percentage / 100.0) * 255))
-        if led_dll.LogiGetConfigOptionColor(key, ctypes.pointer(red), ctypes.pointer(green), ctypes.pointer(blue), _LOGI_SHARED_SDK_LED):
+        if _led_dll.LogiGetConfigOptionColor(key, ctypes.pointer(red), ctypes.pointer(green), ctypes.pointer(blue), _LOGI_SHARED_SDK_LED):
             return Color(red.value, green.value, blue.value)
     return None
 
@@ -497,11 +856,10 @@ def logi_led_get_config_option_key_input(key, default=''):
 
         for example, get the primary ability key input:
          logi_led_get_config_option_key_input('abilities/primary', 'A') """
-    if led_dll:
-        key               = ctypes.c_wchar_p(key)
+    if _led_dll or _load_default_dll():
         default_key       = ctypes.create_string_buffer(256)
         default_key.value = default
-        if led_dll.LogiGetConfigOptionKeyInput(key, default_key, _LOGI_SHARED_SDK_LED):
+        if _led_dll.LogiGetConfigOptionKeyInput(key, default_key, _LOGI_SHARED_SDK_LED):
             return str(default_key.value)
     return None
 
@@ -511,9 +869,1070 @@ def logi_led_set_config_option_label(key, label):
         for example, label 'health/pulse_on_low' as 'Health - Pulse on Low':
          logi_led_set_config_option_label('health', 'Health')
          logi_led_set_config_option_label('health/pulse_on_low', 'Pulse on Low') """
-    if led_dll:
-        key   = ctypes.c_wchar_p(key)
-        label = ctypes.c_wchar_p(label)
-        return bool(led_dll.LogiSetConfigOptionLabel(key, label, _LOGI_SHARED_SDK_LED))
+    if _led_dll or _load_default_dll():
+        return bool(_led_dll.LogiSetConfigOptionLabel(key, label, _LOGI_SHARED_SDK_LED))
     else:
         return False
+
+
+# Config Options
+#
+CONFIG_NUMBER    = 'number'
+CONFIG_BOOL      = 'bool'
+CONFIG_COLOR     = 'color'
+CONFIG_KEY_INPUT = 'key_input'
+
+class ConfigOption(object):
+    """ a user configurable option: its key, one of CONFIG_NUMBER, CONFIG_BOOL, CONFIG_COLOR or CONFIG_KEY_INPUT, the default value and an
+        optional label. color defaults are a Color or a 0-255 (red, green, blue) tuple. """
+
+    __slots__ = ('key', 'kind', 'default', 'label')
+
+    def __init__(self, key, kind, default, label = None):
+        if kind not in (CONFIG_NUMBER, CONFIG_BOOL, CONFIG_COLOR, CONFIG_KEY_INPUT):
+            raise ValueError('unknown config option type {!r}'.format(kind))
+        if kind == CONFIG_COLOR and not isinstance(default, Color):
+            default = Color(default[0], default[1], default[2])
+        self.key     = key
+        self.kind    = kind
+        self.default = default
+        self.label   = label
+
+    def __repr__(self):
+        return 'ConfigOption({!r}, {!r}, {!r}, {!r})'.format(self.key, self.kind, self.default, self.label)
+
+class LedConfig(object):
+    """ an in-memory cache of config options, registered once and read without calling into the SDK.
+
+        load() sets every option and group label with logi_led_set_config_option_label and fetches every value in one pass, reusing the same
+        ctypes buffers for all of them. reads are dict lookups and color options return the same Color object until the user changes it.
+        values are fetched again by refresh(), or on the first read once interval seconds have passed since the last fetch. options the SDK
+        cannot return keep their default.
+
+        for example:
+         config = LedConfig([ConfigOption('health/low_health_threshold', CONFIG_NUMBER, 20.0, 'Low Health Threshold'),
+                             ConfigOption('health/pulse_color', CONFIG_COLOR, Color('red'), 'Pulse Color')],
+                            labels = {'health': 'Health'}, interval = 5.0)
+         config.load()
+         config['health/low_health_threshold'] """
+
+    def __init__(self, options = (), labels = None, interval = None):
+        self.interval       = interval
+        self.version        = 0
+        self._options       = collections.OrderedDict()
+        self._labels        = collections.OrderedDict(labels or ())
+        self._values        = {}
+        self._loaded        = False
+        self._next_refresh  = None
+        self._lock          = threading.Lock()
+        self._number        = ctypes.pointer(ctypes.c_double())
+        self._bool          = ctypes.pointer(ctypes.c_bool())
+        self._color         = tuple(ctypes.pointer(ctypes.c_int()) for _ in range(3))
+        self._key_input     = ctypes.create_string_buffer(256)
+        for option in options:
+            self.register(option)
+
+    def register(self, option, *args, **kwargs):
+        """ adds a ConfigOption, or one built from (key, kind, default, label), and returns it. options registered after load() are
+            labelled and fetched by the next refresh(). """
+        if not isinstance(option, ConfigOption):
+            option = ConfigOption(option, *args, **kwargs)
+        with self._lock:
+            # copied rather than changed in place, so a refresh() or options on another thread keeps iterating the options it started with
+            options             = collections.OrderedDict(self._options)
+            options[option.key] = option
+            self._options       = options
+            if option.key not in self._values:
+                values = dict(self._values)
+                values[option.key] = option.default
+                self._values = values
+            self._loaded = False
+        return option
+
+    @property
+    def options(self):
+        return list(self._options.values())
+
+    def _fetch(self, option):
+        """ returns the value of option from the SDK, or None if the call failed. """
+        dll = _led_dll
+        if option.kind == CONFIG_NUMBER:
+            self._number.contents.value = option.default
+            if dll.LogiGetConfigOptionNumber(option.key, self._number, _LOGI_SHARED_SDK_LED):
+                return self._number.contents.value
+        elif option.kind == CONFIG_BOOL:
+            self._bool.contents.value = option.default
+            if dll.LogiGetConfigOptionBool(option.key, self._bool, _LOGI_SHARED_SDK_LED):
+                return self._bool.contents.value
+        elif option.kind == CONFIG_COLOR:
+            red, green, blue = self._color
+            red.contents.value, green.contents.value, blue.contents.value = option.default.red, option.default.green, option.default.blue
+            if dll.LogiGetConfigOptionColor(option.key, red, green, blue, _LOGI_SHARED_SDK_LED):
+                return red.contents.value, green.contents.value, blue.contents.value
+        else:
+            default = option.default
+            self._key_input.value = default.encode('utf-8') if not isinstance(default, bytes) else default
+            if dll.LogiGetConfigOptionKeyInput(option.key, self._key_input, _LOGI_SHARED_SDK_LED):
+                value = self._key_input.value
+                return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+        return None
+
+    def load(self):
+        """ applies the labels and fetches every value. returns False if the SDK is not available. """
+        if not (_led_dll or _load_default_dll()):
+            return False
+        self._loaded = False
+        self.refresh()
+        return True
+
+    def refresh(self):
+        """ fetches every value again and returns the keys whose value changed. labels are applied first if options were registered since. """
+        if not _led_dll:
+            return []
+        with self._lock:
+            options = self._options
+            if not self._loaded:
+                for key, label in self._labels.items():
+                    _led_dll.LogiSetConfigOptionLabel(key, label, _LOGI_SHARED_SDK_LED)
+                for option in options.values():
+                    if option.label is not None:
+                        _led_dll.LogiSetConfigOptionLabel(option.key, option.label, _LOGI_SHARED_SDK_LED)
+                self._loaded = True
+            values  = dict(self._values)
+            changed = []
+            for key, option in options.items():
+                value = self._fetch(option)
+                if value is None:
+                    continue
+                previous = values.get(key)
+                if option.kind == CONFIG_COLOR:
+                    if (previous.red, previous.green, previous.blue) == value:
+                        continue
+                    value = Color(value[0], value[1], value[2])
+                elif value == previous:
+                    continue
+                values[key] = value
+                changed.append(key)
+            # readers see either the old or the new values, never a partly updated cache
+            self._values = values
+            if changed:
+                self.version += 1
+            if self.interval is not None:
+                self._next_refresh = _monotonic() + self.interval
+        return changed
+
+    def get(self, key):
+        """ returns the cached value of key, refreshing first if the interval has passed. raises KeyError for unregistered keys. """
+        if self._next_refresh is not None and _monotonic() >= self._next_refresh:
+            self.refresh()
+        return self._values[key]
+
+    __getitem__ = get
+
+    def __contains__(self, key):
+        return key in self._options
+
+    def values(self):
+        """ returns a dict of key -> cached value. """
+        return dict(self._values)
+
+
+# Frame Buffering
+#
+_OPAQUE_KEYS = b'\xff' * (LOGI_LED_BITMAP_SIZE // LOGI_LED_BITMAP_BYTES_PER_KEY)
+
+def _over_black(frame):
+    """ returns a BGRA frame with every key opaque and its color scaled by its alpha, as if drawn over black. rounds like LedCompositor,
+        so a canvas committed on its own shows the same as a single layer of a compositor. """
+    if frame[3::4] == _OPAQUE_KEYS:
+        return frame
+    pixels = bytearray(frame)
+    for offset in range(0, LOGI_LED_BITMAP_SIZE, LOGI_LED_BITMAP_BYTES_PER_KEY):
+        alpha = pixels[offset + 3]
+        if alpha != 255:
+            for channel in range(offset, offset + 3):
+                pixels[channel] = (2 * pixels[channel] * alpha + 255) // 510
+            pixels[offset + 3] = 255
+    return bytes(pixels)
+
+class LedCanvas(object):
+    """ a persistent BGRA frame of LOGI_LED_BITMAP_WIDTH x LOGI_LED_BITMAP_HEIGHT keys that is drawn in place and only sent to the SDK on commit().
+
+        the alpha of a key is its coverage: commit() sends every key opaque with its color scaled by its alpha, as if drawn over black, both
+        in a bitmap push and in per-key calls, which cannot carry alpha. a key with alpha 0 is off.
+
+        commit() compares the frame against the last frame it sent and skips the SDK entirely when nothing changed. when only a few keys changed
+        and cell_keys (BITMAP_CELL_TO_KEY by default) maps their cells to key names, it sends one logi_led_set_lighting_for_key_with_key_name
+        call per key instead of a full logi_led_set_lighting_from_bitmap push, whichever costs less according to key_call_cost and bitmap_call_cost.
+        reserved_keys are key names commit() never sends, such as keys running a device-side effect; while any are reserved, changed keys
+        are always sent per key, since a bitmap push would overwrite them. """
+
+    key_call_cost    = 1
+    bitmap_call_cost = 4
+
+    def __init__(self, cell_keys = None, key_call_cost = None, bitmap_call_cost = None):
+        self.buffer        = (ctypes.c_ubyte * LOGI_LED_BITMAP_SIZE)()
+        self.cell_keys     = BITMAP_CELL_TO_KEY if cell_keys is None else cell_keys
+        self.reserved_keys = frozenset()
+        if key_call_cost is not None:
+            self.key_call_cost = key_call_cost
+        if bitmap_call_cost is not None:
+            self.bitmap_call_cost = bitmap_call_cost
+        self._sent         = None
+
+    def _offset(self, column, row):
+        if not (0 <= column < LOGI_LED_BITMAP_WIDTH and 0 <= row < LOGI_LED_BITMAP_HEIGHT):
+            raise IndexError('pixel ({}, {}) is outside of the {}x{} bitmap'.format(column, row, LOGI_LED_BITMAP_WIDTH, LOGI_LED_BITMAP_HEIGHT))
+        return (row * LOGI_LED_BITMAP_WIDTH + column) * LOGI_LED_BITMAP_BYTES_PER_KEY
+
+    def set_pixel(self, column, row, red, green, blue, alpha = 255):
+        """ sets the key at column, row to the given 0-255 RGBA color. """
+        offset = self._offset(column, row)
+        self.buffer[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY] = (blue, green, red, alpha)
+
+    def set_key(self, key_name, red, green, blue, alpha = 255):
+        """ sets the key to the given 0-255 RGBA color. returns False if the key is not part of the bitmap. """
+        cell = KEY_TO_BITMAP_CELL.get(key_name)
+        if cell is None:
+            return False
+        offset = cell * LOGI_LED_BITMAP_BYTES_PER_KEY
+        self.buffer[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY] = (blue, green, red, alpha)
+        return True
+
+    def get_pixel(self, column, row):
+        """ returns the 0-255 (red, green, blue, alpha) color of the key at column, row. """
+        offset = self._offset(column, row)
+        blue, green, red, alpha = self.buffer[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY]
+        return red, green, blue, alpha
+
+    def fill_rect(self, column, row, width, height, red, green, blue, alpha = 255):
+        """ sets every key of the rectangle to the given 0-255 RGBA color. the rectangle is clipped to the bitmap. """
+        left   = max(column, 0)
+        top    = max(row, 0)
+        right  = min(column + width, LOGI_LED_BITMAP_WIDTH)
+        bottom = min(row + height, LOGI_LED_BITMAP_HEIGHT)
+        if left >= right or top >= bottom:
+            return
+        span    = bytes(bytearray((blue, green, red, alpha)) * (right - left))
+        address = ctypes.addressof(self.buffer)
+        for y in range(top, bottom):
+            ctypes.memmove(address + (y * LOGI_LED_BITMAP_WIDTH + left) * LOGI_LED_BITMAP_BYTES_PER_KEY, span, len(span))
+
+    def write(self, data, column = 0, row = 0):
+        """ copies packed BGRA bytes into the frame starting at column, row and continuing in row order, e.g. a row from Palette.map_bitmap(). """
+        offset = self._offset(column, row)
+        data   = bytes(data)
+        if offset + len(data) > LOGI_LED_BITMAP_SIZE:
+            raise ValueError('{} bytes starting at ({}, {}) do not fit in the bitmap'.format(len(data), column, row))
+        ctypes.memmove(ctypes.addressof(self.buffer) + offset, data, len(data))
+
+    def fill(self, red, green, blue, alpha = 255):
+        """ sets every key of the frame to the given 0-255 RGBA color. """
+        self.fill_rect(0, 0, LOGI_LED_BITMAP_WIDTH, LOGI_LED_BITMAP_HEIGHT, red, green, blue, alpha)
+
+    def clear(self):
+        """ sets every key of the frame to black. """
+        ctypes.memset(self.buffer, 0, LOGI_LED_BITMAP_SIZE)
+
+    def tobytes(self):
+        """ returns a copy of the frame as a BGRA byte string. """
+        return ctypes.string_at(self.buffer, LOGI_LED_BITMAP_SIZE)
+
+    def invalidate(self):
+        """ forgets the last sent frame so the next commit() pushes the full bitmap. call this after changing the lighting through any other function. """
+        self._sent = None
+
+    def _changed_keys(self, frame, sent):
+        """ returns the (key_name, offset) pairs of the changed cells, or None when a bitmap push is cheaper or a changed cell has no key. """
+        cell_keys = self.cell_keys
+        changed   = []
+        budget    = self.bitmap_call_cost
+        for offset in range(0, LOGI_LED_BITMAP_SIZE, LOGI_LED_BITMAP_BYTES_PER_KEY):
+            end = offset + LOGI_LED_BITMAP_BYTES_PER_KEY
+            if frame[offset:end] != sent[offset:end]:
+                key_name = cell_keys.get(offset // LOGI_LED_BITMAP_BYTES_PER_KEY)
+                budget  -= self.key_call_cost
+                if key_name is None or budget <= 0:
+                    return None
+                changed.append((key_name, offset))
+        return changed
+
+    def _reserved_changes(self, frame, sent):
+        """ returns the frame with the cells of reserved_keys as last sent, and the (key_name, offset) pairs of the other changed keys. """
+        pixels = bytearray(frame)
+        for key_name in self.reserved_keys:
+            cell = KEY_TO_BITMAP_CELL.get(key_name)
+            if cell is not None:
+                offset = cell * LOGI_LED_BITMAP_BYTES_PER_KEY
+                if sent is not None:
+                    pixels[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY] = sent[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY]
+                else:
+                    # never sent: alpha 0 differs from every frame _over_black() returns, so the key goes out once it is released
+                    pixels[offset + 3] = 0
+        frame   = bytes(pixels)
+        changed = []
+        for cell, key_name in sorted(self.cell_keys.items()):
+            offset = cell * LOGI_LED_BITMAP_BYTES_PER_KEY
+            end    = offset + LOGI_LED_BITMAP_BYTES_PER_KEY
+            if key_name not in self.reserved_keys and (sent is None or frame[offset:end] != sent[offset:end]):
+                changed.append((key_name, offset))
+        return frame, changed
+
+    def commit(self):
+        """ sends the frame to the SDK if it changed since the last commit. returns True if nothing had to be sent or every SDK call succeeded. """
+        frame = _over_black(ctypes.string_at(self.buffer, LOGI_LED_BITMAP_SIZE))
+        sent  = self._sent
+        if self.reserved_keys:
+            frame, changed = self._reserved_changes(frame, sent)
+            if not changed:
+                return True
+        elif frame == sent:
+            return True
+        else:
+            changed = self._changed_keys(frame, sent) if sent is not None and self.cell_keys else None
+        if changed is None:
+            result = logi_led_set_lighting_from_bitmap(frame)
+        else:
+            pixels = bytearray(frame)
+            result = True
+            for key_name, offset in changed:
+                result &= logi_led_set_lighting_for_key_with_key_name(key_name, _BYTE_PERCENT[pixels[offset + 2]], _BYTE_PERCENT[pixels[offset + 1]], _BYTE_PERCENT[pixels[offset]])
+        self._sent = frame if result else None
+        return result
+
+
+# Scenes
+#
+_DEVICE_CLASSES = (LOGI_DEVICETYPE_PERKEY_RGB, LOGI_DEVICETYPE_RGB, LOGI_DEVICETYPE_MONOCHROME)
+
+class LedScene(object):
+    """ one frame of lighting for per-key RGB keyboards, RGB devices such as mice and monochrome devices such as headsets, committed with
+        as few SDK calls and target device switches as possible.
+
+        keys is the LedCanvas drawn for LOGI_DEVICETYPE_PERKEY_RGB devices. rgb is the 0-255 (red, green, blue) of LOGI_DEVICETYPE_RGB
+        devices, or None to use the average color of the keys in rgb_zone (every key of the bitmap by default). monochrome is the 0-255
+        brightness of LOGI_DEVICETYPE_MONOCHROME devices, or None to use the brightest channel of the RGB color. devices limits the device
+        classes the scene drives.
+
+        commit() derives every class's output in one pass, skips the classes whose output did not change, sets equal RGB and monochrome
+        outputs with a single call, and orders the calls so the target device is switched as rarely as possible, starting from the
+        target the thread already has. """
+
+    def __init__(self, keys = None, rgb = None, monochrome = None, rgb_zone = None, devices = LOGI_DEVICETYPE_ALL):
+        self.keys       = keys if keys is not None else LedCanvas()
+        self.rgb        = rgb
+        self.monochrome = monochrome
+        self.devices    = devices
+        self.rgb_zone   = rgb_zone
+        self.switches   = 0
+        self._sent      = {}
+
+    @property
+    def rgb_zone(self):
+        return self._rgb_zone
+
+    @rgb_zone.setter
+    def rgb_zone(self, key_names):
+        self._rgb_zone = key_names
+        cells          = sorted(KEY_TO_BITMAP_CELL.values()) if key_names is None else [KEY_TO_BITMAP_CELL[key_name] for key_name in key_names if key_name in KEY_TO_BITMAP_CELL]
+        self._zone     = [cell * LOGI_LED_BITMAP_BYTES_PER_KEY for cell in cells]
+
+    def outputs(self, frame = None):
+        """ returns a dict of device class -> output: the BGRA frame for per-key devices and SDK (red, green, blue) percentages for the others. """
+        frame   = frame if frame is not None else self.keys.tobytes()
+        outputs = {}
+        if self.devices & LOGI_DEVICETYPE_PERKEY_RGB:
+            outputs[LOGI_DEVICETYPE_PERKEY_RGB] = frame
+        if self.devices & (LOGI_DEVICETYPE_RGB | LOGI_DEVICETYPE_MONOCHROME):
+            rgb = self.rgb
+            if rgb is None:
+                rgb = self._average(frame)
+            if self.devices & LOGI_DEVICETYPE_RGB:
+                outputs[LOGI_DEVICETYPE_RGB] = _rgb_percent(*rgb)
+            if self.devices & LOGI_DEVICETYPE_MONOCHROME:
+                level = self.monochrome if self.monochrome is not None else max(rgb)
+                outputs[LOGI_DEVICETYPE_MONOCHROME] = _rgb_percent(level, level, level)
+        return outputs
+
+    def _average(self, frame):
+        zone = self._zone
+        if not zone:
+            return 0, 0, 0
+        pixels = bytearray(frame)
+        blue   = green = red = 0
+        for offset in zone:
+            blue  += pixels[offset]
+            green += pixels[offset + 1]
+            red   += pixels[offset + 2]
+        count = len(zone)
+        return (red + count // 2) // count, (green + count // 2) // count, (blue + count // 2) // count
+
+    def _commands(self, outputs):
+        """ returns the commands for the changed outputs as (acceptable targets, preferred target, device classes, color or None). """
+        changed  = [device for device, output in outputs.items() if self._sent.get(device) != output]
+        commands = []
+        if LOGI_DEVICETYPE_PERKEY_RGB in changed:
+            targets = frozenset(target for target in range(1, LOGI_DEVICETYPE_ALL + 1) if target & LOGI_DEVICETYPE_PERKEY_RGB)
+            commands.append((targets, LOGI_DEVICETYPE_PERKEY_RGB, LOGI_DEVICETYPE_PERKEY_RGB, None))
+        colors = collections.OrderedDict()
+        for device in (LOGI_DEVICETYPE_RGB, LOGI_DEVICETYPE_MONOCHROME):
+            if device in changed:
+                colors.setdefault(outputs[device], []).append(device)
+        for color, devices in colors.items():
+            required = sum(devices)
+            # any target also covering unchanged classes that should show the same color works, a class driven differently must not be hit
+            allowed  = sum(device for device in (LOGI_DEVICETYPE_RGB, LOGI_DEVICETYPE_MONOCHROME) if outputs.get(device) == color)
+            targets  = frozenset(target for target in range(1, LOGI_DEVICETYPE_ALL + 1) if target & required == required and target & ~allowed == 0)
+            commands.append((targets, required, required, color))
+        return commands
+
+    def _plan(self, commands, target):
+        """ returns the order of commands needing the fewest target switches from target, and that number. """
+        best = None
+        for order in itertools.permutations(commands):
+            current  = target
+            switches = 0
+            for targets, preferred, _, _ in order:
+                if current not in targets:
+                    current   = preferred
+                    switches += 1
+            if best is None or switches < best[1]:
+                best = (order, switches)
+        return best if best is not None else ((), 0)
+
+    def commit(self):
+        """ sends the outputs that changed since the last commit. returns True if nothing had to be sent or every SDK call succeeded. """
+        outputs = self.outputs()
+        order, _ = self._plan(self._commands(outputs), logi_led_get_target_device())
+        result   = True
+        for targets, preferred, devices, color in order:
+            if logi_led_get_target_device() not in targets:
+                self.switches += 1
+                if not logi_led_set_target_device(preferred):
+                    result = False
+                    continue
+            if color is None:
+                sent = self.keys.commit()
+            else:
+                sent = logi_led_set_lighting(*color)
+            for device in _DEVICE_CLASSES:
+                if device & devices:
+                    if sent:
+                        self._sent[device] = outputs[device]
+                    else:
+                        self._sent.pop(device, None)
+            result = result and sent
+        return result
+
+    def invalidate(self):
+        """ forgets what was sent, so the next commit() sends every output. """
+        self._sent.clear()
+        self.keys.invalidate()
+
+
+# Snapshots
+#
+_ROW_SIZE = LOGI_LED_BITMAP_WIDTH * LOGI_LED_BITMAP_BYTES_PER_KEY
+
+class LedSnapshotStack(object):
+    """ a stack of full BGRA frames for nested overlays, replacing the single slot of logi_led_save_current_lighting and the per-key
+        calls of logi_led_restore_lighting_for_key.
+
+        push() takes a snapshot of canvas, or of a given frame, and restoring one is a single logi_led_set_lighting_from_bitmap push that also
+        puts the frame back into canvas. a snapshot is a tuple of immutable rows and reuses the rows of the snapshot below that did not
+        change, so taking one per frame costs a copy of the changed rows only. max_depth drops the oldest snapshots beyond it. """
+
+    def __init__(self, canvas = None, max_depth = None):
+        self.canvas    = canvas
+        self.max_depth = max_depth
+        self._stack    = []
+
+    def _rows(self, frame):
+        if frame is None:
+            if self.canvas is None:
+                raise ValueError('push() needs a frame when the stack has no canvas')
+            frame = self.canvas.tobytes()
+        elif isinstance(frame, LedCanvas):
+            frame = frame.tobytes()
+        else:
+            frame = bytes(frame)
+        if len(frame) != LOGI_LED_BITMAP_SIZE:
+            raise ValueError('a snapshot needs a {} byte bitmap, got {} bytes'.format(LOGI_LED_BITMAP_SIZE, len(frame)))
+        rows = [frame[offset:offset + _ROW_SIZE] for offset in range(0, LOGI_LED_BITMAP_SIZE, _ROW_SIZE)]
+        if self._stack:
+            below = self._stack[-1]
+            rows  = [shared if shared == row else row for row, shared in zip(rows, below)]
+        return tuple(rows)
+
+    def push(self, frame = None):
+        """ pushes a snapshot of frame, a LedCanvas or BGRA bytes, or of canvas if frame is None. returns the depth of the stack. """
+        self._stack.append(self._rows(frame))
+        if self.max_depth is not None and len(self._stack) > self.max_depth:
+            del self._stack[:len(self._stack) - self.max_depth]
+        return len(self._stack)
+
+    def peek(self, index = -1):
+        """ returns the snapshot at index, the top one by default, as BGRA bytes. raises IndexError if the stack is empty. """
+        return b''.join(self._stack[index])
+
+    def restore(self, index = -1):
+        """ sends the snapshot at index to the SDK with one bitmap push and copies it into canvas, leaving the stack as it is.
+            returns the result of the push. """
+        frame  = self.peek(index)
+        shown  = _over_black(frame)
+        result = logi_led_set_lighting_from_bitmap(shown)
+        canvas = self.canvas
+        if canvas is not None:
+            ctypes.memmove(canvas.buffer, frame, LOGI_LED_BITMAP_SIZE)
+            # the canvas now matches what the device shows, so its next commit only sends what is drawn over the snapshot
+            canvas._sent = shown if result else None
+        return result
+
+    def pop(self, restore = True):
+        """ removes the top snapshot and returns it as BGRA bytes, restoring it first unless restore is False. raises IndexError if the
+            stack is empty. """
+        if restore:
+            self.restore()
+        return b''.join(self._stack.pop())
+
+    def clear(self):
+        """ drops every snapshot. """
+        del self._stack[:]
+
+    def __len__(self):
+        return len(self._stack)
+
+    def stats(self):
+        """ returns the depth of the stack and the bytes held by its distinct rows against the bytes of as many full frames. """
+        rows = dict((id(row), len(row)) for snapshot in self._stack for row in snapshot)
+        return {
+            'depth':        len(self._stack),
+            'bytes_stored': sum(rows.values()),
+            'bytes_frames': len(self._stack) * LOGI_LED_BITMAP_SIZE,
+        }
+
+
+# Effect Scheduling
+#
+_monotonic = getattr(time, 'perf_counter', time.time)
+
+def _percentile(samples, fraction):
+    """ returns the sample at the given fraction (0-1) of the sorted samples, or None if there are none. """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class EffectScheduler(object):
+    """ runs effect callables on a dedicated thread at a fixed frame rate and sends the frame once per tick through LedCanvas.commit(), so
+        every tick shows key alpha the same way as a direct commit, an unchanged frame costs no SDK call and a few changed keys are sent per key.
+
+        every tick calls each registered effect as effect(frame, now, dt) in registration order, where frame is the shared LedCanvas, now the
+        monotonic time of the tick and dt the seconds since the previous tick. when every effect returns False, for nothing drawn, the tick
+        does not commit at all. ticks are paced against absolute deadlines so they do not drift.
+        a tick whose rendering and push do not finish before the next deadline counts as late. when the thread falls a whole period or more
+        behind, the missed ticks are counted as dropped and skipped instead of being rendered in a burst.
+
+        set init_sdk to call logi_led_init and logi_led_shutdown on the scheduler thread, since the SDK is initialized per thread. call
+        frame.invalidate() after changing the lighting through any other function, so the next tick sends the whole frame again. """
+
+    def __init__(self, fps = 60, frame = None, init_sdk = False, latency_samples = 1024):
+        self.period         = 1.0 / fps
+        self.frame          = frame if frame is not None else LedCanvas()
+        self.init_sdk       = init_sdk
+        self.ticks          = 0
+        self.late_frames    = 0
+        self.dropped_frames = 0
+        self.unchanged      = 0
+        self.errors         = 0
+        self._effects       = ()
+        self._dll_times     = collections.deque(maxlen = latency_samples)
+        self._lock          = threading.Lock()
+        self._stop_event    = threading.Event()
+        self._thread        = None
+
+    def add_effect(self, effect):
+        """ registers an effect callable to run on every tick after the already registered ones. returns the effect so it can be used as a decorator. """
+        with self._lock:
+            self._effects = self._effects + (effect,)
+        return effect
+
+    def remove_effect(self, effect):
+        """ unregisters an effect callable. """
+        with self._lock:
+            self._effects = tuple(registered for registered in self._effects if registered is not effect)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ starts the scheduler thread. """
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target = self._run, name = 'logipy-effect-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = None):
+        """ stops the scheduler thread and waits for it to exit. """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        """ returns the tick, late, dropped, unchanged and error counters and the p50/p99 milliseconds spent in the DLL per tick that sent
+            something. """
+        with self._lock:
+            dll_times = list(self._dll_times)
+        p50 = _percentile(dll_times, 0.50)
+        p99 = _percentile(dll_times, 0.99)
+        return {
+            'ticks':          self.ticks,
+            'late_frames':    self.late_frames,
+            'dropped_frames': self.dropped_frames,
+            'unchanged':      self.unchanged,
+            'errors':         self.errors,
+            'dll_p50_ms':     p50 * 1000.0 if p50 is not None else None,
+            'dll_p99_ms':     p99 * 1000.0 if p99 is not None else None,
+        }
+
+    def _tick(self, now, dt):
+        frame   = self.frame
+        effects = self._effects
+        drawn   = not effects
+        for effect in effects:
+            try:
+                drawn = effect(frame, now, dt) is not False or drawn
+            except Exception:
+                import logging
+                self.errors += 1
+                drawn        = True
+                logging.getLogger(__name__).exception('LED effect %r failed', effect)
+        if not drawn:
+            # every effect reported it had nothing to draw
+            self.unchanged += 1
+            self.ticks     += 1
+            return
+        sent    = frame._sent
+        start   = _monotonic()
+        result  = frame.commit()
+        elapsed = _monotonic() - start
+        if result and frame._sent is sent:
+            # commit() found nothing to send
+            self.unchanged += 1
+        else:
+            with self._lock:
+                self._dll_times.append(elapsed)
+        self.ticks += 1
+
+    def _run(self):
+        if self.init_sdk:
+            logi_led_init()
+        try:
+            period   = self.period
+            deadline = _monotonic()
+            previous = deadline
+            while not self._stop_event.is_set():
+                remaining = deadline - _monotonic()
+                if remaining > 0 and self._stop_event.wait(remaining):
+                    break
+                now    = _monotonic()
+                behind = int((now - deadline) / period)
+                if behind > 0:
+                    self.dropped_frames += behind
+                    deadline            += behind * period
+                self._tick(now, now - previous)
+                previous  = now
+                deadline += period
+                if _monotonic() > deadline:
+                    self.late_frames += 1
+        finally:
+            if self.init_sdk:
+                logi_led_shutdown()
+
+
+# Native Effects
+#
+EFFECT_FLASH = 'flash'
+EFFECT_PULSE = 'pulse'
+
+def _milliseconds(seconds):
+    return int(round(seconds * 1000.0))
+
+def _effect_color(color):
+    if color is None or isinstance(color, Color):
+        return color
+    if isinstance(color, str):
+        return Color(color)
+    return Color(color[0], color[1], color[2])
+
+class LedEffect(object):
+    """ a declarative flash or pulse: kind is EFFECT_FLASH or EFFECT_PULSE, color and end_color are Color objects or 0-255 (red, green, blue)
+        tuples, keys the key names to animate or None for the whole lighting, period the seconds per flash or pulse, duration the seconds
+        the effect runs or None to run until stopped, and phase the seconds the animation is shifted by.
+
+        a flash shows color for the first half of every period. a pulse fades from color to end_color (black by default) and back. """
+
+    def __init__(self, kind, color, keys = None, end_color = None, period = 1.0, duration = None, phase = 0.0):
+        if kind not in (EFFECT_FLASH, EFFECT_PULSE):
+            raise ValueError('unknown effect {!r}'.format(kind))
+        if period <= 0:
+            raise ValueError('the period must be positive, got {!r}'.format(period))
+        self.kind      = kind
+        self.color     = _effect_color(color)
+        self.end_color = _effect_color(end_color)
+        self.keys      = tuple(keys) if keys is not None else None
+        self.period    = float(period)
+        self.duration  = duration
+        self.phase     = phase
+
+    def color_at(self, elapsed):
+        """ returns the 0-255 (red, green, blue) the effect shows elapsed seconds after it started. """
+        position = ((elapsed + self.phase) % self.period) / self.period
+        start    = self.color
+        if self.kind == EFFECT_FLASH:
+            return (start.red, start.green, start.blue) if position < 0.5 else (0, 0, 0)
+        end    = self.end_color or Color(0, 0, 0)
+        amount = (1.0 - math.cos(2.0 * math.pi * position)) / 2.0
+        return tuple(int(first + (last - first) * amount + 0.5) for first, last in ((start.red, end.red), (start.green, end.green), (start.blue, end.blue)))
+
+    def __repr__(self):
+        return 'LedEffect({!r}, {!r}, keys = {!r}, period = {!r}, duration = {!r})'.format(self.kind, self.color, self.keys, self.period, self.duration)
+
+class LedEffectPlanner(object):
+    """ plays LedEffect objects on the device-side flash and pulse primitives of the SDK whenever they can express them, so a running effect
+        costs one call per key when it starts instead of one bitmap push per frame. effects the primitives cannot express, such as a phase
+        shift, a global pulse towards a color other than black or a per-key pulse lasting several periods, are rendered in software by
+        render(frame, now, dt), which is meant to be registered with EffectScheduler.add_effect. it returns False while no software effect
+        runs, so the scheduler sends nothing for the tick and a device running only native effects sees no SDK calls.
+
+        the planner tracks which keys have native effects running. render() leaves their cells alone and puts them in frame.reserved_keys,
+        so commits of the frame never send them, stop() only calls the SDK for keys that
+        actually run a native effect, and playing a software effect over a key stops its native effect first so the two do not fight.
+        playing a native effect drops only the software effects it hides until they end, the others resume once the native effect ends.
+        call restart() after anything that resets the device-side effects, such as logi_led_restore_lighting. """
+
+    def __init__(self):
+        self.native_calls = 0
+        self.stop_calls   = 0
+        # key name, or None for the whole lighting -> (effect, end time or None)
+        self._native      = {}
+        # (effect, start time) in play order, later effects drawn over earlier ones
+        self._software    = []
+        self._lock        = threading.Lock()
+
+    def is_native(self, effect):
+        """ returns True if the SDK primitives can play effect. """
+        if effect.phase:
+            return False
+        if effect.kind == EFFECT_FLASH:
+            return True
+        black = effect.end_color is None or (effect.end_color.red, effect.end_color.green, effect.end_color.blue) == (0, 0, 0)
+        if effect.keys is None:
+            return black
+        # a single key pulse runs once or forever, never for a given number of periods
+        return effect.duration is None or _milliseconds(effect.duration) == _milliseconds(effect.period)
+
+    def _start_native(self, effect, key_name, duration):
+        """ issues the SDK call playing effect on key_name, or on the whole lighting if key_name is None, for duration seconds or forever. """
+        red, green, blue = effect.color.rgb_percent()
+        period           = _milliseconds(effect.period)
+        total            = _milliseconds(duration) if duration is not None else 0
+        self.native_calls += 1
+        if key_name is None:
+            if effect.kind == EFFECT_FLASH:
+                return logi_led_flash_lighting(red, green, blue, total, period)
+            return logi_led_pulse_lighting(red, green, blue, total, period)
+        if effect.kind == EFFECT_FLASH:
+            return logi_led_flash_single_key(key_name, red, green, blue, total, period)
+        end = (effect.end_color or Color(0, 0, 0)).rgb_percent()
+        return logi_led_pulse_single_key(key_name, red, green, blue, period, duration is None, *end)
+
+    def _stop_native(self, key_names):
+        """ stops the native effects running on key_names, or on every key if key_names is None. """
+        if key_names is None:
+            if self._native:
+                self.stop_calls += 1
+                logi_led_stop_effects()
+            self._native.clear()
+            return
+        for key_name in key_names:
+            if self._native.pop(key_name, None) is not None:
+                self.stop_calls += 1
+                logi_led_stop_effects_on_key(key_name)
+
+    def _prune(self, now):
+        for key_name, (_, end) in list(self._native.items()):
+            if end is not None and now >= end:
+                del self._native[key_name]
+        self._software = [(effect, start) for effect, start in self._software if effect.duration is None or now < start + effect.duration]
+
+    def _covered(self, effect, end):
+        """ drops the software effects that a native effect on effect.keys until end hides for the rest of their run. """
+        keys = set(effect.keys) if effect.keys is not None else None
+        def hidden(playing, start):
+            if keys is not None and (playing.keys is None or not keys.issuperset(playing.keys)):
+                return False
+            return end is None or (playing.duration is not None and start + playing.duration <= end)
+        self._software = [(playing, start) for playing, start in self._software if not hidden(playing, start)]
+
+    def play(self, effect, now = None):
+        """ starts effect natively if possible and in software otherwise. returns True if it runs natively. """
+        now = _monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            end = now + effect.duration if effect.duration is not None else None
+            if not self.is_native(effect):
+                # a bitmap push would fight a native effect on the same keys
+                self._stop_native(None if effect.keys is None or None in self._native else effect.keys)
+                self._software.append((effect, now))
+                return False
+            self._covered(effect, end)
+            if effect.keys is None:
+                self._stop_native(None)
+                if self._start_native(effect, None, effect.duration):
+                    self._native[None] = (effect, end)
+                return True
+            for key_name in effect.keys:
+                if self._start_native(effect, key_name, effect.duration):
+                    self._native[key_name] = (effect, end)
+            return True
+
+    def stop(self, effect = None):
+        """ stops effect, or every effect if effect is None. """
+        with self._lock:
+            if effect is None:
+                self._stop_native(None)
+                self._software = []
+                return
+            self._software = [(playing, start) for playing, start in self._software if playing is not effect]
+            self._stop_native([key_name for key_name, (playing, _) in self._native.items() if playing is effect])
+
+    def native_keys(self, now = None):
+        """ returns the key names running a native effect. None in the result means an effect on the whole lighting. """
+        with self._lock:
+            self._prune(_monotonic() if now is None else now)
+            return frozenset(self._native)
+
+    def restart(self, now = None):
+        """ starts every native effect that should still be running again, for its remaining duration. a finite single key pulse
+            always runs for exactly one period, so it cannot be resumed part way and ends instead. """
+        now = _monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            for key_name, (effect, end) in list(self._native.items()):
+                if end is not None and key_name is not None and effect.kind == EFFECT_PULSE:
+                    del self._native[key_name]
+                elif not self._start_native(effect, key_name, end - now if end is not None else None):
+                    del self._native[key_name]
+
+    def render(self, frame, now, dt = None):
+        """ draws the software effects into the LedCanvas frame at monotonic time now, skipping keys that run a native effect, and reserves
+            those keys in the frame. returns False if there was no software effect to draw. """
+        with self._lock:
+            self._prune(now)
+            software = list(self._software)
+            native   = self._native
+            if None in native:
+                # a native effect on the whole lighting runs on every key
+                frame.reserved_keys = frozenset(KEY_TO_BITMAP_CELL)
+                return False
+            frame.reserved_keys = frozenset(native)
+            if not software:
+                return False
+            offsets = [KEY_TO_BITMAP_CELL[key_name] * LOGI_LED_BITMAP_BYTES_PER_KEY for key_name in native if key_name in KEY_TO_BITMAP_CELL]
+            for effect, start in software:
+                red, green, blue = effect.color_at(now - start)
+                if effect.keys is None:
+                    kept = [(offset, frame.buffer[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY]) for offset in offsets]
+                    frame.fill(red, green, blue)
+                    for offset, pixel in kept:
+                        frame.buffer[offset:offset + LOGI_LED_BITMAP_BYTES_PER_KEY] = pixel
+                    continue
+                for key_name in effect.keys:
+                    if key_name not in native:
+                        frame.set_key(key_name, red, green, blue)
+            return True
+
+    def stats(self):
+        """ returns the number of keys running native effects, software effects running and SDK calls made to start and stop effects. """
+        with self._lock:
+            return {
+                'native_keys':      len(self._native),
+                'software_effects': len(self._software),
+                'native_calls':     self.native_calls,
+                'stop_calls':       self.stop_calls,
+            }
+
+
+# Asynchronous Commands
+#
+# commands that fully replace the output of an earlier pending command with the same coalescing key. every other command is a barrier
+# that earlier commands cannot be coalesced across, since it changes the target device, saves or restores state or reads from the SDK.
+_COALESCE_WHOLE = {
+    'logi_led_set_lighting':             'lighting',
+    'logi_led_flash_lighting':           'flash_lighting',
+    'logi_led_pulse_lighting':           'pulse_lighting',
+    'logi_led_set_lighting_from_bitmap': 'bitmap',
+    'logi_led_set_lighting_from_array':  'bitmap',
+}
+_COALESCE_PER_KEY = frozenset((
+    'logi_led_set_lighting_for_key_with_scan_code',
+    'logi_led_set_lighting_for_key_with_hid_code',
+    'logi_led_set_lighting_for_key_with_quartz_code',
+    'logi_led_set_lighting_for_key_with_key_name',
+    'logi_led_flash_single_key',
+    'logi_led_pulse_single_key',
+))
+
+def _coalescing_key(name, args):
+    if name in _COALESCE_WHOLE:
+        return _COALESCE_WHOLE[name]
+    if name in _COALESCE_PER_KEY and args:
+        return name, args[0]
+    return None
+
+def _snapshot_arguments(name, args):
+    """ copies mutable bitmap arguments so later writes by the caller do not race with the worker thread. """
+    numpy = _loaded_numpy()
+    if name == 'logi_led_set_lighting_from_bitmap' and args and not isinstance(args[0], bytes):
+        return (ctypes.string_at(_bitmap_pointer(args[0]), LOGI_LED_BITMAP_SIZE),) + tuple(args[1:])
+    if name == 'logi_led_set_lighting_from_array' and args and not isinstance(args[0], bytes):
+        pixels = args[0].copy() if numpy is not None and isinstance(args[0], numpy.ndarray) else memoryview(args[0]).tobytes()
+        return (pixels,) + tuple(args[1:])
+    return args
+
+class _Command(object):
+    __slots__ = ('function', 'args', 'kwargs', 'futures', 'key', 'cancelled')
+
+    def __init__(self, function, args, kwargs, future, key):
+        self.function  = function
+        self.args      = args
+        self.kwargs    = kwargs
+        self.futures   = [future]
+        self.key       = key
+        self.cancelled = False
+
+class LedCommandQueue(object):
+    """ an opt-in asynchronous mode where SDK calls return immediately and run in order on a single worker thread that owns the SDK.
+
+        submit() queues any logi_led_* function and returns a concurrent.futures.Future for its bool result, submit_async() returns an
+        asyncio future for the same, and logi_led_* attributes of the queue are shortcuts for submit(). while a command is still pending,
+        a newer command that fully replaces its output (another logi_led_set_lighting, bitmap push, or per-key set of the same key) takes
+        its place at the end of the queue and the superseded command's future receives the newer command's result. commands that change
+        the target device or save, restore or read state are barriers that are never coalesced across.
+
+        the SDK is initialized per thread, so with init_sdk the worker calls logi_led_init when it starts and logi_led_shutdown when it stops. """
+
+    def __init__(self, init_sdk = True):
+        # imported here rather than at module level because concurrent.futures pulls in logging, which most importers never need
+        try:
+            from concurrent.futures import Future
+        except ImportError:
+            raise ImportError('LedCommandQueue requires concurrent.futures')
+        self._future    = Future
+        self.init_sdk   = init_sdk
+        self.submitted  = 0
+        self.executed   = 0
+        self.coalesced  = 0
+        self._pending   = collections.deque()
+        self._latest    = {}
+        self._condition = threading.Condition()
+        self._stopping  = False
+        self._thread    = None
+
+    def __getattr__(self, name):
+        if name.startswith('logi_led_'):
+            function = globals().get(name)
+            if function is not None:
+                return functools.partial(self.submit, function)
+        raise AttributeError(name)
+
+    @property
+    def depth(self):
+        """ the number of commands waiting for the worker. """
+        return len(self._pending)
+
+    def start(self):
+        """ starts the worker thread. """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread   = threading.Thread(target = self._run, name = 'logipy-led-commands')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = None):
+        """ runs the commands that are still pending, then stops the worker thread. """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, function, *args, **kwargs):
+        """ queues function(*args, **kwargs) for the worker thread and returns a concurrent.futures.Future for its result. """
+        name    = getattr(function, '__name__', None)
+        args    = _snapshot_arguments(name, args)
+        key     = _coalescing_key(name, args) if not kwargs else None
+        future  = self._future()
+        command = _Command(function, args, kwargs, future, key)
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError('the command queue is stopped')
+            self.submitted += 1
+            if key is None:
+                self._latest.clear()
+            else:
+                superseded = self._latest.get(key)
+                if superseded is not None:
+                    superseded.cancelled = True
+                    command.futures.extend(superseded.futures)
+                    self.coalesced += 1
+                self._latest[key] = command
+            self._pending.append(command)
+            self._condition.notify()
+        return future
+
+    def submit_async(self, function, *args, **kwargs):
+        """ like submit() but returns an asyncio future for the running event loop that can be awaited. """
+        import asyncio
+        return asyncio.wrap_future(self.submit(function, *args, **kwargs))
+
+    def _next(self):
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+            if not self._pending:
+                return None
+            command = self._pending.popleft()
+            if command.key is not None and self._latest.get(command.key) is command:
+                del self._latest[command.key]
+            return command
+
+    def _run(self):
+        if self.init_sdk:
+            logi_led_init()
+        try:
+            while True:
+                command = self._next()
+                if command is None:
+                    break
+                if command.cancelled:
+                    continue
+                try:
+                    result = command.function(*command.args, **command.kwargs)
+                except Exception as exception:
+                    for future in command.futures:
+                        future.set_exception(exception)
+                else:
+                    for future in command.futures:
+                        future.set_result(result)
+                self.executed += 1
+        finally:
+            if self.init_sdk:
+                logi_led_shutdown()
@@ -0,0 +1,302 @@
+"""
+logi_led_layers.py : Layered compositing of per-key effects into one LED bitmap per frame
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+from logipy import logi_led
+
+BLEND_NORMAL   = 'normal'
+BLEND_ADD      = 'add'
+BLEND_MULTIPLY = 'multiply'
+BLEND_MAX      = 'max'
+
+BLEND_MODES = (BLEND_NORMAL, BLEND_ADD, BLEND_MULTIPLY, BLEND_MAX)
+
+_CELLS    = logi_led.LOGI_LED_BITMAP_WIDTH * logi_led.LOGI_LED_BITMAP_HEIGHT
+_CHANNELS = 3
+
+def mask_from_keys(key_names, value = 255):
+    """ returns a layer mask covering the given keys of the bitmap with value (0-255) and leaving every other key out. """
+    mask = bytearray(_CELLS)
+    for key_name in key_names:
+        cell = logi_led.KEY_TO_BITMAP_CELL.get(key_name)
+        if cell is not None:
+            mask[cell] = value
+    return bytes(mask)
+
+def _check_mask(mask):
+    if mask is not None:
+        mask = bytes(bytearray(mask))
+        if len(mask) != _CELLS:
+            raise ValueError('a mask needs one byte per key of the bitmap, {} bytes, got {}'.format(_CELLS, len(mask)))
+    return mask
+
+
+# Layers
+#
+class LedLayer(object):
+    """ one effect of a LedCompositor: a LedCanvas drawn like any other, composited with its z order, opacity, mask and blend mode.
+
+        the alpha of each key of the canvas is the coverage of that key, alpha scales the whole layer (0.0-1.0) and mask, one 0-255 byte per
+        key of the bitmap, limits the layer to part of the keyboard. blend is one of BLEND_NORMAL, BLEND_ADD, BLEND_MULTIPLY or BLEND_MAX. """
+
+    def __init__(self, name, z = 0, alpha = 1.0, blend = BLEND_NORMAL, mask = None, visible = True):
+        if blend not in BLEND_MODES:
+            raise ValueError('unknown blend mode {!r}'.format(blend))
+        self.name     = name
+        self.canvas   = logi_led.LedCanvas()
+        self._z       = z
+        self._alpha   = float(alpha)
+        self._blend   = blend
+        self._mask    = _check_mask(mask)
+        self._visible = visible
+        self._owner   = None
+        # pixels of the canvas as they were last composited, None until then or after a property changed
+        self._composited = None
+
+    def _changed(self, order = False):
+        self._composited = None
+        if order and self._owner is not None:
+            self._owner._order = None
+
+    @property
+    def z(self):
+        return self._z
+
+    @z.setter
+    def z(self, z):
+        self._z = z
+        self._changed(order = True)
+
+    @property
+    def alpha(self):
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, alpha):
+        if float(alpha) != self._alpha:
+            self._alpha = float(alpha)
+            self._changed()
+
+    @property
+    def blend(self):
+        return self._blend
+
+    @blend.setter
+    def blend(self, blend):
+        if blend not in BLEND_MODES:
+            raise ValueError('unknown blend mode {!r}'.format(blend))
+        self._blend = blend
+        self._changed()
+
+    @property
+    def mask(self):
+        return self._mask
+
+    @mask.setter
+    def mask(self, mask):
+        self._mask = _check_mask(mask)
+        self._changed()
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        if bool(visible) != self._visible:
+            self._visible = bool(visible)
+            self._changed()
+
+    def __repr__(self):
+        return 'LedLayer({!r}, z = {!r}, alpha = {!r}, blend = {!r})'.format(self.name, self._z, self._alpha, self._blend)
+
+
+# Blending
+#
+# every mode computes a blended color from the color below (d) and the layer color (s), then moves the color below towards it by the
+# coverage of the key: out = d + (blended - d) * coverage. colors stay floats between layers and are rounded once per frame.
+def _blend_python(below, pixels, layer):
+    """ blends layer, whose canvas holds pixels, over the list of BGR floats below and returns the result as a new list. """
+    scale  = layer.alpha / 255.0
+    alphas = bytearray(pixels[3::4])
+    if layer.mask is not None:
+        coverage = [min(alpha * scale * mask / 255.0, 1.0) for alpha, mask in zip(alphas, bytearray(layer.mask))]
+    else:
+        coverage = [min(alpha * scale, 1.0) for alpha in alphas]
+    coverage = [value for value in coverage for _ in range(_CHANNELS)]
+    top      = bytearray(pixels)
+    del top[3::4]
+    mode     = layer.blend
+    if mode == BLEND_NORMAL:
+        return [d + (s - d) * c for d, s, c in zip(below, top, coverage)]
+    elif mode == BLEND_ADD:
+        return [d + (min(d + s, 255.0) - d) * c for d, s, c in zip(below, top, coverage)]
+    elif mode == BLEND_MULTIPLY:
+        return [d + (d * s / 255.0 - d) * c for d, s, c in zip(below, top, coverage)]
+    return [d + (max(d, s) - d) * c for d, s, c in zip(below, top, coverage)]
+
+def _blend_numpy(numpy, below, pixels, layer):
+    """ numpy version of _blend_python working on a (cells, 3) float64 array. """
+    pixels   = numpy.frombuffer(pixels, numpy.uint8).reshape(_CELLS, 4)
+    top      = pixels[:, :_CHANNELS].astype(numpy.float64)
+    coverage = pixels[:, 3] * (layer.alpha / 255.0)
+    if layer.mask is not None:
+        coverage = coverage * numpy.frombuffer(layer.mask, numpy.uint8) / 255.0
+    coverage = numpy.minimum(coverage, 1.0)[:, None]
+    mode     = layer.blend
+    if mode == BLEND_NORMAL:
+        blended = top
+    elif mode == BLEND_ADD:
+        blended = numpy.minimum(below + top, 255.0)
+    elif mode == BLEND_MULTIPLY:
+        blended = below * top / 255.0
+    else:
+        blended = numpy.maximum(below, top)
+    return below + (blended - below) * coverage
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+# Compositing
+#
+class LedCompositor(object):
+    """ flattens z-ordered LedLayer objects into one BGRA bitmap per frame for logi_led_set_lighting_from_bitmap.
+
+        the result of blending every layer up to each z position is kept, so a frame only blends again from the lowest layer whose canvas or
+        properties changed: a steady base theme costs nothing while a reactive layer on top of it is animated. layers are blended with
+        numpy when it is installed and use_numpy is not False, and with list comprehensions over the channels otherwise.
+
+        for example:
+         compositor = LedCompositor()
+         base       = compositor.add_layer('base')
+         alert      = compositor.add_layer('alert', z = 10, blend = BLEND_ADD, mask = mask_from_keys([logi_led.F1, logi_led.F2]))
+         base.canvas.fill(0, 0, 128)
+         alert.canvas.fill(255, 0, 0)
+         compositor.commit() """
+
+    def __init__(self, use_numpy = None):
+        self._numpy  = _import_numpy() if use_numpy is not False else None
+        if use_numpy and self._numpy is None:
+            raise ImportError('numpy is not installed')
+        self.output  = logi_led.LedCanvas()
+        self._layers = []
+        self._order  = None
+        self._below  = []
+        self._frame  = None
+        self.frames  = 0
+        self.blends  = 0
+        self.reused  = 0
+
+    def add_layer(self, name, z = None, alpha = 1.0, blend = BLEND_NORMAL, mask = None, visible = True):
+        """ adds a layer and returns it. z defaults to above every existing layer, layers with the same z are composited in the order added. """
+        if self.layer(name) is not None:
+            raise ValueError('a layer named {!r} already exists'.format(name))
+        if z is None:
+            z = max([layer.z for layer in self._layers] or [-1]) + 1
+        layer        = LedLayer(name, z, alpha, blend, mask, visible)
+        layer._owner = self
+        self._layers.append(layer)
+        self._order  = None
+        return layer
+
+    def remove_layer(self, layer):
+        """ removes a layer, given by name or object. returns False if it is not part of the compositor. """
+        layer = self.layer(layer) if not isinstance(layer, LedLayer) else layer
+        if layer is None or layer not in self._layers:
+            return False
+        self._layers.remove(layer)
+        layer._owner = None
+        self._order  = None
+        return True
+
+    def layer(self, name):
+        """ returns the layer named name, or None. """
+        for layer in self._layers:
+            if layer.name == name:
+                return layer
+        return None
+
+    @property
+    def layers(self):
+        """ the layers from bottom to top. """
+        if self._order is None:
+            self._order = sorted(self._layers, key = lambda layer: layer.z)
+            # the cached results no longer match the layers below each position
+            self._below = []
+            for layer in self._layers:
+                layer._composited = None
+        return list(self._order)
+
+    def _black(self):
+        if self._numpy is not None:
+            return self._numpy.zeros((_CELLS, _CHANNELS), self._numpy.float64)
+        return [0.0] * (_CELLS * _CHANNELS)
+
+    def compose(self):
+        """ returns the frame as a BGRA byte string, blending only from the lowest changed layer up. """
+        layers = self.layers
+        # find the lowest layer that changed since it was last composited, every layer above it has to be blended again
+        start  = len(layers)
+        pixels = []
+        for index, layer in enumerate(layers):
+            current = layer.canvas.tobytes()
+            pixels.append(current)
+            if start == len(layers) and current != layer._composited:
+                start = index
+        start = min(start, len(self._below))
+        self.frames += 1
+        self.reused += start
+        if start == len(layers) and self._frame is not None:
+            return self._frame
+        below = self._below[start - 1] if start else self._black()
+        del self._below[start:]
+        for index in range(start, len(layers)):
+            layer = layers[index]
+            if layer.visible:
+                if self._numpy is not None:
+                    below = _blend_numpy(self._numpy, below, pixels[index], layer)
+                else:
+                    below = _blend_python(below, pixels[index], layer)
+                self.blends += 1
+            self._below.append(below)
+            layer._composited = pixels[index]
+        self._frame = self._pack(below)
+        return self._frame
+
+    def _pack(self, colors):
+        """ rounds BGR floats to a BGRA byte string with every key opaque. """
+        if self._numpy is not None:
+            numpy = self._numpy
+            frame = numpy.full((_CELLS, 4), 255, numpy.uint8)
+            frame[:, :_CHANNELS] = numpy.floor(colors + 0.5)
+            return frame.tobytes()
+        frame = bytearray(b'\xff' * logi_led.LOGI_LED_BITMAP_SIZE)
+        for channel in range(_CHANNELS):
+            frame[channel::4] = bytearray(int(value + 0.5) for value in colors[channel::_CHANNELS])
+        return bytes(frame)
+
+    def invalidate(self):
+        """ forgets every cached result and the last sent frame, so the next commit() blends every layer and pushes the full bitmap. """
+        self._order = None
+        self._frame = None
+        self.output.invalidate()
+
+    def commit(self):
+        """ composes the frame and sends it to the SDK if it changed. returns True if nothing had to be sent or every SDK call succeeded. """
+        self.output.write(self.compose())
+        return self.output.commit()
+
+    def stats(self):
+        """ returns the number of frames composed, layer blends done and layer blends saved by the cached results. """
+        return {'frames': self.frames, 'blends': self.blends, 'reused': self.reused}
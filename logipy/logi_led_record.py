@@ -0,0 +1,540 @@
+"""
+logi_led_record.py : Compact recording and replay of the lighting sent through logi_led
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import bisect
+import collections
+import functools
+import mmap
+import struct
+import threading
+import time
+import zlib
+
+from logipy import logi_led
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# File Format
+#
+# a recording is a header, a sequence of blocks and an index. all integers are little-endian.
+#
+#   header  'LOGILED1', u16 version, u8 bitmap width, u8 bitmap height, u8 bytes per key, f64 wall clock time the recording started
+#   block   u8 compression (0 none, 1 zlib), u32 stored size, u32 raw size, u32 records, f64 seconds of the first record, stored bytes
+#   index   per block: f64 seconds of the first record, u64 file offset of the block, u32 records
+#   trailer u64 file offset of the index, u32 blocks, 'LOGIIDX1'
+#
+# a record is u8 op and u32 microseconds since the first record of its block, followed by the arguments of the op. bitmaps are stored
+# as a key frame of the whole bitmap or as a delta of the cells that changed since the previous bitmap, whichever is smaller. each block
+# starts with state records holding the target device, global color and bitmap in effect before it, so replay can start at any block.
+# recordings that were not closed have no index and are read by walking the blocks.
+MAGIC         = b'LOGILED1'
+INDEX_MAGIC   = b'LOGIIDX1'
+VERSION       = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+OP_TARGET     = 1
+OP_GLOBAL     = 2
+OP_KEY_NAME   = 3
+OP_SCAN_CODE  = 4
+OP_HID_CODE   = 5
+OP_QUARTZ     = 6
+OP_KEYFRAME   = 7
+OP_DELTA      = 8
+# state records only restore the replay state when playback starts inside a block and never call the SDK
+OP_STATE      = 0x80
+
+_HEADER       = struct.Struct('<8sHBBBd')
+_BLOCK        = struct.Struct('<BIIId')
+_INDEX_ENTRY  = struct.Struct('<dQI')
+_TRAILER      = struct.Struct('<QI8s')
+_RECORD       = struct.Struct('<BI')
+_TARGET       = struct.Struct('<I')
+_COLOR        = struct.Struct('<BBB')
+_KEY          = struct.Struct('<IBBB')
+_CELL         = struct.Struct('<B4s')
+
+_KEY_SIZE     = logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY
+
+# wrapper name -> op of the calls that are recorded
+_HOOKS = collections.OrderedDict((
+    ('logi_led_set_target_device',                     OP_TARGET),
+    ('logi_led_set_lighting',                          OP_GLOBAL),
+    ('logi_led_set_lighting_for_key_with_key_name',    OP_KEY_NAME),
+    ('logi_led_set_lighting_for_key_with_scan_code',   OP_SCAN_CODE),
+    ('logi_led_set_lighting_for_key_with_hid_code',    OP_HID_CODE),
+    ('logi_led_set_lighting_for_key_with_quartz_code', OP_QUARTZ),
+    ('logi_led_set_lighting_from_bitmap',              OP_KEYFRAME),
+))
+
+# op -> name of the wrapper replaying it
+_REPLAY = dict((op, name) for name, op in _HOOKS.items())
+_REPLAY[OP_DELTA] = 'logi_led_set_lighting_from_bitmap'
+
+# ops of the per-key setters
+_KEY_OPS = frozenset((OP_KEY_NAME, OP_SCAN_CODE, OP_HID_CODE, OP_QUARTZ))
+
+def _frame_bytes(bitmap):
+    """ returns a copy of the LOGI_LED_BITMAP_SIZE bytes of a bitmap passed to logi_led_set_lighting_from_bitmap. """
+    if isinstance(bitmap, bytes):
+        return bitmap[:logi_led.LOGI_LED_BITMAP_SIZE]
+    return memoryview(bitmap).tobytes()[:logi_led.LOGI_LED_BITMAP_SIZE]
+
+def _percent(value):
+    return max(0, min(100, int(value)))
+
+class _LightingState(object):
+    """ the calls still in effect after a sequence of calls, oldest first, keyed by the target device they were made under and what
+        they set. the whole lighting of a target replaces its bitmap and keys, and a bitmap replaces the keys set before it. """
+
+    def __init__(self):
+        self.target = None
+        self.calls  = collections.OrderedDict()
+
+    def apply(self, kind, arguments):
+        if kind == OP_TARGET:
+            self.target = arguments[0]
+            return
+        target = self.target
+        if kind == OP_GLOBAL:
+            stale = [slot for slot in self.calls if slot[0] == target]
+            slot  = (target, OP_GLOBAL)
+        elif kind in (OP_KEYFRAME, OP_DELTA):
+            stale = [slot for slot in self.calls if slot[0] == target and slot[1] in _KEY_OPS]
+            slot  = (target, OP_KEYFRAME)
+        else:
+            stale = ()
+            slot  = (target, kind, arguments[0])
+        for stale_slot in stale:
+            del self.calls[stale_slot]
+        self.calls.pop(slot, None)
+        self.calls[slot] = (OP_KEYFRAME if kind == OP_DELTA else kind, arguments)
+
+    def replay(self):
+        """ yields (op, arguments) restoring the state, each call under the target device it was made under, then the current target. """
+        current = None
+        for slot, call in self.calls.items():
+            if slot[0] is not None and slot[0] != current:
+                current = slot[0]
+                yield OP_TARGET, (current,)
+            yield call
+        if self.target is not None and self.target != current:
+            yield OP_TARGET, (self.target,)
+
+
+# Encoding
+#
+def _delta(previous, frame):
+    """ returns the (cell, BGRA bytes) pairs of the cells of frame that differ from previous. """
+    changed = []
+    for offset in range(0, logi_led.LOGI_LED_BITMAP_SIZE, _KEY_SIZE):
+        end = offset + _KEY_SIZE
+        if frame[offset:end] != previous[offset:end]:
+            changed.append((offset // _KEY_SIZE, frame[offset:end]))
+    return changed
+
+class _BlockEncoder(object):
+    """ encodes records into blocks, tracking the state replay needs to start at a block. """
+
+    def __init__(self):
+        self.frame   = None
+        self.state   = _LightingState()
+        self.data    = bytearray()
+        self.records = 0
+        self.base    = None
+
+    def _append(self, op, seconds, arguments):
+        self.data    += _RECORD.pack(op, max(0, int((seconds - self.base) * 1e6)))
+        self.data    += _pack(op & ~OP_STATE, arguments)
+        self.records += 1
+
+    def add(self, seconds, op, arguments):
+        if self.base is None:
+            # replay decodes a block on its own, so a delta can only refer to a frame stored in the same block
+            self.base  = seconds
+            self.frame = None
+            for state_op, state_arguments in self.state.replay():
+                if state_op == OP_KEYFRAME:
+                    self.frame = state_arguments[0]
+                self._append(OP_STATE | state_op, seconds, state_arguments)
+        self.state.apply(op, arguments)
+        if op == OP_KEYFRAME:
+            frame = arguments[0]
+            if self.frame is not None:
+                changed = _delta(self.frame, frame)
+                if 1 + len(changed) * _CELL.size < len(frame):
+                    op, arguments = OP_DELTA, changed
+            self.frame = frame
+        self._append(op, seconds, arguments)
+
+    def take(self):
+        """ returns (records, seconds of the first record, raw bytes) of the current block and starts the next one. """
+        block = (self.records, self.base, bytes(self.data))
+        self.data    = bytearray()
+        self.records = 0
+        self.base    = None
+        return block
+
+def _pack(op, arguments):
+    if op == OP_KEYFRAME:
+        return arguments[0]
+    if op == OP_DELTA:
+        return bytes(bytearray([len(arguments)])) + b''.join(_CELL.pack(cell, pixel) for cell, pixel in arguments)
+    if op == OP_TARGET:
+        return _TARGET.pack(*arguments)
+    if op == OP_GLOBAL:
+        return _COLOR.pack(*arguments)
+    return _KEY.pack(*arguments)
+
+
+# Recording
+#
+def _unwrap_finished(function):
+    """ returns function without the wrappers around it whose session already ended. wrappers that replace the logi_led functions, the
+        recorder's and logi_stats', carry the threading.Event of their session as _logipy_session and the function they wrap as __wrapped__. """
+    session = getattr(function, '_logipy_session', None)
+    while session is not None and not session.is_set():
+        function = function.__wrapped__
+        session  = getattr(function, '_logipy_session', None)
+    return function
+
+class LedRecorder(object):
+    """ records the lighting sent through logi_led_set_lighting_from_bitmap, logi_led_set_lighting, the per-key setters and
+        logi_led_set_target_device to a compact binary file at path.
+
+        start() replaces those wrappers in the logi_led module, like logi_stats.enable(), so everything calling them through the module,
+        including LedCanvas and EffectScheduler, is recorded. a recorded call only copies its arguments onto a queue; encoding, compression
+        and file writes happen on a background thread that closes a block every block_seconds or block_size raw bytes. stop() puts the
+        wrappers back and writes the index. it can be combined with logi_stats in any order. """
+
+    def __init__(self, path, compress = True, block_seconds = 1.0, block_size = 256 * 1024):
+        self.path          = path
+        self.compress      = compress
+        self.block_seconds = block_seconds
+        self.block_size    = block_size
+        self.records       = 0
+        self.blocks        = 0
+        self.bytes_written = 0
+        self._queue        = collections.deque()
+        self._originals    = {}
+        self._session      = None
+        self._index        = []
+        self._encoder      = None
+        self._file         = None
+        self._started      = None
+        self._stop_event   = threading.Event()
+        self._thread       = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _hook(self, name, op, function):
+        queue   = self._queue
+        started = self._started
+        session = self._session
+
+        if op == OP_KEYFRAME:
+            def payload(bitmap):
+                frame = _frame_bytes(bitmap)
+                # too short a bitmap makes the wrapper raise, and is not recorded
+                return (frame,) if len(frame) == logi_led.LOGI_LED_BITMAP_SIZE else None
+        elif op == OP_TARGET:
+            def payload(target_device):
+                return (int(target_device),)
+        elif op == OP_GLOBAL:
+            def payload(red_percentage, green_percentage, blue_percentage):
+                return _percent(red_percentage), _percent(green_percentage), _percent(blue_percentage)
+        else:
+            def payload(key_code, red_percentage, green_percentage, blue_percentage):
+                return int(key_code), _percent(red_percentage), _percent(green_percentage), _percent(blue_percentage)
+
+        @functools.wraps(function)
+        def recorded(*args, **kwargs):
+            if session.is_set():
+                value = payload(*args, **kwargs)
+                if value is not None:
+                    queue.append((_clock() - started, op, value))
+            return function(*args, **kwargs)
+        recorded.__wrapped__       = function
+        recorded._logipy_session = session
+        return recorded
+
+    def start(self):
+        """ opens the file, hooks the logi_led wrappers and starts the writer thread. """
+        if self.running:
+            return
+        self._file    = open(self.path, 'wb')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, logi_led.LOGI_LED_BITMAP_WIDTH, logi_led.LOGI_LED_BITMAP_HEIGHT, _KEY_SIZE, time.time()))
+        self._encoder = _BlockEncoder()
+        self._index   = []
+        self._started = _clock()
+        self._session = threading.Event()
+        self._session.set()
+        self._stop_event.clear()
+        for name, op in _HOOKS.items():
+            function = getattr(logi_led, name)
+            hook     = self._hook(name, op, function)
+            self._originals[name] = (function, hook)
+            setattr(logi_led, name, hook)
+        self._thread = threading.Thread(target = self._run, name = 'logipy-led-recorder')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = None):
+        """ puts the original wrappers back, writes what is still queued and the index, and closes the file. a wrapper that was replaced
+            again since start(), for example by logi_stats.enable(), is left in place and passes calls through unrecorded until that replacement
+            is taken out as well. """
+        if self._session is not None:
+            self._session.clear()
+        for name, (function, hook) in self._originals.items():
+            if getattr(logi_led, name) is hook:
+                setattr(logi_led, name, _unwrap_finished(function))
+        self._originals.clear()
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _write_block(self):
+        records, base, raw = self._encoder.take()
+        if not records:
+            return
+        compression = COMPRESSION_NONE
+        stored      = raw
+        if self.compress:
+            compressed = zlib.compress(raw, 6)
+            if len(compressed) < len(raw):
+                compression, stored = COMPRESSION_ZLIB, compressed
+        self._index.append((base, self._file.tell(), records))
+        self._file.write(_BLOCK.pack(compression, len(stored), len(raw), records, base))
+        self._file.write(stored)
+        self._file.flush()
+        self.blocks        += 1
+        self.bytes_written += _BLOCK.size + len(stored)
+
+    def _drain(self):
+        encoder = self._encoder
+        queue   = self._queue
+        while queue:
+            seconds, op, payload = queue.popleft()
+            if encoder.base is not None and seconds - encoder.base >= self.block_seconds:
+                self._write_block()
+            encoder.add(seconds, op, payload)
+            self.records += 1
+            if len(encoder.data) >= self.block_size:
+                self._write_block()
+
+    def _run(self):
+        try:
+            while not self._stop_event.wait(min(self.block_seconds, 0.25)):
+                self._drain()
+                if self._encoder.base is not None and _clock() - self._started - self._encoder.base >= self.block_seconds:
+                    self._write_block()
+            self._drain()
+            self._write_block()
+            offset = self._file.tell()
+            for entry in self._index:
+                self._file.write(_INDEX_ENTRY.pack(*entry))
+            self._file.write(_TRAILER.pack(offset, len(self._index), INDEX_MAGIC))
+        finally:
+            self._file.close()
+
+    def stats(self):
+        """ returns the records and blocks written, the bytes written and the records still queued. """
+        return {
+            'records':       self.records,
+            'blocks':        self.blocks,
+            'bytes_written': self.bytes_written,
+            'queued':        len(self._queue),
+        }
+
+
+# Replay
+#
+class LedReplayer(object):
+    """ reads a recording made by LedRecorder through a memory map and streams it back through the logi_led wrappers.
+
+        play() starts at any time of the recording: it finds the block through the index, rebuilds the target device, global color and
+        bitmap in effect at that time, sends them, then replays the calls that follow at speed times real time, or as fast as the backend
+        accepts them when speed is None, which makes a recording a load test for a backend. """
+
+    def __init__(self, path):
+        self.path  = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        magic, version, width, height, key_size, self.created = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('{} is not a logipy LED recording'.format(path))
+        if (width, height, key_size) != (logi_led.LOGI_LED_BITMAP_WIDTH, logi_led.LOGI_LED_BITMAP_HEIGHT, _KEY_SIZE):
+            self.close()
+            raise ValueError('{} was recorded with a {}x{} bitmap'.format(path, width, height))
+        self._index = self._read_index()
+        self._times = [base for base, _, _ in self._index]
+
+    def _read_index(self):
+        """ returns the (seconds, offset, records) of every block, from the index or, for recordings that were not closed, by walking the blocks. """
+        size = len(self._map)
+        if size >= _HEADER.size + _TRAILER.size:
+            offset, blocks, magic = _TRAILER.unpack_from(self._map, size - _TRAILER.size)
+            if magic == INDEX_MAGIC:
+                return [_INDEX_ENTRY.unpack_from(self._map, offset + entry * _INDEX_ENTRY.size) for entry in range(blocks)]
+        index  = []
+        offset = _HEADER.size
+        while offset + _BLOCK.size <= size:
+            compression, stored, raw, records, base = _BLOCK.unpack_from(self._map, offset)
+            if offset + _BLOCK.size + stored > size:
+                break
+            index.append((base, offset, records))
+            offset += _BLOCK.size + stored
+        return index
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def blocks(self):
+        return len(self._index)
+
+    @property
+    def records(self):
+        """ the number of records, state records included. """
+        return sum(records for _, _, records in self._index)
+
+    @property
+    def duration(self):
+        """ the seconds from the first to the last record. """
+        if not self._index:
+            return 0.0
+        last = None
+        for last in self._block_records(len(self._index) - 1):
+            pass
+        return last[0] - self._index[0][0]
+
+    def _block_records(self, block):
+        """ yields (seconds, op, arguments) for every record of a block. """
+        base, offset, _ = self._index[block]
+        compression, stored, raw, records, base = _BLOCK.unpack_from(self._map, offset)
+        start = offset + _BLOCK.size
+        data  = self._map[start:start + stored]
+        if compression == COMPRESSION_ZLIB:
+            data = zlib.decompress(data)
+        position = 0
+        for _ in range(records):
+            op, microseconds = _RECORD.unpack_from(data, position)
+            position += _RECORD.size
+            seconds   = base + microseconds / 1e6
+            kind      = op & ~OP_STATE
+            if kind == OP_TARGET:
+                arguments = _TARGET.unpack_from(data, position)
+                position += _TARGET.size
+            elif kind == OP_GLOBAL:
+                arguments = _COLOR.unpack_from(data, position)
+                position += _COLOR.size
+            elif kind == OP_KEYFRAME:
+                arguments = (data[position:position + logi_led.LOGI_LED_BITMAP_SIZE],)
+                position += logi_led.LOGI_LED_BITMAP_SIZE
+            elif kind == OP_DELTA:
+                count     = bytearray(data[position:position + 1])[0]
+                arguments = tuple(_CELL.unpack_from(data, position + 1 + cell * _CELL.size) for cell in range(count))
+                position += 1 + count * _CELL.size
+            else:
+                arguments = _KEY.unpack_from(data, position)
+                position += _KEY.size
+            yield seconds, op, arguments
+
+    def records_from(self, start = 0.0):
+        """ yields (seconds since the start of the recording, wrapper name, arguments) for every SDK call from start on. the first calls
+            restore the target device, global color and bitmap in effect at start, timed with the first call after start. """
+        if not self._index:
+            return
+        origin = self._index[0][0]
+        start  = origin + start
+        block  = max(0, bisect.bisect_right(self._times, start) - 1)
+        frame  = None
+        state  = _LightingState()
+        primed = False
+        for current in range(block, len(self._index)):
+            for seconds, op, arguments in self._block_records(current):
+                kind = op & ~OP_STATE
+                if kind == OP_DELTA:
+                    pixels = bytearray(frame)
+                    for cell, pixel in arguments:
+                        pixels[cell * _KEY_SIZE:(cell + 1) * _KEY_SIZE] = pixel
+                    frame, kind, arguments = bytes(pixels), OP_KEYFRAME, (bytes(pixels),)
+                elif kind == OP_KEYFRAME:
+                    frame = arguments[0]
+                if not primed:
+                    if op & OP_STATE or seconds < start:
+                        # fast forward, keeping what the skipped calls left in effect instead of calling the SDK
+                        state.apply(kind, arguments)
+                        continue
+                    # the restoring calls are due together with the first call they lead up to
+                    primed = True
+                    for state_op, state_arguments in state.replay():
+                        yield seconds - origin, _REPLAY[state_op], state_arguments
+                if op & OP_STATE:
+                    continue
+                yield seconds - origin, _REPLAY[kind], arguments
+
+    def play(self, speed = 1.0, start = 0.0, end = None, stop_event = None):
+        """ sends the recorded calls from start to end seconds through the logi_led wrappers at speed times real time, or as fast as
+            possible if speed is None. stop_event, a threading.Event, ends playback early. returns the calls made, the bitmaps among
+            them, the failed calls, the seconds taken and the calls per second. """
+        calls   = frames = failures = 0
+        began   = _clock()
+        first   = None
+        for seconds, name, arguments in self.records_from(start):
+            if end is not None and seconds > end:
+                break
+            if stop_event is not None and stop_event.is_set():
+                break
+            if speed:
+                first = seconds if first is None else first
+                delay = began + (seconds - first) / speed - _clock()
+                if delay > 0:
+                    if stop_event is not None:
+                        if stop_event.wait(delay):
+                            break
+                    else:
+                        time.sleep(delay)
+            if not getattr(logi_led, name)(*arguments):
+                failures += 1
+            calls += 1
+            if name == 'logi_led_set_lighting_from_bitmap':
+                frames += 1
+        elapsed = _clock() - began
+        return {
+            'calls':            calls,
+            'frames':           frames,
+            'failures':         failures,
+            'seconds':          elapsed,
+            'calls_per_second': calls / elapsed if elapsed > 0 else None,
+        }
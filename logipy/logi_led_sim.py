@@ -0,0 +1,254 @@
+"""
+logi_led_sim.py : Simulated LED SDK backend for headless testing and benchmarking
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import collections
+import ctypes
+
+from logipy import logi_led
+from logipy import logi_sim
+
+def _bitmap_bytes(arg):
+    """ returns the LOGI_LED_BITMAP_SIZE bytes a LogiLedSetLightingFromBitmap argument points at. """
+    if isinstance(arg, (bytes, bytearray, memoryview)):
+        return bytes(arg[:logi_led.LOGI_LED_BITMAP_SIZE])
+    return ctypes.string_at(ctypes.cast(arg, ctypes.c_void_p), logi_led.LOGI_LED_BITMAP_SIZE)
+
+def _percent_to_byte(percentage):
+    return int(round(max(0, min(100, percentage)) * 255 / 100.0))
+
+
+class SimulatedLedDll(object):
+    """ a pure python stand-in for LogitechLed.dll that can be installed with logi_led.logi_led_set_backend().
+
+        it keeps the per-key lighting in an in-memory BGRA framebuffer (bitmap) laid out like LogiLedSetLightingFromBitmap input, the
+        lighting of RGB and monochrome devices as percentages (lighting) and the running flash/pulse effects (effects). every call is
+        counted in call_counts and, if record is set, logged in calls as (timestamp, entry point, arguments). latency injects a busy-wait
+        of that many seconds into every call, or into the calls named in a dict of entry point -> seconds. like the real SDK, calls
+        other than LogiLedInit return False until it was called. config holds the values returned by the config option getters. """
+
+    def __init__(self, latency = 0.0, record = True, log_size = None):
+        self.latency = latency
+        self.record  = record
+        self.calls   = collections.deque(maxlen = log_size)
+        self.config  = {}
+        self.labels  = {}
+        self.reset()
+
+    def reset(self):
+        """ clears the device state, counters and call log. """
+        self.call_counts   = collections.Counter()
+        self.bytes_pushed  = 0
+        self.initialized   = False
+        self.target_device = logi_led.LOGI_DEVICETYPE_ALL
+        self.bitmap        = bytearray(logi_led.LOGI_LED_BITMAP_SIZE)
+        self.lighting      = (0, 0, 0)
+        self.extra_keys    = {}
+        self.effects       = {}
+        self._saved        = None
+        self._saved_keys   = {}
+        self.calls.clear()
+
+    def stats(self):
+        """ returns the call counts per entry point, the total number of calls and the bitmap bytes pushed. """
+        return {
+            'calls':        sum(self.call_counts.values()),
+            'call_counts':  dict(self.call_counts),
+            'bytes_pushed': self.bytes_pushed,
+        }
+
+    # device state helpers
+    def _targets(self, device_type):
+        return bool(self.target_device & device_type)
+
+    def _set_key(self, key_name, red_percentage, green_percentage, blue_percentage):
+        if not self._targets(logi_led.LOGI_DEVICETYPE_PERKEY_RGB) or key_name is None:
+            return 0
+        offset = logi_led.key_bitmap_offset(key_name)
+        color  = (_percent_to_byte(blue_percentage), _percent_to_byte(green_percentage), _percent_to_byte(red_percentage), 255)
+        if offset is None:
+            self.extra_keys[key_name] = color
+        else:
+            self.bitmap[offset:offset + logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY] = bytearray(color)
+        return 1
+
+    def _get_key(self, key_name):
+        offset = logi_led.key_bitmap_offset(key_name)
+        if offset is None:
+            return self.extra_keys.get(key_name, (0, 0, 0, 255))
+        return tuple(self.bitmap[offset:offset + logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY])
+
+    def key_color(self, key_name):
+        """ returns the 0-255 (red, green, blue) the simulated keyboard shows for a key. """
+        blue, green, red, alpha = self._get_key(key_name)
+        return red, green, blue
+
+    # LogitechLed.dll entry points
+    @logi_sim.entry_point()
+    def LogiLedInit(self):
+        self.initialized = True
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedShutdown(self):
+        self.initialized = False
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedSetTargetDevice(self, target_device):
+        if not self.initialized:
+            return 0
+        self.target_device = target_device
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedSaveCurrentLighting(self):
+        if not self.initialized:
+            return 0
+        self._saved = (bytes(self.bitmap), self.lighting, dict(self.extra_keys))
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedRestoreLighting(self):
+        if not self.initialized or self._saved is None:
+            return 0
+        bitmap, self.lighting, self.extra_keys = self._saved
+        self.bitmap = bytearray(bitmap)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedSetLighting(self, red_percentage, green_percentage, blue_percentage):
+        if not self.initialized:
+            return 0
+        if self._targets(logi_led.LOGI_DEVICETYPE_RGB | logi_led.LOGI_DEVICETYPE_MONOCHROME):
+            self.lighting = (red_percentage, green_percentage, blue_percentage)
+        if self._targets(logi_led.LOGI_DEVICETYPE_PERKEY_RGB):
+            color = bytearray((_percent_to_byte(blue_percentage), _percent_to_byte(green_percentage), _percent_to_byte(red_percentage), 255))
+            self.bitmap = color * (logi_led.LOGI_LED_BITMAP_WIDTH * logi_led.LOGI_LED_BITMAP_HEIGHT)
+            self.extra_keys = dict.fromkeys(self.extra_keys, tuple(color))
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedFlashLighting(self, red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval):
+        if not self.initialized:
+            return 0
+        self.effects[None] = ('flash', (red_percentage, green_percentage, blue_percentage), ms_duration, ms_interval)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedPulseLighting(self, red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval):
+        if not self.initialized:
+            return 0
+        self.effects[None] = ('pulse', (red_percentage, green_percentage, blue_percentage), ms_duration, ms_interval)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedStopEffects(self):
+        if not self.initialized:
+            return 0
+        self.effects.clear()
+        return 1
+
+    @logi_sim.entry_point(_bitmap_bytes)
+    def LogiLedSetLightingFromBitmap(self, bitmap):
+        if not self.initialized:
+            return 0
+        self.bytes_pushed += len(bitmap)
+        if self._targets(logi_led.LOGI_DEVICETYPE_PERKEY_RGB):
+            self.bitmap = bytearray(bitmap)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedSetLightingForKeyWithScanCode(self, key_code, red_percentage, green_percentage, blue_percentage):
+        # the key name constants are the scan codes of the keys
+        return self._set_key(key_code, red_percentage, green_percentage, blue_percentage) if self.initialized else 0
+
+    @logi_sim.entry_point()
+    def LogiLedSetLightingForKeyWithHidCode(self, key_code, red_percentage, green_percentage, blue_percentage):
+        return self._set_key(logi_led.HID_CODE_TO_KEY.get(key_code), red_percentage, green_percentage, blue_percentage) if self.initialized else 0
+
+    @logi_sim.entry_point()
+    def LogiLedSetLightingForKeyWithQuartzCode(self, key_code, red_percentage, green_percentage, blue_percentage):
+        return self._set_key(logi_led.QUARTZ_CODE_TO_KEY.get(key_code), red_percentage, green_percentage, blue_percentage) if self.initialized else 0
+
+    @logi_sim.entry_point()
+    def LogiLedSetLightingForKeyWithKeyName(self, key_name, red_percentage, green_percentage, blue_percentage):
+        return self._set_key(key_name, red_percentage, green_percentage, blue_percentage) if self.initialized else 0
+
+    @logi_sim.entry_point()
+    def LogiLedSaveLightingForKey(self, key_name):
+        if not self.initialized:
+            return 0
+        self._saved_keys[key_name] = self._get_key(key_name)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedRestoreLightingForKey(self, key_name):
+        if not self.initialized or key_name not in self._saved_keys:
+            return 0
+        blue, green, red, alpha = self._saved_keys[key_name]
+        offset = logi_led.key_bitmap_offset(key_name)
+        if offset is None:
+            self.extra_keys[key_name] = (blue, green, red, alpha)
+        else:
+            self.bitmap[offset:offset + logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY] = bytearray((blue, green, red, alpha))
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedFlashSingleKey(self, key_name, red_percentage, green_percentage, blue_percentage, ms_duration, ms_interval):
+        if not self.initialized:
+            return 0
+        self.effects[key_name] = ('flash', (red_percentage, green_percentage, blue_percentage), ms_duration, ms_interval)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedPulseSingleKey(self, key_name, red_percentage_start, green_percentage_start, blue_percentage_start,
+                              red_percentage_end, green_percentage_end, blue_percentage_end, ms_duration, is_infinite):
+        if not self.initialized:
+            return 0
+        self.effects[key_name] = ('pulse', (red_percentage_start, green_percentage_start, blue_percentage_start),
+                                  (red_percentage_end, green_percentage_end, blue_percentage_end), ms_duration, bool(is_infinite))
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiLedStopEffectsOnKey(self, key_name):
+        if not self.initialized:
+            return 0
+        self.effects.pop(key_name, None)
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiGetConfigOptionNumber(self, key, default, sdk_type):
+        if key in self.config:
+            default.contents.value = self.config[key]
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiGetConfigOptionBool(self, key, default, sdk_type):
+        if key in self.config:
+            default.contents.value = self.config[key]
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiGetConfigOptionColor(self, key, red, green, blue, sdk_type):
+        if key in self.config:
+            color = self.config[key]
+            red.contents.value, green.contents.value, blue.contents.value = color.red, color.green, color.blue
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiGetConfigOptionKeyInput(self, key, default, sdk_type):
+        if key in self.config:
+            default.value = self.config[key].encode('utf-8')
+        return 1
+
+    @logi_sim.entry_point()
+    def LogiSetConfigOptionLabel(self, key, label, sdk_type):
+        self.labels[key] = label
+        return 1
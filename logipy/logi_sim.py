@@ -0,0 +1,42 @@
+"""
+logi_sim.py : Shared entry point plumbing of the simulated LED and Arx Control SDK backends
+
+Logitech Gaming SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import ctypes
+import functools
+import time
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+def value(arg):
+    """ returns the python value of a ctypes argument, or the argument itself if it already is a python value. """
+    return arg.value if isinstance(arg, ctypes._SimpleCData) else arg
+
+def entry_point(*converters):
+    """ wraps a simulated DLL function with argument unwrapping, latency injection, call counting and the call log. the simulated DLL
+        provides latency (seconds, or a dict of entry point -> seconds), call_counts, record and calls. converters replace value for the
+        leading arguments. """
+    def decorator(function):
+        name = function.__name__
+        @functools.wraps(function)
+        def wrapper(self, *args):
+            started = _clock()
+            latency = self.latency.get(name, 0.0) if isinstance(self.latency, dict) else self.latency
+            if latency:
+                deadline = started + latency
+                while _clock() < deadline:
+                    pass
+            self.call_counts[name] += 1
+            values = tuple(converter(arg) for converter, arg in zip(converters, args)) + tuple(value(arg) for arg in args[len(converters):])
+            result = function(self, *values)
+            if self.record:
+                self.calls.append((started, name, values))
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,377 @@
+"""
+logi_stats.py : Opt-in per-call instrumentation of the logi_led and logi_arx wrappers
+
+Logitech Gaming LED and Arx Control SDKs
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import collections
+import functools
+import os
+import threading
+import time
+
+from logipy import logi_arx
+from logipy import logi_led
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# wrappers that do not call into the SDK, or that the instrumentation itself calls
+_EXCLUDED = frozenset((
+    'logi_led_set_backend',
+    'logi_led_get_backend',
+    'logi_led_get_target_device',
+    'logi_arx_set_backend',
+    'logi_arx_get_backend',
+    'logi_arx_get_last_error',
+))
+
+# Histograms
+#
+# call times are recorded in whole microseconds into log-linear buckets like an HDR histogram: values below 16 us get a bucket each,
+# larger values fall into one of 8 buckets per power of two, so every bucket is within 12.5% of its values. recording is a few integer
+# operations and a list increment, with no allocation.
+_SUB_BUCKETS   = 8
+_MAX_SHIFT     = 32
+_BUCKET_COUNT  = (_MAX_SHIFT + 1) * _SUB_BUCKETS + 2 * _SUB_BUCKETS
+
+def _bucket_index(microseconds):
+    if microseconds < 2 * _SUB_BUCKETS:
+        return microseconds
+    shift = min(microseconds.bit_length() - 4, _MAX_SHIFT)
+    return shift * _SUB_BUCKETS + min(microseconds >> shift, 2 * _SUB_BUCKETS - 1)
+
+def _bucket_bounds(index):
+    """ returns the (lowest, highest) microseconds recorded in a bucket. """
+    if index < 2 * _SUB_BUCKETS:
+        return index, index
+    shift, top = divmod(index - _SUB_BUCKETS, _SUB_BUCKETS)
+    top       += _SUB_BUCKETS
+    return top << shift, ((top + 1) << shift) - 1
+
+# the cumulative bucket boundaries in seconds exported to prometheus, one per power of two microseconds up to about 17 minutes
+_PROMETHEUS_BOUNDS = tuple(2 ** exponent for exponent in range(31))
+
+
+class _CallStats(object):
+    """ the counters and time histogram of one instrumented function. """
+
+    __slots__ = ('calls', 'failures', 'exceptions', 'bytes', 'total', 'minimum', 'maximum', 'buckets', 'error_codes')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.calls       = 0
+        self.failures    = 0
+        self.exceptions  = 0
+        self.bytes       = 0
+        self.total       = 0.0
+        self.minimum     = None
+        self.maximum     = 0.0
+        self.buckets     = [0] * _BUCKET_COUNT
+        self.error_codes = collections.Counter()
+
+    def percentile(self, fraction):
+        """ returns the time in seconds below which the given fraction (0-1) of calls completed, or None if there were no calls. """
+        if not self.calls:
+            return None
+        rank  = fraction * self.calls
+        count = 0
+        for index, bucket in enumerate(self.buckets):
+            count += bucket
+            if bucket and count >= rank:
+                lowest, highest = _bucket_bounds(index)
+                return (lowest + highest) / 2.0 / 1e6
+        return self.maximum
+
+    def snapshot(self):
+        p50 = self.percentile(0.50)
+        p90 = self.percentile(0.90)
+        p99 = self.percentile(0.99)
+        return {
+            'calls':       self.calls,
+            'failures':    self.failures,
+            'exceptions':  self.exceptions,
+            'bytes':       self.bytes,
+            'total_ms':    self.total * 1000.0,
+            'mean_ms':     self.total * 1000.0 / self.calls if self.calls else None,
+            'min_ms':      self.minimum * 1000.0 if self.minimum is not None else None,
+            'max_ms':      self.maximum * 1000.0,
+            'p50_ms':      p50 * 1000.0 if p50 is not None else None,
+            'p90_ms':      p90 * 1000.0 if p90 is not None else None,
+            'p99_ms':      p99 * 1000.0 if p99 is not None else None,
+            'error_codes': dict(self.error_codes),
+        }
+
+
+# Payload Sizes
+#
+def _text_bytes(value):
+    return len(value.encode('utf-8')) if value else 0
+
+def _buffer_bytes(content, size = None):
+    if size is not None:
+        return size
+    try:
+        view = memoryview(content)
+    except TypeError:
+        return 0
+    nbytes = view.itemsize
+    for extent in view.shape:
+        nbytes *= extent
+    return nbytes
+
+def _file_bytes(file_path, *args, **kwargs):
+    try:
+        return os.path.getsize(file_path)
+    except (OSError, TypeError):
+        return 0
+
+# the bytes each call hands to the DLL, from its arguments
+_PAYLOAD_SIZES = {
+    'logi_led_set_lighting_from_bitmap':   lambda *args, **kwargs: logi_led.LOGI_LED_BITMAP_SIZE,
+    'logi_led_set_lighting_from_array':    lambda *args, **kwargs: logi_led.LOGI_LED_BITMAP_SIZE,
+    'logi_arx_add_file_as':                _file_bytes,
+    'logi_arx_add_content_as':             lambda content, size = None, *args, **kwargs: _buffer_bytes(content, size),
+    'logi_arx_add_utf8_string_as':         lambda string_content, *args, **kwargs: _text_bytes(string_content),
+    'logi_arx_add_image_from_bitmap':      lambda bitmap, width, height, *args, **kwargs: width * height * 4,
+    'logi_arx_set_tag_content_by_id':      lambda tag_id, new_content, *args, **kwargs: _text_bytes(new_content),
+    'logi_arx_set_tags_content_by_class':  lambda tag_class, new_content, *args, **kwargs: _text_bytes(new_content),
+    'logi_arx_set_tag_property_by_id':     lambda tag_id, prop, new_value, *args, **kwargs: _text_bytes(new_value),
+    'logi_arx_set_tags_property_by_class': lambda tag_class, prop, new_value, *args, **kwargs: _text_bytes(new_value),
+}
+
+
+# Instrumentation
+#
+_lock      = threading.Lock()
+_stats     = {}
+_originals = {}
+_started   = None
+# set from enable() to disable(). a wrapper that something else, such as a LedRecorder, replaced again after enable() cannot be taken
+# out by disable(), so it passes calls straight through once its session is cleared until the replacement is taken out too.
+_session   = None
+
+def _instrument(name, function, last_error, session):
+    """ returns a wrapper of function that records its calls into the stats of name while session is active. last_error, for Arx
+        functions, returns the SDK error code of a failed call. """
+    stats    = _stats.setdefault(name, _CallStats())
+    payload  = _PAYLOAD_SIZES.get(name)
+
+    @functools.wraps(function)
+    def instrumented(*args, **kwargs):
+        if not session.is_set():
+            return function(*args, **kwargs)
+        started = _clock()
+        try:
+            result = function(*args, **kwargs)
+        except Exception:
+            elapsed = _clock() - started
+            with _lock:
+                stats.exceptions += 1
+                _record(stats, elapsed)
+            raise
+        elapsed = _clock() - started
+        size    = 0
+        if payload is not None:
+            try:
+                size = payload(*args, **kwargs)
+            except Exception:
+                size = 0
+        code = last_error() if result is False and last_error is not None else None
+        with _lock:
+            _record(stats, elapsed)
+            stats.bytes += size
+            if result is False:
+                stats.failures += 1
+                if code is not None:
+                    stats.error_codes[code] += 1
+        return result
+    instrumented.__wrapped__       = function
+    instrumented._logipy_session = session
+    return instrumented
+
+def _unwrap_finished(function):
+    """ returns function without the wrappers around it whose session already ended. the instrumented wrappers and a LedRecorder's each
+        carry the threading.Event of their session as _logipy_session and the function they wrap as __wrapped__, and either can be stopped
+        while the other one's wrapper still sits over it. """
+    session = getattr(function, '_logipy_session', None)
+    while session is not None and not session.is_set():
+        function = function.__wrapped__
+        session  = getattr(function, '_logipy_session', None)
+    return function
+
+def _record(stats, elapsed):
+    stats.calls  += 1
+    stats.total  += elapsed
+    stats.buckets[_bucket_index(int(elapsed * 1e6))] += 1
+    if stats.minimum is None or elapsed < stats.minimum:
+        stats.minimum = elapsed
+    if elapsed > stats.maximum:
+        stats.maximum = elapsed
+
+def enable():
+    """ replaces every logi_led_* and logi_arx_* SDK wrapper in the logi_led and logi_arx modules with an instrumented one that records
+        call counts, failures, SDK error codes of failed Arx calls, bytes passed and call times. code calling the wrappers through the
+        modules, including LedCanvas, EffectScheduler and the Arx caches, is measured; names imported with from ... import before enable()
+        are not. wrappers already replaced by something else, such as a running LedRecorder, are instrumented through that replacement.
+        does nothing if already enabled. """
+    global _started, _session
+    with _lock:
+        if _originals:
+            return
+        if _started is None:
+            _started = time.time()
+        _session   = threading.Event()
+        _session.set()
+        last_error = logi_arx.logi_arx_get_last_error
+        for module, prefix in ((logi_led, 'logi_led_'), (logi_arx, 'logi_arx_')):
+            for name, function in list(vars(module).items()):
+                if name.startswith(prefix) and name not in _EXCLUDED and callable(function):
+                    wrapper = _instrument(name, function, last_error if module is logi_arx else None, _session)
+                    _originals[module, name] = (function, wrapper)
+                    setattr(module, name, wrapper)
+
+def disable():
+    """ puts the original wrappers back, so instrumentation costs nothing. a wrapper that was replaced again since enable() is left in
+        place and passes calls through unrecorded until that replacement is taken out as well. the recorded stats are kept. """
+    with _lock:
+        if _session is not None:
+            _session.clear()
+        for (module, name), (function, wrapper) in list(_originals.items()):
+            if getattr(module, name) is wrapper:
+                setattr(module, name, _unwrap_finished(function))
+        _originals.clear()
+
+def enabled():
+    """ returns True if the wrappers are instrumented. """
+    return bool(_originals)
+
+def reset():
+    """ clears the recorded stats. """
+    global _started
+    with _lock:
+        for stats in _stats.values():
+            stats.clear()
+        _started = time.time() if _originals else None
+
+def snapshot():
+    """ returns a dict with 'enabled', 'since' (the time recording started) and 'functions': for every function called, a dict of
+        calls, failures, exceptions, bytes, error_codes and total, mean, min, max, p50, p90 and p99 milliseconds. """
+    with _lock:
+        functions = dict((name, stats.snapshot()) for name, stats in _stats.items() if stats.calls)
+    return {
+        'enabled':   enabled(),
+        'since':     _started,
+        'functions': functions,
+    }
+
+
+# Exporting
+#
+def prometheus_text():
+    """ returns the recorded stats in the prometheus text exposition format. """
+    with _lock:
+        items = [(name, stats.calls, stats.failures, stats.bytes, stats.total, list(stats.buckets), dict(stats.error_codes))
+                 for name, stats in sorted(_stats.items()) if stats.calls]
+    lines = [
+        '# HELP logipy_calls_total SDK wrapper calls.',
+        '# TYPE logipy_calls_total counter',
+    ]
+    lines.extend('logipy_calls_total{{function="{}"}} {}'.format(name, calls) for name, calls, _, _, _, _, _ in items)
+    lines.extend([
+        '# HELP logipy_failures_total SDK wrapper calls that returned False.',
+        '# TYPE logipy_failures_total counter',
+    ])
+    lines.extend('logipy_failures_total{{function="{}"}} {}'.format(name, failures) for name, _, failures, _, _, _, _ in items)
+    lines.extend([
+        '# HELP logipy_bytes_total Payload bytes passed to the SDK.',
+        '# TYPE logipy_bytes_total counter',
+    ])
+    lines.extend('logipy_bytes_total{{function="{}"}} {}'.format(name, size) for name, _, _, size, _, _, _ in items if size)
+    lines.extend([
+        '# HELP logipy_arx_errors_total LogiArxGetLastError codes after failed Arx calls.',
+        '# TYPE logipy_arx_errors_total counter',
+    ])
+    for name, _, _, _, _, _, error_codes in items:
+        lines.extend('logipy_arx_errors_total{{function="{}",code="{}"}} {}'.format(name, code, count)
+                     for code, count in sorted(error_codes.items()))
+    lines.extend([
+        '# HELP logipy_call_duration_seconds Time spent in SDK wrapper calls.',
+        '# TYPE logipy_call_duration_seconds histogram',
+    ])
+    for name, calls, _, _, total, buckets, _ in items:
+        cumulative = 0
+        index      = 0
+        for bound in _PROMETHEUS_BOUNDS:
+            # le is inclusive, so a bucket counts once every value it holds is at or below the bound
+            while index < len(buckets) and _bucket_bounds(index)[1] <= bound:
+                cumulative += buckets[index]
+                index      += 1
+            lines.append('logipy_call_duration_seconds_bucket{{function="{}",le="{:g}"}} {}'.format(name, bound / 1e6, cumulative))
+        lines.append('logipy_call_duration_seconds_bucket{{function="{}",le="+Inf"}} {}'.format(name, calls))
+        lines.append('logipy_call_duration_seconds_sum{{function="{}"}} {:.9f}'.format(name, total))
+        lines.append('logipy_call_duration_seconds_count{{function="{}"}} {}'.format(name, calls))
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(path):
+    """ writes prometheus_text() to path, for the node exporter's textfile collector. the file is replaced atomically. """
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary, 'w') as text_file:
+        text_file.write(prometheus_text())
+    if hasattr(os, 'replace'):
+        os.replace(temporary, path)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(temporary, path)
+
+
+class StatsDumper(object):
+    """ writes the recorded stats every interval seconds on a background thread, to a prometheus text file at path and/or as a
+        one line summary per function to logger, a logging.Logger. """
+
+    def __init__(self, interval = 10.0, path = None, logger = None):
+        self.interval    = interval
+        self.path        = path
+        self.logger      = logger
+        self._stop_event = threading.Event()
+        self._thread     = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """ starts the dumper thread. """
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target = self._run, name = 'logipy-stats-dumper')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout = None):
+        """ stops the dumper thread, after a last dump, and waits for it to exit. """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def dump(self):
+        """ writes the stats once. """
+        if self.path:
+            write_prometheus(self.path)
+        if self.logger is not None:
+            for name, stats in sorted(snapshot()['functions'].items()):
+                self.logger.info('%s: %d calls, %d failed, %d bytes, p50 %.3f ms, p99 %.3f ms',
+                                 name, stats['calls'], stats['failures'], stats['bytes'], stats['p50_ms'], stats['p99_ms'])
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.dump()
+        self.dump()
@@ -12,6 +12,9 @@ setup(
     url = 'http://gaming.logitech.com/en-us/developers',
 	download_url = 'https://github.com/Logitech/logiPy/tarball/master',
     packages=['logipy'],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Topic :: Software Development :: Libraries',
@@ -0,0 +1,326 @@
+"""
+test_logi_arx.py : Tests of the Arx caches and live images against the simulated Arx Control SDK
+
+Logitech Gaming Arx Control SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import json
+import time
+import unittest
+
+from logipy import logi_arx
+from logipy import logi_arx_sim
+
+
+def _ignore_event(event_type, event_value, event_arg, context):
+    pass
+
+
+class SimulatedArxTestCase(unittest.TestCase):
+    """ installs a fresh SimulatedArxDll as the logi_arx backend, initialized, for every test. """
+
+    def setUp(self):
+        self.sim      = logi_arx_sim.SimulatedArxDll()
+        self.previous = logi_arx.logi_arx_set_backend(self.sim)
+        self.assertTrue(logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event))
+
+    def tearDown(self):
+        logi_arx.logi_arx_shutdown()
+        logi_arx.logi_arx_set_backend(self.previous)
+
+    def _wait_for(self, condition):
+        for _ in range(1000):
+            if condition():
+                return
+            time.sleep(0.001)
+        self.fail('timed out')
+
+
+class BackendTest(SimulatedArxTestCase):
+
+    def test_arx_dll_is_a_module_global(self):
+        # a plain attribute, so it does not depend on module __getattr__, which pythons before 3.7 do not call
+        self.assertIs(vars(logi_arx)['arx_dll'], self.sim)
+
+
+# Events
+#
+class ArxEventDispatcherTest(SimulatedArxTestCase):
+
+    def _init(self, callback, dispatcher):
+        self.assertTrue(logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', callback, dispatcher = dispatcher))
+
+    def test_initializing_again_does_not_register_the_callback_twice(self):
+        dispatcher = logi_arx.ArxEventDispatcher()
+        events     = []
+        callback   = lambda *event: events.append(event[0])
+        self._init(callback, dispatcher)
+        logi_arx.logi_arx_shutdown()
+        self._init(callback, dispatcher)
+        self.sim.fire_event(logi_arx.LOGI_ARX_EVENT_FOCUS_ACTIVE)
+        dispatcher.dispatch_pending()
+        self.assertEqual(events, [logi_arx.LOGI_ARX_EVENT_FOCUS_ACTIVE])
+
+    def test_initializing_again_replaces_the_callback(self):
+        dispatcher = logi_arx.ArxEventDispatcher()
+        events     = []
+        first      = lambda *event: events.append('first')
+        second     = lambda *event: events.append('second')
+        dispatcher.on_any(first)
+        self._init(first, dispatcher)
+        self._init(second, dispatcher)
+        self.sim.fire_event(logi_arx.LOGI_ARX_EVENT_FOCUS_ACTIVE)
+        dispatcher.dispatch_pending()
+        # the registration made by the caller stays
+        self.assertEqual(events, ['first', 'second'])
+
+
+# Tag Cache
+#
+class ArxTagCacheTest(SimulatedArxTestCase):
+
+    def test_unchanged_values_are_not_sent(self):
+        cache = logi_arx.ArxTagCache()
+        self.assertTrue(cache.set_tag_content_by_id('score', '1'))
+        self.assertTrue(cache.set_tag_content_by_id('score', '1'))
+        self.assertTrue(cache.set_tag_content_by_id('score', '2'))
+        self.assertEqual(self.sim.call_counts['LogiArxSetTagContentById'], 2)
+        self.assertEqual(cache.stats()['suppressed'], 1)
+        self.assertEqual(self.sim.tag_content['score'], '2')
+
+    def test_class_writes_forget_the_ids_under_them(self):
+        cache = logi_arx.ArxTagCache()
+        cache.set_tag_property_by_id('bar', 'style.width', '10%')
+        cache.set_tags_property_by_class('bars', 'style.width', '0%')
+        cache.set_tag_property_by_id('bar', 'style.width', '10%')
+        self.assertEqual(self.sim.call_counts['LogiArxSetTagPropertyById'], 2)
+
+    def test_window_collapses_writes_until_flushed(self):
+        cache = logi_arx.ArxTagCache(window = 60.0)
+        for value in ('1', '2', '3', '4'):
+            cache.set_tag_content_by_id('score', value)
+        self.assertEqual(self.sim.tag_content['score'], '1')
+        self.assertEqual(cache.pending(), 1)
+        self.assertEqual(cache.stats()['collapsed'], 2)
+        self.assertTrue(cache.flush())
+        self.assertEqual(cache.pending(), 1)
+        self.assertTrue(cache.flush(force = True))
+        self.assertEqual(cache.pending(), 0)
+        self.assertEqual(self.sim.tag_content['score'], '4')
+        self.assertEqual(self.sim.call_counts['LogiArxSetTagContentById'], 2)
+
+    def test_max_delay_sends_held_back_writes_without_flush(self):
+        cache = logi_arx.ArxTagCache(window = 60.0, max_delay = 0.02)
+        cache.set_tag_content_by_id('score', '1')
+        cache.set_tag_content_by_id('score', '2')
+        self.assertEqual(self.sim.tag_content['score'], '1')
+        self._wait_for(lambda: self.sim.tag_content['score'] == '2')
+        self.assertEqual(cache.pending(), 0)
+
+    def test_max_delay_sends_once_the_window_has_passed(self):
+        cache = logi_arx.ArxTagCache(window = 0.02, max_delay = 60.0)
+        cache.set_tag_content_by_id('score', '1')
+        cache.set_tag_content_by_id('score', '2')
+        self._wait_for(lambda: self.sim.tag_content['score'] == '2')
+        self.assertEqual(self.sim.call_counts['LogiArxSetTagContentById'], 2)
+
+    def test_setting_the_index_invalidates(self):
+        cache = logi_arx.ArxTagCache()
+        logi_arx.logi_arx_add_utf8_string_as('<html></html>', 'index.html', 'text/html')
+        cache.set_tag_content_by_id('score', '1')
+        self.assertTrue(logi_arx.logi_arx_set_index('index.html'))
+        cache.set_tag_content_by_id('score', '1')
+        self.assertEqual(self.sim.call_counts['LogiArxSetTagContentById'], 2)
+
+
+# Upload Cache
+#
+class ArxUploadCacheTest(SimulatedArxTestCase):
+
+    def test_repeated_uploads_are_skipped(self):
+        cache = logi_arx.ArxUploadCache()
+        self.assertTrue(cache.add_utf8_string_as('<html></html>', 'index.html', 'text/html'))
+        self.assertTrue(cache.add_utf8_string_as('<html></html>', 'index.html', 'text/html'))
+        self.assertTrue(cache.add_content_as(b'\x89PNG', None, 'logo.png', 'image/png'))
+        self.assertTrue(cache.add_content_as(bytearray(b'\x89PNG'), None, 'logo.png', 'image/png'))
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 2, 'bytes_sent': 17, 'bytes_saved': 17})
+        self.assertTrue(cache.uploaded('logo.png'))
+
+    def test_changed_content_is_uploaded(self):
+        cache = logi_arx.ArxUploadCache()
+        cache.add_utf8_string_as('one', 'page.html', 'text/html')
+        cache.add_utf8_string_as('two', 'page.html', 'text/html')
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual(self.sim.files['page.html'][0], b'two')
+
+    def test_failed_uploads_are_not_remembered(self):
+        cache = logi_arx.ArxUploadCache()
+        logi_arx.logi_arx_shutdown()
+        self.assertFalse(cache.add_utf8_string_as('page', 'page.html', 'text/html'))
+        self.assertFalse(cache.uploaded('page.html'))
+
+    def test_shutdown_invalidates(self):
+        cache = logi_arx.ArxUploadCache()
+        cache.add_utf8_string_as('page', 'page.html', 'text/html')
+        logi_arx.logi_arx_shutdown()
+        logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event)
+        cache.add_utf8_string_as('page', 'page.html', 'text/html')
+        self.assertEqual(self.sim.call_counts['LogiArxAddUTF8StringAs'], 2)
+
+
+# State Sync
+#
+def _shown(value):
+    """ returns what the DOM shows after the page script assigns value, a value decoded from a state file. """
+    if value is None:
+        return ''
+    if value is True or value is False:
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value == int(value):
+        return str(int(value))
+    return value if isinstance(value, str) else str(value)
+
+class ArxStateSyncTest(SimulatedArxTestCase):
+
+    STATE = {
+        'title': 'LogiPy',
+        'empty': None,
+        'flag':  True,
+        'count': 3,
+        'ratio': 1.0,
+        'half':  0.5,
+        'bar':   {'style.width': None, 'style.height': '4px'},
+    }
+
+    def _page(self):
+        """ returns the tag content and properties the page shows after applying every state file, as the runtime script does. """
+        content, properties = {}, {}
+        for version in range(1, self.sync.version + 1):
+            data, _ = self.sim.files['{}{}.json'.format(self.sync.file_prefix, version % logi_arx.STATE_SYNC_FILES)]
+            for tag_id, value in json.loads(data.decode('utf-8')).items():
+                if isinstance(value, dict):
+                    properties.update(((tag_id, prop), _shown(prop_value)) for prop, prop_value in value.items())
+                else:
+                    content[tag_id] = _shown(value)
+        return content, properties
+
+    def test_per_tag_updates_show_the_same_as_state_files(self):
+        self.sync = logi_arx.ArxStateSync(per_tag_max = 0)
+        self.assertTrue(self.sync.publish(self.STATE))
+        self.assertEqual(self.sync.stats()['files_sent'], 1)
+        from_file = self._page()
+
+        self.sim.reset()
+        self.assertTrue(logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event))
+        self.sync = logi_arx.ArxStateSync(per_tag_max = 100)
+        self.assertTrue(self.sync.publish(self.STATE))
+        self.assertEqual(self.sync.stats()['files_sent'], 0)
+        self.assertEqual((self.sim.tag_content, self.sim.tag_properties), from_file)
+
+
+# Live Images
+#
+class ArxLiveImageTest(SimulatedArxTestCase):
+
+    def _stream(self, frames, **kwargs):
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2, max_fps = None, **kwargs)
+        image.start()
+        for frame in frames:
+            image.submit(frame)
+        image.stop()
+        return image
+
+    def test_frames_are_sent(self):
+        frame = bytes(bytearray(range(32)))
+        image = self._stream([frame])
+        self.assertEqual(image.stats()['sent'], 1)
+        self.assertEqual(self.sim.files['graph.png'][0], frame)
+
+    def test_identical_frames_are_deduplicated(self):
+        frame = bytes(bytearray(range(32)))
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2, max_fps = None)
+        image.start()
+        for _ in range(3):
+            image.submit(frame)
+            self._wait_until_taken(image)
+        image.stop()
+        stats = image.stats()
+        self.assertEqual((stats['sent'], stats['deduplicated']), (1, 2))
+        self.assertEqual(self.sim.call_counts['LogiArxAddImageFromBitmap'], 1)
+
+    def test_rgba_frames_are_converted(self):
+        image = self._stream([bytes(bytearray((1, 2, 3, 4))) * 8], channel_order = 'RGBA')
+        self.assertEqual(self.sim.files['graph.png'][0], bytes(bytearray((3, 2, 1, 4))) * 8)
+
+    def test_short_frames_are_refused(self):
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2)
+        self.assertRaises(ValueError, image.submit, b'\x00' * 16)
+
+    def test_shutdown_holds_frames_until_init(self):
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2, max_fps = None)
+        image.start()
+        image.submit(bytes(bytearray(range(32))))
+        self._wait_for(lambda: image.sent == 1)
+        logi_arx.logi_arx_shutdown()
+        image.submit(bytes(bytearray(range(1, 33))))
+        time.sleep(0.05)
+        self.assertEqual((image.sent, image.failed), (1, 0))
+        self.assertEqual(self.sim.call_counts['LogiArxAddImageFromBitmap'], 1)
+        logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event)
+        self._wait_for(lambda: image.sent == 2)
+        image.stop()
+        self.assertEqual(image.failed, 0)
+        self.assertEqual(self.sim.files['graph.png'][0], bytes(bytearray(range(1, 33))))
+
+    def test_shutdown_during_the_rate_wait_keeps_the_stream(self):
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2, max_fps = 5)
+        image.start()
+        image.submit(bytes(bytearray(range(32))))
+        self._wait_for(lambda: image.sent == 1)
+        # the worker takes this frame into the wait for the next send slot
+        image.submit(bytes(bytearray(range(1, 33))))
+        time.sleep(0.02)
+        logi_arx.logi_arx_shutdown()
+        time.sleep(0.25)
+        self.assertTrue(image.running)
+        logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event)
+        image.submit(bytes(bytearray(range(2, 34))))
+        self._wait_for(lambda: self.sim.files['graph.png'][0] == bytes(bytearray(range(2, 34))))
+        image.stop()
+        self.assertEqual(image.failed, 0)
+
+    def test_stop_after_shutdown_sends_nothing(self):
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2, max_fps = None)
+        image.start()
+        logi_arx.logi_arx_shutdown()
+        image.submit(bytes(32))
+        image.stop()
+        self.assertEqual(self.sim.call_counts['LogiArxAddImageFromBitmap'], 0)
+
+    def test_device_arrival_sends_the_last_frame_again(self):
+        image = logi_arx.ArxLiveImage('graph.png', 4, 2, max_fps = None)
+        image.start()
+        image.submit(bytes(bytearray(range(32))))
+        self._wait_for(lambda: image.sent == 1)
+        time.sleep(0.2)
+        self.sim.fire_event(logi_arx.LOGI_ARX_EVENT_MOBILEDEVICE_ARRIVAL, logi_arx.LOGI_ARX_DEVICETYPE_IPHONE)
+        self._wait_for(lambda: image.sent == 2)
+        image.stop()
+        # the resent frame is timed from the arrival, not from its first submit()
+        self.assertLess(image.stats()['latency_p99_ms'], 100.0)
+
+    @staticmethod
+    def _wait_until_taken(image):
+        for _ in range(1000):
+            with image._condition:
+                if image._slot is None:
+                    return
+            time.sleep(0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
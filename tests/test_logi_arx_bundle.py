@@ -0,0 +1,107 @@
+"""
+test_logi_arx_bundle.py : Tests of deploy_bundle against the simulated Arx Control SDK
+
+Logitech Gaming Arx Control SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import os
+import shutil
+import tempfile
+
+from logipy import logi_arx
+from logipy import logi_arx_bundle
+from logipy import logi_arx_sim
+from logipy import logi_sim
+from tests.test_logi_arx import SimulatedArxTestCase, _ignore_event
+
+_FILES = {
+    'index.html': b'<html><link rel="stylesheet" href="style.css"></html>',
+    'style.css':  b'body { color: red; }',
+}
+
+
+class _RejectingArxDll(logi_arx_sim.SimulatedArxDll):
+    """ a simulated SDK that fails every upload of the file named rejected. """
+
+    rejected = 'style.css'
+
+    def LogiArxAddContentAs(self, content, size, file_name, mime_type):
+        if logi_sim.value(file_name) == self.rejected:
+            return 0
+        return logi_arx_sim.SimulatedArxDll.LogiArxAddContentAs(self, content, size, file_name, mime_type)
+
+
+class _SharedCacheArxDll(logi_arx_sim.SimulatedArxDll):
+    """ a simulated SDK during whose uploads another user of cache re-sends content the device already holds. """
+
+    cache = None
+
+    def LogiArxAddContentAs(self, content, size, file_name, mime_type):
+        self.cache.add_utf8_string_as('shared', 'shared.txt')
+        return logi_arx_sim.SimulatedArxDll.LogiArxAddContentAs(self, content, size, file_name, mime_type)
+
+
+class DeployBundleTest(SimulatedArxTestCase):
+
+    def setUp(self):
+        SimulatedArxTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        for name, content in _FILES.items():
+            with open(os.path.join(self.directory, name), 'wb') as bundle_file:
+                bundle_file.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        SimulatedArxTestCase.tearDown(self)
+
+    def test_every_upload_is_counted_as_sent(self):
+        report = logi_arx_bundle.deploy_bundle(self.directory, cache = logi_arx.ArxUploadCache())
+        self.assertTrue(report['ok'])
+        self.assertEqual(report['bytes_sent'], sum(len(content) for content in _FILES.values()))
+        self.assertEqual(report['bytes_failed'], 0)
+        self.assertEqual(self.sim.index, 'index.html')
+
+    def test_failed_uploads_are_not_counted_as_sent(self):
+        logi_arx.logi_arx_shutdown()
+        self.sim = _RejectingArxDll()
+        logi_arx.logi_arx_set_backend(self.sim)
+        self.assertTrue(logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event))
+        for incremental in (True, False):
+            report = logi_arx_bundle.deploy_bundle(self.directory, incremental = incremental, cache = logi_arx.ArxUploadCache())
+            self.assertFalse(report['ok'])
+            self.assertEqual(report['bytes_sent'], len(_FILES['index.html']))
+            self.assertEqual(report['bytes_failed'], len(_FILES['style.css']))
+            self.assertEqual(report['bytes_skipped'], 0)
+            failed = [asset for asset in report['assets'] if not asset['ok']]
+            self.assertEqual([(asset['file_name'], asset['sent']) for asset in failed], [('style.css', False)])
+
+    def test_other_cache_users_do_not_change_what_counts_as_sent(self):
+        cache = logi_arx.ArxUploadCache()
+        logi_arx.logi_arx_shutdown()
+        self.sim = _SharedCacheArxDll()
+        self.sim.cache = cache
+        logi_arx.logi_arx_set_backend(self.sim)
+        self.assertTrue(logi_arx.logi_arx_init('com.logitech.tests', 'logipy tests', _ignore_event))
+        self.assertTrue(cache.add_utf8_string_as('shared', 'shared.txt'))
+        report = logi_arx_bundle.deploy_bundle(self.directory, cache = cache)
+        self.assertTrue(report['ok'])
+        self.assertEqual([asset['sent'] for asset in report['assets']], [True, True])
+        self.assertEqual(report['bytes_sent'], sum(len(content) for content in _FILES.values()))
+        self.assertEqual(report['bytes_skipped'], 0)
+        report = logi_arx_bundle.deploy_bundle(self.directory, cache = cache)
+        self.assertEqual([asset['sent'] for asset in report['assets']], [False, False])
+        self.assertEqual(report['bytes_skipped'], sum(len(content) for content in _FILES.values()))
+
+    def test_assets_can_be_prepared_in_other_processes(self):
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers = 2)
+        try:
+            report = logi_arx_bundle.deploy_bundle(self.directory, cache = logi_arx.ArxUploadCache(), executor = executor)
+        finally:
+            executor.shutdown()
+        self.assertTrue(report['ok'])
+        self.assertEqual(self.sim.files['style.css'], (_FILES['style.css'], 'text/css'))
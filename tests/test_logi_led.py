@@ -0,0 +1,657 @@
+"""
+test_logi_led.py : Tests of the frame, effect and command pipeline of logi_led against the simulated LED SDK
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import threading
+import time
+import unittest
+
+from logipy import logi_led
+from logipy import logi_led_sim
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SimulatedLedTestCase(unittest.TestCase):
+    """ installs a fresh SimulatedLedDll as the logi_led backend, initialized, for every test. """
+
+    def setUp(self):
+        self.sim      = logi_led_sim.SimulatedLedDll()
+        self.previous = logi_led.logi_led_set_backend(self.sim)
+        self.assertTrue(logi_led.logi_led_init())
+
+    def tearDown(self):
+        logi_led.logi_led_set_backend(self.previous)
+
+
+class BackendTest(SimulatedLedTestCase):
+
+    def test_led_dll_is_a_module_global(self):
+        # a plain attribute, so it does not depend on module __getattr__, which pythons before 3.7 do not call
+        self.assertIs(vars(logi_led)['led_dll'], self.sim)
+        self.assertIs(logi_led.logi_led_get_backend(), self.sim)
+
+
+# Helpers
+#
+class ColorHelpersTest(unittest.TestCase):
+
+    COLORS = [logi_led.Color('red'), (0, 128, 255), (10, 20, 30, 40)]
+
+    def test_colors_to_percent(self):
+        self.assertEqual(logi_led.colors_to_percent(self.COLORS), [(100, 0, 0), (0, 50, 100), (3, 7, 11)])
+        for value in range(256):
+            self.assertEqual(logi_led.colors_to_percent([(value, 0, 0)])[0][0], int((value / 255.0) * 100))
+
+    def test_colors_to_bitmap_is_bgra(self):
+        bitmap = logi_led.colors_to_bitmap(self.COLORS)
+        self.assertEqual(len(bitmap), len(self.COLORS) * logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY)
+        self.assertEqual(bytearray(bitmap), bytearray((0, 0, 255, 255, 255, 128, 0, 255, 30, 20, 10, 40)))
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_numpy_arrays_convert_like_sequences(self):
+        rgb  = numpy.array([(255, 0, 0), (0, 128, 255), (10, 20, 30)], numpy.uint8)
+        rgba = numpy.array([(255, 0, 0, 255), (0, 128, 255, 255), (10, 20, 30, 40)], numpy.uint8)
+        self.assertEqual(logi_led.colors_to_percent(rgb), logi_led.colors_to_percent(self.COLORS))
+        self.assertEqual(logi_led.colors_to_bitmap(rgba), logi_led.colors_to_bitmap(self.COLORS))
+        self.assertEqual(logi_led.colors_to_bitmap(rgb), logi_led.colors_to_bitmap([tuple(color) for color in rgb.tolist()]))
+
+    def test_palette_lookup(self):
+        palette = logi_led.Palette.gradient(['black', 'white'], 3)
+        self.assertEqual(len(palette), 3)
+        self.assertEqual(palette[1], logi_led.Color(128, 128, 128))
+        self.assertEqual([palette.index(value) for value in (-1.0, 0.0, 0.4, 0.5, 1.0, 2.0)], [0, 0, 1, 1, 2, 2])
+        self.assertEqual(palette.index(50, low = 0, high = 100), 1)
+        self.assertEqual(palette.percent(2), (100, 100, 100))
+        self.assertEqual(palette.map_percent([0.0, 1.0]), [(0, 0, 0), (100, 100, 100)])
+        self.assertEqual(palette.map_bitmap([1.0, 0.0]), logi_led.colors_to_bitmap([palette[2], palette[0]]))
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_palette_maps_numpy_arrays(self):
+        palette = logi_led.Palette([(255, 0, 0), (0, 255, 0), (0, 0, 255)])
+        values  = numpy.array([[0.0, 0.5], [1.0, 7.0]])
+        self.assertEqual(palette.map_bitmap(values), palette.map_bitmap([0.0, 0.5, 1.0, 7.0]))
+
+    def test_empty_palettes_are_refused(self):
+        with self.assertRaises(ValueError):
+            logi_led.Palette([])
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class LightingFromArrayTest(SimulatedLedTestCase):
+    """ logi_led_set_lighting_from_array has to push the same BGRA bitmap whichever pixel layout it is given. """
+
+    SHAPE = (logi_led.LOGI_LED_BITMAP_HEIGHT, logi_led.LOGI_LED_BITMAP_WIDTH)
+
+    def setUp(self):
+        SimulatedLedTestCase.setUp(self)
+        self.rgba = numpy.arange(numpy.prod(self.SHAPE) * 4, dtype = numpy.uint32).astype(numpy.uint8).reshape(self.SHAPE + (4,))
+
+    def _expected(self, rgba):
+        """ returns the BGRA bitmap bytes of an RGBA pixel array. """
+        return numpy.ascontiguousarray(rgba[..., [2, 1, 0, 3]]).tobytes()
+
+    def test_bgra_array_is_pushed_as_is(self):
+        bgra = numpy.ascontiguousarray(self.rgba[..., [2, 1, 0, 3]])
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(bgra))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(self.rgba))
+
+    def test_rgba_and_rgb_arrays_are_swizzled(self):
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(self.rgba, channel_order = 'RGBA'))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(self.rgba))
+        opaque = self.rgba.copy()
+        opaque[..., 3] = 255
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(self.rgba[..., :3].copy(), channel_order = 'rgb'))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(opaque))
+
+    def test_non_contiguous_arrays_are_copied(self):
+        mirrored = self.rgba[:, ::-1]
+        self.assertFalse(mirrored.flags['C_CONTIGUOUS'])
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(mirrored, channel_order = 'RGBA'))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(mirrored))
+        bgra = numpy.ascontiguousarray(self.rgba[..., [2, 1, 0, 3]])[:, ::-1]
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(bgra))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(mirrored))
+
+    def test_flat_buffers_match_arrays(self):
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(bytearray(self.rgba.tobytes()), channel_order = 'RGBA'))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(self.rgba))
+        opaque = self.rgba.copy()
+        opaque[..., 3] = 255
+        self.assertTrue(logi_led.logi_led_set_lighting_from_array(self.rgba[..., :3].tobytes(), channel_order = 'RGB'))
+        self.assertEqual(bytes(self.sim.bitmap), self._expected(opaque))
+
+    def test_wrong_layouts_are_refused(self):
+        for pixels in (self.rgba.reshape(logi_led.LOGI_LED_BITMAP_WIDTH, logi_led.LOGI_LED_BITMAP_HEIGHT, 4),
+                       self.rgba[..., :2].copy(),
+                       self.rgba.astype(numpy.uint16),
+                       bytes(numpy.prod(self.SHAPE) * 2)):
+            with self.assertRaises(ValueError):
+                logi_led.logi_led_set_lighting_from_array(pixels)
+        with self.assertRaises(ValueError):
+            logi_led.logi_led_set_lighting_from_array(self.rgba, channel_order = 'ARGB')
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 0)
+
+
+# Key Index
+#
+class KeyCodeTablesTest(unittest.TestCase):
+    """ the hand-typed HID and Quartz code tables have to cover the bitmap layout one to one. """
+
+    TABLES = (
+        ('HID', logi_led.KEY_TO_HID_CODE, logi_led.HID_CODE_TO_KEY),
+        ('Quartz', logi_led.KEY_TO_QUARTZ_CODE, logi_led.QUARTZ_CODE_TO_KEY),
+    )
+
+    def test_every_bitmap_key_has_a_code(self):
+        layout = set(key_name for keys in logi_led.KEY_BITMAP_LAYOUT for key_name in keys if key_name is not None)
+        self.assertEqual(len(logi_led._KEY_CODES), len(layout))
+        for name, key_to_code, code_to_key in self.TABLES:
+            self.assertEqual(set(key_to_code), layout, name)
+
+    def test_codes_are_unique_and_round_trip(self):
+        for name, key_to_code, code_to_key in self.TABLES:
+            self.assertEqual(len(set(key_to_code.values())), len(key_to_code), name)
+            self.assertEqual(len(code_to_key), len(key_to_code), name)
+            for key_name, code in key_to_code.items():
+                self.assertEqual(code_to_key[code], key_name, name)
+
+    def test_hid_codes_follow_the_usage_table(self):
+        # the letter, digit, function and keypad usages are contiguous runs in the USB HID usage tables
+        runs = (
+            (0x04, 'A B C D E F G H I J K L M N O P Q R S T U V W X Y Z'),
+            (0x1e, 'ONE TWO THREE FOUR FIVE SIX SEVEN EIGHT NINE ZERO'),
+            (0x3a, 'F1 F2 F3 F4 F5 F6 F7 F8 F9 F10 F11 F12 PRINT_SCREEN SCROLL_LOCK PAUSE_BREAK INSERT HOME PAGE_UP KEYBOARD_DELETE END PAGE_DOWN'),
+            (0x4f, 'ARROW_RIGHT ARROW_LEFT ARROW_DOWN ARROW_UP NUM_LOCK NUM_SLASH NUM_ASTERISK NUM_MINUS NUM_PLUS NUM_ENTER'),
+            (0x59, 'NUM_ONE NUM_TWO NUM_THREE NUM_FOUR NUM_FIVE NUM_SIX NUM_SEVEN NUM_EIGHT NUM_NINE NUM_ZERO NUM_PERIOD'),
+            (0xe0, 'LEFT_CONTROL LEFT_SHIFT LEFT_ALT LEFT_WINDOWS RIGHT_CONTROL RIGHT_SHIFT RIGHT_ALT RIGHT_WINDOWS'),
+        )
+        for first, names in runs:
+            for offset, name in enumerate(names.split()):
+                self.assertEqual(logi_led.KEY_TO_HID_CODE[getattr(logi_led, name)], first + offset, name)
+
+    def test_quartz_codes_match_the_virtual_key_constants(self):
+        # kVK_ANSI_A, kVK_Return, kVK_Space, kVK_Escape, kVK_F1, kVK_ANSI_Keypad0 and kVK_UpArrow from HIToolbox Events.h
+        for name, code in (('A', 0x00), ('ENTER', 0x24), ('SPACE', 0x31), ('ESC', 0x35), ('F1', 0x7a), ('NUM_ZERO', 0x52), ('ARROW_UP', 0x7e)):
+            self.assertEqual(logi_led.KEY_TO_QUARTZ_CODE[getattr(logi_led, name)], code, name)
+
+
+# Config
+#
+class LedConfigTest(SimulatedLedTestCase):
+
+    def test_register_while_refreshing(self):
+        self.sim.latency = {'LogiGetConfigOptionNumber': 0.0001}
+        config = logi_led.LedConfig([logi_led.ConfigOption('option/0', logi_led.CONFIG_NUMBER, 0.0, 'Option 0')])
+        config.load()
+        errors = []
+        done   = threading.Event()
+
+        def refresh():
+            while not done.is_set():
+                try:
+                    config.refresh()
+                    config.options
+                except Exception as error:
+                    errors.append(error)
+                    return
+
+        thread = threading.Thread(target = refresh)
+        thread.start()
+        try:
+            for index in range(1, 50):
+                self.sim.config['option/{}'.format(index)] = float(index)
+                config.register('option/{}'.format(index), logi_led.CONFIG_NUMBER, 0.0, 'Option {}'.format(index))
+                time.sleep(0.0005)
+        finally:
+            done.set()
+            thread.join()
+        self.assertEqual(errors, [])
+        config.refresh()
+        self.assertEqual(len(config.options), 50)
+        self.assertEqual(config['option/49'], 49.0)
+        self.assertEqual(self.sim.labels['option/49'], 'Option 49')
+
+
+# Frame Buffering
+#
+class LedCanvasTest(SimulatedLedTestCase):
+
+    def test_first_commit_pushes_the_bitmap(self):
+        canvas = logi_led.LedCanvas()
+        canvas.fill(0, 0, 255)
+        self.assertTrue(canvas.commit())
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 1)
+        self.assertEqual(bytes(self.sim.bitmap), canvas.tobytes())
+
+    def test_unchanged_frame_is_not_sent(self):
+        canvas = logi_led.LedCanvas()
+        canvas.fill(0, 255, 0)
+        canvas.commit()
+        calls = sum(self.sim.call_counts.values())
+        self.assertTrue(canvas.commit())
+        self.assertEqual(sum(self.sim.call_counts.values()), calls)
+
+    def test_few_changed_keys_are_sent_per_key(self):
+        canvas = logi_led.LedCanvas()
+        canvas.commit()
+        canvas.set_key(logi_led.ESC, 255, 0, 0)
+        self.assertTrue(canvas.commit())
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 1)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingForKeyWithKeyName'], 1)
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (255, 0, 0))
+
+    def test_many_changed_keys_are_sent_as_a_bitmap(self):
+        canvas = logi_led.LedCanvas()
+        canvas.commit()
+        canvas.fill_rect(0, 0, 8, 1, 10, 20, 30)
+        self.assertTrue(canvas.commit())
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 2)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingForKeyWithKeyName'], 0)
+
+    def test_alpha_is_applied_the_same_per_key_and_in_a_bitmap(self):
+        canvas = logi_led.LedCanvas()
+        canvas.fill(0, 0, 0)
+        canvas.commit()
+        canvas.set_key(logi_led.ESC, 200, 100, 50, 128)
+        canvas.commit()
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingForKeyWithKeyName'], 1)
+        per_key = self.sim.key_color(logi_led.ESC)
+        canvas.invalidate()
+        canvas.commit()
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 2)
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (100, 50, 25))
+        # per-key calls take SDK percentages, so they are only as close as a percent allows
+        for channel, expected in zip(per_key, (100, 50, 25)):
+            self.assertLessEqual(abs(channel - expected), 3)
+
+    def test_alpha_matches_a_single_compositor_layer(self):
+        from logipy import logi_led_layers
+        compositor = logi_led_layers.LedCompositor(use_numpy = False)
+        layer      = compositor.add_layer('only')
+        canvas     = logi_led.LedCanvas()
+        for alpha, key_name in ((0, logi_led.ESC), (77, logi_led.F1), (128, logi_led.F2), (255, logi_led.F3)):
+            canvas.set_key(key_name, 201, 99, 3, alpha)
+            layer.canvas.set_key(key_name, 201, 99, 3, alpha)
+        canvas.commit()
+        self.assertEqual(bytes(self.sim.bitmap), compositor.compose())
+
+    def test_invalidate_forces_a_full_push(self):
+        canvas = logi_led.LedCanvas()
+        canvas.commit()
+        canvas.invalidate()
+        canvas.set_key(logi_led.ESC, 255, 0, 0)
+        canvas.commit()
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 2)
+
+
+# Scenes
+#
+class LedSceneTest(SimulatedLedTestCase):
+
+    def _switches(self):
+        return self.sim.call_counts['LogiLedSetTargetDevice']
+
+    def test_outputs_are_sent_with_the_fewest_switches(self):
+        scene = logi_led.LedScene(monochrome = 128)
+        scene.keys.fill(255, 0, 0)
+        self.assertTrue(scene.commit())
+        # the keys go out under the initial all-devices target, then rgb and monochrome need one target each
+        self.assertEqual(self._switches(), 2)
+        self.assertEqual(scene.switches, 2)
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (255, 0, 0))
+        self.assertEqual(self.sim.call_counts['LogiLedSetLighting'], 2)
+
+    def test_the_current_target_is_used_first(self):
+        scene = logi_led.LedScene(rgb = (0, 255, 0), monochrome = 128)
+        logi_led.logi_led_set_target_device(logi_led.LOGI_DEVICETYPE_RGB)
+        self.assertTrue(scene.commit())
+        names = [name for _, name, _ in self.sim.calls if name != 'LogiLedSetTargetDevice'][-3:]
+        self.assertEqual(names[0], 'LogiLedSetLighting')
+        self.assertEqual(scene.switches, 2)
+
+    def test_equal_colors_share_one_call(self):
+        scene = logi_led.LedScene(rgb = (255, 255, 255), monochrome = 255, devices = logi_led.LOGI_DEVICETYPE_RGB | logi_led.LOGI_DEVICETYPE_MONOCHROME)
+        self.assertTrue(scene.commit())
+        self.assertEqual(self.sim.call_counts['LogiLedSetLighting'], 1)
+        self.assertEqual(self.sim.lighting, (100, 100, 100))
+
+    def test_unchanged_outputs_are_skipped(self):
+        scene = logi_led.LedScene(rgb = (0, 0, 255), monochrome = 64)
+        scene.keys.fill(0, 255, 0)
+        scene.commit()
+        calls = sum(self.sim.call_counts.values())
+        self.assertTrue(scene.commit())
+        self.assertEqual(sum(self.sim.call_counts.values()), calls)
+        scene.rgb = (255, 0, 0)
+        self.assertTrue(scene.commit())
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 1)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLighting'], 3)
+        self.assertEqual(self.sim.lighting, (100, 0, 0))
+
+
+# Snapshots
+#
+class LedSnapshotStackTest(SimulatedLedTestCase):
+
+    def test_pop_restores_the_pushed_frame(self):
+        canvas = logi_led.LedCanvas()
+        stack  = logi_led.LedSnapshotStack(canvas)
+        canvas.fill(0, 0, 255)
+        canvas.commit()
+        self.assertEqual(stack.push(), 1)
+        canvas.set_key(logi_led.ESC, 255, 0, 0)
+        canvas.commit()
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (255, 0, 0))
+        frame = stack.pop()
+        self.assertEqual(len(stack), 0)
+        self.assertEqual(frame, canvas.tobytes())
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (0, 0, 255))
+        # the canvas knows what the device shows, so committing it sends nothing
+        calls = sum(self.sim.call_counts.values())
+        self.assertTrue(canvas.commit())
+        self.assertEqual(sum(self.sim.call_counts.values()), calls)
+
+    def test_unchanged_rows_are_shared(self):
+        canvas = logi_led.LedCanvas()
+        stack  = logi_led.LedSnapshotStack(canvas)
+        canvas.fill(10, 20, 30)
+        stack.push()
+        stack.push()
+        canvas.set_key(logi_led.ESC, 255, 0, 0)
+        stack.push()
+        row   = logi_led.LOGI_LED_BITMAP_WIDTH * logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY
+        stats = stack.stats()
+        self.assertEqual(stats['depth'], 3)
+        self.assertEqual(stats['bytes_frames'], 3 * logi_led.LOGI_LED_BITMAP_SIZE)
+        self.assertEqual(stats['bytes_stored'], logi_led.LOGI_LED_BITMAP_SIZE + row)
+        self.assertEqual(stack.peek(0), stack.peek(1))
+        self.assertNotEqual(stack.peek(1), stack.peek(2))
+
+    def test_pop_without_restore_sends_nothing(self):
+        stack = logi_led.LedSnapshotStack()
+        stack.push(bytes(logi_led.LOGI_LED_BITMAP_SIZE))
+        stack.pop(restore = False)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 0)
+
+    def test_popping_an_empty_stack_raises(self):
+        stack = logi_led.LedSnapshotStack(logi_led.LedCanvas())
+        with self.assertRaises(IndexError):
+            stack.pop()
+        with self.assertRaises(IndexError):
+            stack.pop(restore = False)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 0)
+
+    def test_max_depth_drops_the_oldest(self):
+        stack = logi_led.LedSnapshotStack(max_depth = 2)
+        for level in (1, 2, 3):
+            stack.push(bytes(bytearray((level,))) * logi_led.LOGI_LED_BITMAP_SIZE)
+        self.assertEqual(len(stack), 2)
+        self.assertEqual(bytearray(stack.peek(0))[0], 2)
+
+    def test_wrong_frame_sizes_are_refused(self):
+        stack = logi_led.LedSnapshotStack()
+        with self.assertRaises(ValueError):
+            stack.push(b'\x00' * 4)
+        with self.assertRaises(ValueError):
+            stack.push()
+
+
+# Effect Scheduling
+#
+class EffectSchedulerTest(SimulatedLedTestCase):
+
+    def _run(self, scheduler, seconds):
+        scheduler.start()
+        try:
+            time.sleep(seconds)
+        finally:
+            scheduler.stop()
+        return scheduler.stats()
+
+    def test_ticks_are_paced(self):
+        scheduler = logi_led.EffectScheduler(fps = 50)
+        stats     = self._run(scheduler, 0.4)
+        self.assertGreaterEqual(stats['ticks'], 10)
+        self.assertLessEqual(stats['ticks'], 22)
+
+    def test_unchanged_frames_are_not_sent(self):
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        scheduler.add_effect(lambda frame, now, dt: frame.fill(0, 0, 255))
+        stats = self._run(scheduler, 0.1)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 1)
+        self.assertEqual(stats['unchanged'], stats['ticks'] - 1)
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (0, 0, 255))
+
+    def test_alpha_is_applied_like_a_commit(self):
+        def draw(frame, now, dt):
+            frame.fill(0, 0, 0)
+            frame.set_key(logi_led.ESC, 200, 100, 50, 128)
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        scheduler.add_effect(draw)
+        self._run(scheduler, 0.05)
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (100, 50, 25))
+
+    def test_slow_ticks_are_counted_late_and_dropped(self):
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        scheduler.add_effect(lambda frame, now, dt: time.sleep(0.035))
+        stats = self._run(scheduler, 0.2)
+        self.assertGreater(stats['late_frames'], 0)
+        self.assertGreater(stats['dropped_frames'], 0)
+        self.assertLess(stats['ticks'], 10)
+
+    def test_effects_run_in_order_until_removed(self):
+        calls     = []
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        first     = scheduler.add_effect(lambda frame, now, dt: calls.append('first'))
+        scheduler.add_effect(lambda frame, now, dt: calls.append('second'))
+        scheduler._tick(0.0, 0.0)
+        scheduler.remove_effect(first)
+        scheduler._tick(0.01, 0.01)
+        self.assertEqual(calls, ['first', 'second', 'second'])
+
+    def test_failing_effects_are_counted(self):
+        calls     = []
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        scheduler.add_effect(lambda frame, now, dt: 1 / 0)
+        scheduler.add_effect(lambda frame, now, dt: calls.append(now))
+        with self.assertLogs('logipy.logi_led', 'ERROR'):
+            scheduler._tick(0.0, 0.0)
+        self.assertEqual((scheduler.errors, calls), (1, [0.0]))
+
+    def test_stop_ends_the_thread(self):
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        ticks     = self._run(scheduler, 0.05)['ticks']
+        self.assertFalse(scheduler.running)
+        time.sleep(0.05)
+        self.assertEqual(scheduler.ticks, ticks)
+
+
+# Native Effects
+#
+class LedEffectPlannerTest(SimulatedLedTestCase):
+
+    def test_per_key_pulse_runs_natively(self):
+        planner = logi_led.LedEffectPlanner()
+        effect  = logi_led.LedEffect(logi_led.EFFECT_PULSE, (255, 0, 0), keys = [logi_led.ESC], period = 0.5)
+        self.assertTrue(planner.play(effect, now = 0.0))
+        self.assertEqual(self.sim.effects[logi_led.ESC][0], 'pulse')
+        self.assertEqual(planner.native_keys(now = 0.0), frozenset([logi_led.ESC]))
+
+    def test_phase_shifted_effect_runs_in_software(self):
+        planner = logi_led.LedEffectPlanner()
+        effect  = logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 255, 0), keys = [logi_led.F1], period = 1.0, phase = 0.25)
+        self.assertFalse(planner.play(effect, now = 0.0))
+        self.assertEqual(self.sim.effects, {})
+        frame = logi_led.LedCanvas()
+        planner.render(frame, 0.0)
+        self.assertEqual(frame.get_pixel(*self._cell(logi_led.F1))[:3], (0, 255, 0))
+
+    def test_software_effect_stops_the_native_effect_on_its_keys(self):
+        planner = logi_led.LedEffectPlanner()
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC]), now = 0.0)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 0, 255), keys = [logi_led.ESC, logi_led.F1], phase = 0.1), now = 0.0)
+        self.assertEqual(planner.native_keys(now = 0.0), frozenset())
+        self.assertEqual(self.sim.call_counts['LogiLedStopEffectsOnKey'], 1)
+
+    def test_stop_only_calls_the_sdk_for_native_keys(self):
+        planner = logi_led.LedEffectPlanner()
+        effect  = logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC, logi_led.F1])
+        planner.play(effect, now = 0.0)
+        planner.stop(effect)
+        self.assertEqual(self.sim.call_counts['LogiLedStopEffectsOnKey'], 2)
+        planner.stop(effect)
+        self.assertEqual(self.sim.call_counts['LogiLedStopEffectsOnKey'], 2)
+        self.assertEqual(self.sim.effects, {})
+
+    def test_finished_effects_are_pruned(self):
+        planner = logi_led.LedEffectPlanner()
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC], duration = 1.0), now = 0.0)
+        self.assertEqual(planner.native_keys(now = 0.5), frozenset([logi_led.ESC]))
+        self.assertEqual(planner.native_keys(now = 1.0), frozenset())
+
+    def test_software_fill_leaves_native_keys_alone(self):
+        planner = logi_led.LedEffectPlanner()
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 0, 255), phase = 0.1), now = 0.0)
+        self.assertTrue(planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC]), now = 0.0))
+        frame = logi_led.LedCanvas()
+        frame.set_key(logi_led.ESC, 1, 2, 3)
+        planner.render(frame, 0.0)
+        self.assertEqual(frame.get_pixel(*self._cell(logi_led.ESC)), (1, 2, 3, 255))
+        self.assertEqual(frame.get_pixel(*self._cell(logi_led.F1)), (0, 0, 255, 255))
+
+    def test_finite_native_effect_pauses_software_effects(self):
+        planner  = logi_led.LedEffectPlanner()
+        software = logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 255, 0), keys = [logi_led.F1], phase = 0.1)
+        planner.play(software, now = 0.0)
+        self.assertTrue(planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), duration = 1.0), now = 0.0))
+        self.assertEqual(planner.stats()['software_effects'], 1)
+        frame = logi_led.LedCanvas()
+        planner.render(frame, 0.5)
+        self.assertEqual(frame.get_pixel(*self._cell(logi_led.F1))[:3], (0, 0, 0))
+        planner.render(frame, 1.0)
+        self.assertEqual(frame.get_pixel(*self._cell(logi_led.F1))[:3], (0, 255, 0))
+
+    def test_native_effect_drops_the_software_effects_it_hides(self):
+        planner = logi_led.LedEffectPlanner()
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 255, 0), keys = [logi_led.ESC], phase = 0.1), now = 0.0)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 255, 0), keys = [logi_led.ESC, logi_led.F1], phase = 0.1), now = 0.0)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC]), now = 0.0)
+        self.assertEqual(planner.stats()['software_effects'], 1)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_PULSE, (255, 0, 0)), now = 0.0)
+        self.assertEqual(planner.stats()['software_effects'], 0)
+
+    def test_restart_resumes_finite_effects_for_their_remaining_time(self):
+        planner = logi_led.LedEffectPlanner()
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC], duration = 1.0), now = 0.0)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_PULSE, (0, 255, 0), keys = [logi_led.F1], period = 0.5, duration = 0.5), now = 0.0)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_PULSE, (0, 0, 255), keys = [logi_led.G], period = 0.5), now = 0.0)
+        self.sim.effects.clear()
+        planner.restart(now = 0.2)
+        self.assertEqual(self.sim.effects[logi_led.ESC][2], 800)
+        self.assertNotIn(logi_led.F1, self.sim.effects)
+        self.assertTrue(self.sim.effects[logi_led.G][4])
+        self.assertEqual(planner.native_keys(now = 0.2), frozenset([logi_led.ESC, logi_led.G]))
+
+    @staticmethod
+    def _cell(key_name):
+        cell = logi_led.KEY_TO_BITMAP_CELL[key_name]
+        return cell % logi_led.LOGI_LED_BITMAP_WIDTH, cell // logi_led.LOGI_LED_BITMAP_WIDTH
+
+
+    def test_scheduler_sends_nothing_for_native_effects_only(self):
+        planner   = logi_led.LedEffectPlanner()
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_PULSE, (255, 0, 0), keys = [logi_led.ESC], period = 0.5))
+        scheduler = logi_led.EffectScheduler(fps = 100)
+        scheduler.add_effect(planner.render)
+        scheduler.start()
+        time.sleep(0.1)
+        scheduler.stop()
+        self.assertGreater(scheduler.ticks, 0)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 0)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingForKeyWithKeyName'], 0)
+
+    def test_commits_leave_native_keys_alone(self):
+        planner  = logi_led.LedEffectPlanner()
+        software = [logi_led.F1, logi_led.F2, logi_led.F3, logi_led.F4, logi_led.F5, logi_led.F6]
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (255, 0, 0), keys = [logi_led.ESC]), now = 0.0)
+        planner.play(logi_led.LedEffect(logi_led.EFFECT_FLASH, (0, 0, 255), keys = software, phase = 0.1), now = 0.0)
+        frame = logi_led.LedCanvas()
+        frame.set_key(logi_led.ESC, 0, 255, 0)
+        for now in (0.0, 0.5, 1.0):
+            self.assertTrue(planner.render(frame, now))
+            self.assertTrue(frame.commit())
+        sent = [values[0] for _, name, values in self.sim.calls if name == 'LogiLedSetLightingForKeyWithKeyName']
+        self.assertEqual(self.sim.call_counts['LogiLedSetLightingFromBitmap'], 0)
+        self.assertNotIn(logi_led.ESC, sent)
+        self.assertEqual(self.sim.key_color(logi_led.F1), (0, 0, 255))
+        self.assertIn(logi_led.ESC, self.sim.effects)
+        # once the native effect is stopped, the key is sent again
+        planner.stop()
+        self.assertFalse(planner.render(frame, 1.5))
+        frame.commit()
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (0, 255, 0))
+
+
+# Asynchronous Commands
+#
+class LedCommandQueueTest(SimulatedLedTestCase):
+
+    def test_commands_run_in_order_on_the_worker(self):
+        queue   = logi_led.LedCommandQueue(init_sdk = False)
+        queue.start()
+        futures = [queue.logi_led_set_lighting_for_key_with_key_name(logi_led.ESC, 100, 0, 0),
+                   queue.logi_led_set_lighting_for_key_with_key_name(logi_led.F1, 0, 100, 0)]
+        queue.stop()
+        self.assertEqual([future.result(1) for future in futures], [True, True])
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (255, 0, 0))
+        self.assertEqual(self.sim.key_color(logi_led.F1), (0, 255, 0))
+
+    def test_pending_commands_are_coalesced(self):
+        queue   = logi_led.LedCommandQueue(init_sdk = False)
+        futures = [queue.submit(logi_led.logi_led_set_lighting, level, 0, 0) for level in (10, 20, 30)]
+        queue.start()
+        queue.stop()
+        self.assertEqual([future.result(1) for future in futures], [True, True, True])
+        self.assertEqual(queue.coalesced, 2)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLighting'], 1)
+        self.assertEqual(self.sim.lighting, (30, 0, 0))
+
+    def test_barriers_are_not_coalesced_across(self):
+        queue = logi_led.LedCommandQueue(init_sdk = False)
+        queue.submit(logi_led.logi_led_set_lighting, 10, 0, 0)
+        queue.submit(logi_led.logi_led_save_current_lighting)
+        queue.submit(logi_led.logi_led_set_lighting, 20, 0, 0)
+        queue.start()
+        queue.stop()
+        self.assertEqual(queue.coalesced, 0)
+        self.assertEqual(self.sim.call_counts['LogiLedSetLighting'], 2)
+
+    def test_bitmap_arguments_are_copied_on_submit(self):
+        queue  = logi_led.LedCommandQueue(init_sdk = False)
+        bitmap = bytearray(logi_led.LOGI_LED_BITMAP_SIZE)
+        future = queue.submit(logi_led.logi_led_set_lighting_from_bitmap, bitmap)
+        bitmap[0:4] = b'\xff\xff\xff\xff'
+        queue.start()
+        queue.stop()
+        self.assertTrue(future.result(1))
+        self.assertEqual(bytes(self.sim.bitmap), bytes(logi_led.LOGI_LED_BITMAP_SIZE))
+
+    def test_submit_after_stop_raises(self):
+        queue = logi_led.LedCommandQueue(init_sdk = False)
+        queue.start()
+        queue.stop()
+        self.assertRaises(RuntimeError, queue.submit, logi_led.logi_led_set_lighting, 0, 0, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
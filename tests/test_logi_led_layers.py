@@ -0,0 +1,87 @@
+"""
+test_logi_led_layers.py : Tests of LedCompositor against the simulated LED SDK
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import unittest
+
+from logipy import logi_led
+from logipy import logi_led_layers
+from logipy.logi_led_layers import BLEND_ADD, BLEND_MAX, BLEND_MULTIPLY, LedCompositor, mask_from_keys
+from tests.test_logi_led import SimulatedLedTestCase
+
+
+def _cell_color(frame, key_name):
+    offset = logi_led.KEY_TO_BITMAP_CELL[key_name] * logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY
+    blue, green, red, alpha = bytearray(frame[offset:offset + logi_led.LOGI_LED_BITMAP_BYTES_PER_KEY])
+    return red, green, blue, alpha
+
+def _build(compositor):
+    base  = compositor.add_layer('base')
+    glow  = compositor.add_layer('glow', blend = BLEND_ADD, alpha = 0.5)
+    alert = compositor.add_layer('alert', blend = BLEND_MAX, mask = mask_from_keys([logi_led.ESC]))
+    tint  = compositor.add_layer('tint', blend = BLEND_MULTIPLY)
+    base.canvas.fill(0, 0, 128)
+    glow.canvas.fill(100, 100, 0, 128)
+    alert.canvas.fill(255, 0, 0)
+    tint.canvas.fill(255, 255, 128, 255)
+    return base, glow, alert, tint
+
+
+class LedCompositorTest(SimulatedLedTestCase):
+
+    def test_layers_blend_in_z_order(self):
+        compositor = LedCompositor(use_numpy = False)
+        base       = compositor.add_layer('base', z = 1)
+        top        = compositor.add_layer('top', z = 0)
+        base.canvas.fill(0, 0, 255)
+        top.canvas.fill(255, 0, 0)
+        self.assertEqual([layer.name for layer in compositor.layers], ['top', 'base'])
+        self.assertEqual(_cell_color(compositor.compose(), logi_led.ESC), (0, 0, 255, 255))
+
+    def test_mask_limits_a_layer_to_its_keys(self):
+        compositor = LedCompositor(use_numpy = False)
+        _build(compositor)
+        frame = compositor.compose()
+        self.assertEqual(_cell_color(frame, logi_led.ESC)[0], 255)
+        self.assertEqual(_cell_color(frame, logi_led.F1)[0], 25)
+
+    def test_unchanged_layers_are_not_blended_again(self):
+        compositor = LedCompositor(use_numpy = False)
+        base, glow, alert, tint = _build(compositor)
+        compositor.compose()
+        self.assertEqual(compositor.blends, 4)
+        compositor.compose()
+        self.assertEqual(compositor.blends, 4)
+        tint.canvas.fill(128, 128, 128)
+        compositor.compose()
+        self.assertEqual(compositor.blends, 5)
+        self.assertEqual(compositor.stats()['reused'], 4 + 3)
+
+    def test_numpy_and_python_blending_agree(self):
+        if logi_led_layers._import_numpy() is None:
+            self.skipTest('numpy is not installed')
+        frames = []
+        for use_numpy in (False, True):
+            compositor = LedCompositor(use_numpy = use_numpy)
+            _build(compositor)
+            frames.append(compositor.compose())
+        self.assertEqual(frames[0], frames[1])
+
+    def test_commit_sends_the_composed_frame(self):
+        compositor = LedCompositor(use_numpy = False)
+        _build(compositor)
+        self.assertTrue(compositor.commit())
+        self.assertEqual(bytes(self.sim.bitmap), compositor.compose())
+        calls = sum(self.sim.call_counts.values())
+        compositor.commit()
+        self.assertEqual(sum(self.sim.call_counts.values()), calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+test_logi_led_record.py : Tests of LedRecorder and LedReplayer against the simulated LED SDK
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from logipy import logi_led
+from logipy import logi_led_record
+from tests.test_logi_led import SimulatedLedTestCase
+
+
+def _bitmap(level):
+    return bytes(bytearray((level, 255 - level, level // 2, 255))) * (logi_led.LOGI_LED_BITMAP_WIDTH * logi_led.LOGI_LED_BITMAP_HEIGHT)
+
+
+class LedRecordingTest(SimulatedLedTestCase):
+
+    def setUp(self):
+        SimulatedLedTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.path      = os.path.join(self.directory, 'session.logiled')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        SimulatedLedTestCase.tearDown(self)
+
+    def _record(self, calls, **kwargs):
+        """ records calls, a list of (wrapper name, arguments), and returns the bitmap the simulated keyboard showed at the end. """
+        with logi_led_record.LedRecorder(self.path, **kwargs):
+            for name, arguments in calls:
+                getattr(logi_led, name)(*arguments)
+        return bytes(self.sim.bitmap)
+
+    def test_stop_puts_the_wrappers_back(self):
+        original = logi_led.logi_led_set_lighting_from_bitmap
+        recorder = logi_led_record.LedRecorder(self.path)
+        recorder.start()
+        self.assertIsNot(logi_led.logi_led_set_lighting_from_bitmap, original)
+        recorder.stop()
+        self.assertIs(logi_led.logi_led_set_lighting_from_bitmap, original)
+
+    def test_replay_reproduces_the_lighting(self):
+        calls = [('logi_led_set_lighting_from_bitmap', (_bitmap(level),)) for level in range(0, 200, 10)]
+        calls.append(('logi_led_set_lighting_for_key_with_key_name', (logi_led.ESC, 100, 0, 0)))
+        shown = self._record(calls)
+        self.sim.reset()
+        logi_led.logi_led_init()
+        with logi_led_record.LedReplayer(self.path) as replayer:
+            self.assertEqual(replayer.records, len(calls))
+            result = replayer.play(speed = None)
+        self.assertEqual(result['calls'], len(calls))
+        self.assertEqual(result['frames'], len(calls) - 1)
+        self.assertEqual(result['failures'], 0)
+        self.assertEqual(bytes(self.sim.bitmap), shown)
+
+    def test_similar_frames_are_stored_as_deltas(self):
+        frame = bytearray(_bitmap(0))
+        calls = []
+        for cell in range(20):
+            frame[cell * 4:cell * 4 + 3] = b'\xff\xff\xff'
+            calls.append(('logi_led_set_lighting_from_bitmap', (bytes(frame),)))
+        self._record(calls, compress = False)
+        self.assertLess(os.path.getsize(self.path), 3 * logi_led.LOGI_LED_BITMAP_SIZE)
+
+    def test_replay_from_a_time_restores_the_state_first(self):
+        with logi_led_record.LedRecorder(self.path):
+            logi_led.logi_led_set_lighting_from_bitmap(_bitmap(50))
+            logi_led.logi_led_set_lighting_for_key_with_key_name(logi_led.ESC, 100, 0, 0)
+            time.sleep(0.05)
+            logi_led.logi_led_set_lighting_for_key_with_key_name(logi_led.F1, 0, 100, 0)
+        with logi_led_record.LedReplayer(self.path) as replayer:
+            names = [name for _, name, _ in replayer.records_from(0.03)]
+        self.assertEqual(names, ['logi_led_set_lighting_from_bitmap', 'logi_led_set_lighting_for_key_with_key_name',
+                                 'logi_led_set_lighting_for_key_with_key_name'])
+
+    def test_replay_can_start_in_every_block(self):
+        frame = bytearray(_bitmap(0))
+        with logi_led_record.LedRecorder(self.path, block_seconds = 0.02):
+            for step in range(6):
+                frame[step * 4] = 255
+                logi_led.logi_led_set_lighting_from_bitmap(bytes(frame))
+                if step % 2:
+                    # drops the bitmap from the state while the encoder still holds it
+                    logi_led.logi_led_set_lighting(step, 0, 0)
+                time.sleep(0.03)
+        shown = bytes(self.sim.bitmap)
+        with logi_led_record.LedReplayer(self.path) as replayer:
+            self.assertGreater(replayer.blocks, 3)
+            for block in range(replayer.blocks):
+                self.sim.reset()
+                logi_led.logi_led_init()
+                result = replayer.play(speed = None, start = replayer._times[block] - replayer._times[0])
+                self.assertEqual(result['failures'], 0)
+                self.assertEqual(bytes(self.sim.bitmap), shown)
+
+    def test_replay_from_a_time_does_not_wait_for_the_skipped_part(self):
+        with logi_led_record.LedRecorder(self.path):
+            logi_led.logi_led_set_lighting_from_bitmap(_bitmap(10))
+            time.sleep(0.3)
+            logi_led.logi_led_set_lighting_from_bitmap(_bitmap(20))
+        with logi_led_record.LedReplayer(self.path) as replayer:
+            result = replayer.play(speed = 1.0, start = 0.2)
+        self.assertEqual(result['calls'], 2)
+        self.assertLess(result['seconds'], 0.15)
+
+if __name__ == '__main__':
+    unittest.main()
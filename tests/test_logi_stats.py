@@ -0,0 +1,115 @@
+"""
+test_logi_stats.py : Tests of the logi_stats instrumentation against the simulated LED SDK
+
+Logitech Gaming LED SDK
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import os
+import shutil
+import tempfile
+
+from logipy import logi_led
+from logipy import logi_led_record
+from logipy import logi_stats
+from tests.test_logi_led import SimulatedLedTestCase
+
+
+class StatsTestCase(SimulatedLedTestCase):
+    """ starts every test with empty stats and leaves the wrappers uninstrumented. """
+
+    def setUp(self):
+        SimulatedLedTestCase.setUp(self)
+        logi_stats.disable()
+        logi_stats.reset()
+
+    def tearDown(self):
+        logi_stats.disable()
+        logi_stats.reset()
+        SimulatedLedTestCase.tearDown(self)
+
+
+class PrometheusTest(StatsTestCase):
+
+    def test_bound_includes_values_equal_to_it(self):
+        stats = logi_stats._stats.setdefault('logi_led_test_call', logi_stats._CallStats())
+        try:
+            with logi_stats._lock:
+                logi_stats._record(stats, 1e-6)
+            text = logi_stats.prometheus_text()
+        finally:
+            del logi_stats._stats['logi_led_test_call']
+        self.assertIn('logipy_call_duration_seconds_bucket{function="logi_led_test_call",le="1e-06"} 1', text.splitlines())
+
+
+class InstrumentationTest(StatsTestCase):
+
+    def test_only_sdk_entry_points_are_wrapped(self):
+        logi_stats.enable()
+        self.assertTrue(hasattr(logi_led.logi_led_set_lighting, '__wrapped__'))
+        self.assertFalse(hasattr(logi_led.logi_led_get_target_device, '__wrapped__'))
+        logi_led.logi_led_get_target_device()
+        self.assertNotIn('logi_led_get_target_device', logi_stats.snapshot()['functions'])
+
+
+class StackingTest(StatsTestCase):
+    """ logi_stats and a LedRecorder both replace the logi_led wrappers and have to work together whichever is stopped first. """
+
+    def setUp(self):
+        StatsTestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.path      = os.path.join(self.directory, 'session.logiled')
+        self.original  = logi_led.logi_led_set_lighting
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        StatsTestCase.tearDown(self)
+
+    def _calls(self):
+        return logi_stats.snapshot()['functions'].get('logi_led_set_lighting', {}).get('calls', 0)
+
+    def _check_stopped(self):
+        """ checks that the wrapper left behind works and neither stats nor the recording see calls any more. """
+        calls = self._calls()
+        self.assertTrue(logi_led.logi_led_set_lighting(0, 255, 0))
+        self.assertEqual(self.sim.key_color(logi_led.ESC), (0, 255, 0))
+        self.assertEqual(self._calls(), calls)
+        calls = [name for _, name, _ in logi_led_record.LedReplayer(self.path).records_from()]
+        self.assertEqual(calls, ['logi_led_set_lighting'])
+
+    def test_stats_stopped_first(self):
+        logi_stats.enable()
+        recorder = logi_led_record.LedRecorder(self.path)
+        recorder.start()
+        logi_led.logi_led_set_lighting(100, 0, 0)
+        logi_stats.disable()
+        recorder.stop()
+        self.assertEqual(self._calls(), 1)
+        self.assertIs(logi_led.logi_led_set_lighting, self.original)
+        self._check_stopped()
+
+    def test_recorder_stopped_first(self):
+        recorder = logi_led_record.LedRecorder(self.path)
+        recorder.start()
+        logi_stats.enable()
+        logi_led.logi_led_set_lighting(100, 0, 0)
+        recorder.stop()
+        logi_stats.disable()
+        self.assertEqual(self._calls(), 1)
+        self.assertIs(logi_led.logi_led_set_lighting, self.original)
+        self._check_stopped()
+
+    def test_stats_started_first_and_recorder_stopped_first(self):
+        logi_stats.enable()
+        recorder = logi_led_record.LedRecorder(self.path)
+        recorder.start()
+        logi_led.logi_led_set_lighting(100, 0, 0)
+        recorder.stop()
+        logi_led.logi_led_set_lighting(50, 0, 0)
+        self.assertEqual(self._calls(), 2)
+        logi_stats.disable()
+        self.assertIs(logi_led.logi_led_set_lighting, self.original)
+        self._check_stopped()
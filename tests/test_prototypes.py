@@ -0,0 +1,161 @@
+"""
+test_prototypes.py : Checks the ctypes prototypes of logi_led and logi_arx against the stand-in SDK library from benchmarks/stub
+
+Logitech Gaming SDKs
+
+Copyright (C) 2011-2015 Logitech. All rights reserved.
+Author: Tom Lambert
+Email: devtechsupport@logitech.com
+"""
+
+import ctypes
+import os
+import re
+import sys
+import unittest
+
+from logipy import logi_arx
+from logipy import logi_led
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from stub import SOURCE, build_stub_library
+
+# the ctypes type each C type of the stub's signatures maps to
+C_TYPES = {
+    'void':                   None,
+    'bool':                   ctypes.c_bool,
+    'int':                    ctypes.c_int,
+    'double *':               ctypes.POINTER(ctypes.c_double),
+    'bool *':                 ctypes.POINTER(ctypes.c_bool),
+    'int *':                  ctypes.POINTER(ctypes.c_int),
+    'char *':                 ctypes.c_char_p,
+    'const wchar_t *':        ctypes.c_wchar_p,
+    'const void *':           ctypes.c_void_p,
+    'const unsigned char *':  ctypes.c_void_p,
+    'logiArxCbContext *':     ctypes.POINTER(logi_arx.logiArxCbContext),
+}
+
+_FUNCTION  = re.compile(r'STUB_EXPORT\s+(\w+)\s+(Logi\w+)\s*\(([^)]*)\)')
+_PARAMETER = re.compile(r'^(.*?[\s*])(\w+)$')
+
+def _c_type(declaration):
+    # 'const wchar_t*' and 'const wchar_t *' alike
+    return C_TYPES[' '.join(declaration.replace('*', ' *').split())]
+
+def stub_signatures():
+    """ returns a dict of SDK function name -> (restype, argtypes) parsed from the stub's C source. """
+    with open(SOURCE) as source:
+        text = source.read()
+    signatures = {}
+    for restype, name, parameters in _FUNCTION.findall(text):
+        if name.startswith('LogiStub'):
+            # helpers of the stub that are not part of the SDK
+            continue
+        argtypes = []
+        for parameter in parameters.split(','):
+            parameter = parameter.strip()
+            if parameter and parameter != 'void':
+                argtypes.append(_c_type(_PARAMETER.match(parameter).group(1).strip()))
+        signatures[name] = (C_TYPES[restype], tuple(argtypes))
+    return signatures
+
+
+class PrototypeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.library = build_stub_library()
+        except RuntimeError as exception:
+            raise unittest.SkipTest(str(exception))
+        cls.signatures = stub_signatures()
+
+    def _check(self, module):
+        dll = module.bind_prototypes(ctypes.CDLL(self.library))
+        for name, (restype, argtypes) in module._PROTOTYPES.items():
+            self.assertIn(name, self.signatures, '{} is not exported by the stub'.format(name))
+            self.assertEqual((restype, tuple(argtypes)), self.signatures[name], name)
+            function = getattr(dll, name)
+            self.assertEqual((function.restype, tuple(function.argtypes)), (restype, tuple(argtypes)), name)
+
+    def test_led_prototypes_match_the_stub(self):
+        self._check(logi_led)
+
+    def test_arx_prototypes_match_the_stub(self):
+        self._check(logi_arx)
+
+    def test_every_sdk_function_has_a_prototype(self):
+        self.assertEqual(set(self.signatures), set(logi_led._PROTOTYPES) | set(logi_arx._PROTOTYPES))
+
+
+class StubBackendTest(unittest.TestCase):
+    """ calls the wrappers with the stub installed as the backend, so every argument goes through the bound argtypes. """
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.library = build_stub_library()
+        except RuntimeError as exception:
+            raise unittest.SkipTest(str(exception))
+
+    def setUp(self):
+        self.previous_led = logi_led.logi_led_set_backend(ctypes.CDLL(self.library))
+        self.previous_arx = logi_arx.logi_arx_set_backend(ctypes.CDLL(self.library))
+
+    def tearDown(self):
+        logi_led.logi_led_set_backend(self.previous_led)
+        logi_arx.logi_arx_set_backend(self.previous_arx)
+
+    def test_led_wrappers(self):
+        bitmap = bytearray(logi_led.LOGI_LED_BITMAP_SIZE)
+        calls  = [
+            (logi_led.logi_led_init, ()),
+            (logi_led.logi_led_set_target_device, (logi_led.LOGI_DEVICETYPE_ALL,)),
+            (logi_led.logi_led_save_current_lighting, ()),
+            (logi_led.logi_led_set_lighting, (100, 50, 0)),
+            (logi_led.logi_led_flash_lighting, (100, 50, 0, 1000, 100)),
+            (logi_led.logi_led_pulse_lighting, (100, 50, 0, 1000, 100)),
+            (logi_led.logi_led_stop_effects, ()),
+            (logi_led.logi_led_set_lighting_from_bitmap, (bytes(bitmap),)),
+            (logi_led.logi_led_set_lighting_from_bitmap, (bitmap,)),
+            (logi_led.logi_led_set_lighting_for_key_with_scan_code, (logi_led.ESC, 100, 0, 0)),
+            (logi_led.logi_led_set_lighting_for_key_with_hid_code, (0x29, 100, 0, 0)),
+            (logi_led.logi_led_set_lighting_for_key_with_quartz_code, (0x35, 100, 0, 0)),
+            (logi_led.logi_led_set_lighting_for_key_with_key_name, (logi_led.ESC, 100, 0, 0)),
+            (logi_led.logi_led_save_lighting_for_key, (logi_led.ESC,)),
+            (logi_led.logi_led_restore_lighting_for_key, (logi_led.ESC,)),
+            (logi_led.logi_led_flash_single_key, (logi_led.ESC, 100, 0, 0, 1000, 100)),
+            (logi_led.logi_led_pulse_single_key, (logi_led.ESC, 100, 0, 0, 1000, True)),
+            (logi_led.logi_led_stop_effects_on_key, (logi_led.ESC,)),
+            (logi_led.logi_led_restore_lighting, ()),
+            (logi_led.logi_led_set_config_option_label, ('health', 'Health')),
+            (logi_led.logi_led_shutdown, ()),
+        ]
+        for function, args in calls:
+            self.assertTrue(function(*args), function.__name__)
+        self.assertEqual(logi_led.logi_led_get_config_option_number('health/low', 20.0), 20.0)
+        self.assertEqual(logi_led.logi_led_get_config_option_bool('health/pulse', True), True)
+        self.assertEqual(logi_led.logi_led_get_config_option_color('health/color', logi_led.Color(255, 0, 0)), logi_led.Color(255, 0, 0))
+
+    def test_arx_wrappers(self):
+        calls = [
+            (logi_arx.logi_arx_init, ('com.logitech.tests', 'logipy tests', lambda *args: None)),
+            (logi_arx.logi_arx_add_file_as, (os.path.abspath(__file__), 'test.py', 'text/plain')),
+            (logi_arx.logi_arx_add_content_as, (b'content', None, 'content.bin')),
+            (logi_arx.logi_arx_add_utf8_string_as, ('<html></html>', 'index.html', 'text/html')),
+            (logi_arx.logi_arx_add_image_from_bitmap, (bytearray(16), 2, 2, 'image.png')),
+            (logi_arx.logi_arx_set_index, ('index.html',)),
+            (logi_arx.logi_arx_set_tag_property_by_id, ('bar', 'style.width', '10%')),
+            (logi_arx.logi_arx_set_tags_property_by_class, ('bars', 'style.width', '10%')),
+            (logi_arx.logi_arx_set_tag_content_by_id, ('fps', '144')),
+            (logi_arx.logi_arx_set_tags_content_by_class, ('fps', '144')),
+            (logi_arx.logi_arx_shutdown, ()),
+        ]
+        for function, args in calls:
+            self.assertTrue(function(*args), function.__name__)
+        self.assertEqual(logi_arx.logi_arx_get_last_error(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()